@@ -0,0 +1,254 @@
+"""
+Offline ingestion and retrieval benchmark of DocumentProcessor and ChromaSearchTool.
+
+Usage (from the app directory):
+    python -m benchmarks.pipeline_benchmark --output pipeline.json
+    python -m benchmarks.pipeline_benchmark --modes per_file numpy --documents 100 --pages 20
+    python -m benchmarks.pipeline_benchmark --baseline pipeline.json --threshold 1.2
+
+A synthetic legal corpus (one topic per document, pages of about 3,000
+characters) is ingested with the deterministic FakeEmbeddingFunction, so no
+credentials or network are needed. Each storage mode runs in a fresh
+process in an empty directory and reports ingestion throughput, peak RSS and
+the size of everything written to disk. multiple_collection_search latency
+is then measured while the search is restricted to a growing number of
+documents, and the answer latency adds one FakeChatModel call on top.
+With --baseline, metrics that got worse by more than --threshold are listed
+and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+TOPICS = {
+    "lease": "tenant landlord lease rent premises deposit eviction repair term notice",
+    "criminal": "defendant prosecution sentence offence evidence verdict appeal custody witness",
+    "contract": "party breach damages obligation performance clause termination remedy consideration",
+    "employment": "employer employee dismissal wage contract notice discrimination tribunal overtime",
+    "family": "divorce custody child alimony marriage maintenance guardian parental visitation",
+    "tax": "taxpayer revenue audit deduction assessment penalty return income liability",
+    "patent": "invention patent claim infringement licence prior novelty royalty examiner",
+    "insurance": "insurer policy claim coverage premium exclusion loss indemnity beneficiary",
+    "bankruptcy": "debtor creditor estate insolvency trustee liquidation claim discharge asset",
+    "immigration": "visa asylum residence permit deportation applicant border citizenship appeal",
+}
+FILLER = "the court held that under article section paragraph of the code in accordance with".split()
+PAGE_CHARS = 3000
+
+
+class UploadedFile:
+    """Minimal stand-in for Streamlit's UploadedFile"""
+    def __init__(self, name, data):
+        self.name = name
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+
+def synthetic_corpus(documents, pages, seed=0):
+    """(file name, topic, text bytes) for every synthetic document"""
+    rng = np.random.default_rng(seed)
+    topics = list(TOPICS)
+    corpus = []
+    for index in range(documents):
+        topic = topics[index % len(topics)]
+        vocabulary = TOPICS[topic].split()
+        text = []
+        for page in range(pages):
+            length = 0
+            while length < PAGE_CHARS:
+                words = rng.choice(vocabulary, size=6).tolist() + rng.choice(FILLER, size=6).tolist()
+                rng.shuffle(words)
+                sentence = f"Case {index}-{page}: " + " ".join(words) + ".\n"
+                text.append(sentence)
+                length += len(sentence)
+            text.append("\n")
+        corpus.append((f"case_{index:05}_{topic}.txt", topic, "".join(text).encode()))
+    return corpus
+
+
+def synthetic_queries(corpus, count, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    queries = []
+    for _ in range(count):
+        topic = corpus[rng.integers(len(corpus))][1]
+        queries.append(" ".join(rng.choice(TOPICS[topic].split(), size=4, replace=False)))
+    return queries
+
+
+def directory_size_mb(path, exclude=("traces",)):
+    total = 0
+    for root, directories, files in os.walk(path):
+        directories[:] = [d for d in directories if d not in exclude]
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 2 ** 20
+
+
+def latency_summary(seconds):
+    milliseconds = np.asarray(seconds) * 1000
+    return {"p50_ms": float(np.percentile(milliseconds, 50)), "p95_ms": float(np.percentile(milliseconds, 95))}
+
+
+def run_scenario(mode, documents, pages, collections, queries, k, embedding_latency, llm_latency, route_top_n, seed):
+    """Ingest and search in the current process; meant to run in a fresh worker process"""
+    workdir = tempfile.mkdtemp(prefix=f"pipeline_{mode}_")
+    os.chdir(workdir)
+    try:
+        # The lexical index, router and stores use their default paths, relative to the empty workdir
+        from core.context_packing import ContextPacker
+        from core.fake_providers import FakeChatModel, FakeEmbeddingFunction
+        from core.simple_rag import ChromaSearchTool, DocumentProcessor, get_storage
+
+        embeddings = FakeEmbeddingFunction(latency=embedding_latency)
+        storage = get_storage(mode, embeddings)
+        processor = DocumentProcessor(embeddings=embeddings, storage=storage)
+
+        corpus = synthetic_corpus(documents, pages, seed)
+        chunks = tokens = 0
+        start = time.perf_counter()
+        for name, _, data in corpus:
+            stats = processor.process_file(UploadedFile(name, data))["stats"]
+            chunks += stats["chunks"]
+            tokens += stats["tokens"]
+        seconds = time.perf_counter() - start
+        report = {
+            "ingest": {
+                "documents": documents,
+                "pages": documents * pages,
+                "chunks": chunks,
+                "seconds": seconds,
+                "pages_per_second": documents * pages / seconds,
+                "chunks_per_second": chunks / seconds,
+                "tokens_per_second": tokens / seconds,
+                "index_size_mb": directory_size_mb(workdir),
+            },
+            "search": {},
+        }
+
+        tool = ChromaSearchTool(embeddings, storage=storage, context_packer=ContextPacker(), route_top_n=route_top_n)
+        names = storage.list_documents()
+        searched = sorted({min(n, len(names)) for n in collections})
+        for n in searched:
+            scope = names[:n]
+            scope_chunks = sum(len(storage.get_chunk_ids(name)) for name in scope)
+            texts = synthetic_queries(corpus[:n], queries, seed)
+            tool.multiple_collection_search(texts[0], k, documents=scope)
+            latencies = []
+            for text in texts:
+                start = time.perf_counter()
+                tool.multiple_collection_search(text, k, documents=scope)
+                latencies.append(time.perf_counter() - start)
+            report["search"][str(n)] = {"chunks": scope_chunks, **latency_summary(latencies)}
+
+        llm = FakeChatModel(latency=llm_latency)
+        latencies = []
+        for text in synthetic_queries(corpus, queries, seed):
+            start = time.perf_counter()
+            context = tool.multiple_collection_search(text, k)
+            llm.invoke(f"Retrieved context:\n{context}\n\nQuestion: {text}\nAnswer:")
+            latencies.append(time.perf_counter() - start)
+        report["answer"] = latency_summary(latencies)
+        report["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return report
+    finally:
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def flatten(report, prefix=""):
+    metrics = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            metrics[name] = value
+    return metrics
+
+
+def compare(report, baseline, threshold):
+    """Metrics that got worse by more than `threshold` times; throughputs must not drop, the rest must not grow"""
+    current, previous = flatten(report["modes"]), flatten(baseline.get("modes", {}))
+    regressions = []
+    for name, value in current.items():
+        before = previous.get(name)
+        if not before or not name.endswith(("_per_second", "_ms", "_mb")):
+            continue
+        worse = value < before / threshold if name.endswith("_per_second") else value > before * threshold
+        if worse:
+            regressions.append({"metric": name, "baseline": before, "current": value})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingestion and retrieval benchmark with fake providers")
+    parser.add_argument("--modes", nargs="+", default=["per_file", "shared", "numpy"])
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=10, help="Pages of about 3,000 characters per document")
+    parser.add_argument("--collections", type=int, nargs="+", default=[1, 10, 50],
+                        help="Numbers of documents the search is restricted to")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--route-top-n", type=int, default=8)
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Seconds per fake embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per fake LLM call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="Previous report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Allowed slowdown factor before a regression")
+    args = parser.parse_args()
+
+    report = {"python": sys.version.split()[0], "config": {
+        key: value for key, value in vars(args).items() if key not in ("output", "baseline", "threshold")
+    }, "modes": {}}
+    app_directory = os.getcwd()
+    for mode in args.modes:
+        # A fresh process per mode keeps peak RSS and Chroma's caches independent
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn"),
+                                 initializer=sys.path.insert, initargs=(0, app_directory)) as executor:
+            result = executor.submit(
+                run_scenario, mode, args.documents, args.pages, args.collections, args.queries, args.k,
+                args.embedding_latency, args.llm_latency, args.route_top_n, args.seed
+            ).result()
+        report["modes"][mode] = result
+        ingest = result["ingest"]
+        print(f"{mode}: {ingest['pages_per_second']:.1f} pages/s, {ingest['chunks_per_second']:.1f} chunks/s, "
+              f"index {ingest['index_size_mb']:.1f} MB, peak RSS {result['peak_rss_mb']:.0f} MB, "
+              f"answer p50 {result['answer']['p50_ms']:.1f} ms", file=sys.stderr)
+        for n, search in result["search"].items():
+            print(f"  search over {n} documents ({search['chunks']} chunks): "
+                  f"p50 {search['p50_ms']:.1f} ms, p95 {search['p95_ms']:.1f} ms", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("config") != report["config"]:
+            print("Warning: the baseline was run with a different configuration", file=sys.stderr)
+        report["regressions"] = compare(report, baseline, args.threshold)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text)
+    else:
+        print(text)
+
+    for regression in report.get("regressions", []):
+        print(f"Regression in {regression['metric']}: {regression['baseline']:.2f} -> {regression['current']:.2f}",
+              file=sys.stderr)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Memory/accuracy trade-off of compressed vectors in NumpyStorage.
+
+Usage (from the app directory):
+    python -m benchmarks.quantization_benchmark --chunks 20000 --components 768 256 128
+    python -m benchmarks.quantization_benchmark --store ./vector_store --queries 200
+
+For int8 quantization alone and for every PCA size, reports bytes per
+vector, compression ratio, p50/p95 latency and recall@k against exact
+float32 search, with and without full-precision re-scoring of the
+shortlist. With --store the real embeddings of an existing store are
+copied (the store itself is not modified); otherwise clustered synthetic
+vectors are used, which have far less low-rank structure than real
+embeddings and therefore understate what PCA can keep.
+"""
+import argparse
+import json
+import shutil
+import tempfile
+
+import numpy as np
+
+from benchmarks.vector_store_benchmark import exact_top_k, recall_at_k, synthetic_vectors, time_queries
+from core.numpy_store import NumpyStorage
+
+
+def load_store_vectors(path, queries, seed=0):
+    store = NumpyStorage(path)
+    live = np.nonzero(~store._deleted)[0]
+    vectors = np.asarray(store._vectors[live])
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(len(vectors), size=(queries, 2))
+    # Midpoints of random chunk pairs stand in for questions
+    return vectors, (vectors[pairs[:, 0]] + vectors[pairs[:, 1]]) / 2
+
+
+def run(vectors, query_vectors, k=10, components=(None, 768, 512, 256, 128), rescore=(0, 2, 4, 8)):
+    truth = exact_top_k(vectors, query_vectors, k)
+    report = {"chunks": len(vectors), "dimensions": vectors.shape[1], "queries": len(query_vectors), "k": k,
+              "results": []}
+    workdir = tempfile.mkdtemp()
+    try:
+        store = NumpyStorage(workdir)
+        ids = [f"chunk-{i}" for i in range(len(vectors))]
+        for offset in range(0, len(vectors), 5000):
+            store.upsert(ids[offset:offset + 5000], vectors[offset:offset + 5000],
+                         [""] * len(ids[offset:offset + 5000]))
+
+        results, latency = time_queries(lambda q: [row for _, row in store.search_rows(q, k)], query_vectors)
+        report["results"].append({"components": None, "quantized": False, "rescore": None,
+                                  "bytes_per_vector": vectors.shape[1] * 4 + 4, "compression_ratio": 1.0,
+                                  "recall": recall_at_k(results, truth), **latency})
+
+        for size in components:
+            if size is not None and size >= vectors.shape[1]:
+                continue
+            store.compress(components=size, evaluation_queries=0)
+            code_bytes = store._compressor.code_size + 4
+            for factor in rescore:
+                store.rescore = factor
+                results, latency = time_queries(lambda q: [row for _, row in store.search_rows(q, k)], query_vectors)
+                report["results"].append({
+                    "components": size, "quantized": True, "rescore": factor,
+                    "bytes_per_vector": code_bytes,
+                    "compression_ratio": (vectors.shape[1] * 4 + 4) / code_bytes,
+                    "recall": recall_at_k(results, truth), **latency
+                })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark int8 and PCA compression of NumpyStorage")
+    parser.add_argument("--store", default=None, help="Copy vectors from an existing NumpyStorage directory")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--components", type=int, nargs="*", default=[768, 512, 256, 128],
+                        help="PCA sizes to try in addition to int8 quantization alone")
+    parser.add_argument("--rescore", type=int, nargs="*", default=[0, 2, 4, 8],
+                        help="Shortlist sizes as multiples of k (0 = no re-scoring)")
+    args = parser.parse_args()
+
+    if args.store:
+        vectors, query_vectors = load_store_vectors(args.store, args.queries)
+    else:
+        vectors, query_vectors = synthetic_vectors(args.chunks, args.dimensions, args.queries)
+    report = run(vectors, query_vectors, args.k, [None, *args.components], args.rescore)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
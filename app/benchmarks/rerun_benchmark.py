@@ -0,0 +1,123 @@
+"""
+Cost of one Streamlit rerun of the RAG chatbot page, before and after core.resources.
+
+Usage (from the app directory, with the Azure variables from .env set):
+    python -m benchmarks.rerun_benchmark --reruns 20 --sessions 5
+
+"rebuild" constructs what rag_chatbot.py used to build on every rerun (LLM,
+embedding function, Chroma client and storage, search tool, LLMMathChain,
+ReAct agent, executor). "cached" goes through the process-wide getters and
+only builds the per-session AgentExecutor and memory. Reports p50/p95 rerun
+latency and the Python memory each live rerun holds (tracemalloc). No
+network requests are made.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import tracemalloc
+
+import chromadb
+import numpy as np
+from chromadb.utils import embedding_functions
+from langchain.agents import AgentExecutor, Tool, create_react_agent
+from langchain.chains import LLMMathChain
+from langchain.memory import ConversationBufferMemory
+from langchain_core.prompts import PromptTemplate
+from langchain_openai import AzureChatOpenAI
+
+from core import resources
+from core.simple_rag import EMBEDDING_MODEL, ChromaSearchTool, get_query_embedding_function
+from core.storage import PerFileStorage
+
+PROMPT = PromptTemplate(
+    input_variables=["input", "tools", "tool_names", "chat_history", "agent_scratchpad"],
+    template="{tools}\n{tool_names}\n{chat_history}\nQuestion: {input}\nThought: {agent_scratchpad}"
+)
+
+
+def new_memory():
+    return ConversationBufferMemory(memory_key="chat_history", return_messages=True, output_key="output")
+
+
+def build_tools(search_tool, math_chain):
+    return [
+        Tool(name="Calculator", func=math_chain.run, description="math"),
+        Tool(name="SemanticSearch", func=search_tool.multiple_collection_search, description="search"),
+    ]
+
+
+def rebuild_rerun(memory, query_embeddings):
+    llm = AzureChatOpenAI(temperature=0.3, azure_deployment="gpt-4",
+                          api_version=os.getenv("AZURE_OPENAI_API_VERSION"))
+    openai_ef = embedding_functions.OpenAIEmbeddingFunction(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_type="azure",
+        model_name=EMBEDDING_MODEL,
+        api_version="2023-05-15"
+    )
+    storage = PerFileStorage(chromadb.PersistentClient(path="./chroma_db"), openai_ef)
+    search_tool = ChromaSearchTool(query_embeddings, storage=storage)
+    tools = build_tools(search_tool, LLMMathChain.from_llm(llm=llm))
+    agent = create_react_agent(llm=llm, tools=tools, prompt=PROMPT)
+    return AgentExecutor(agent=agent, tools=tools, memory=memory, max_iterations=3, handle_parsing_errors=True)
+
+
+def cached_rerun(memory, agent, tools):
+    resources.get_llm()
+    resources.get_shared_query_embeddings()
+    resources.get_search_tool()
+    return AgentExecutor(agent=agent, tools=tools, memory=memory, max_iterations=3, handle_parsing_errors=True)
+
+
+def measure(rerun, reruns, sessions):
+    memories = [new_memory() for _ in range(sessions)]
+    latencies = []
+    for i in range(reruns):
+        start = time.perf_counter()
+        rerun(memories[i % sessions])
+        latencies.append(time.perf_counter() - start)
+
+    # Objects held by concurrently running reruns, one per session
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    live = [rerun(memory) for memory in memories]
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del live
+
+    latencies = np.asarray(latencies[1:] or latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "memory_per_session_kb": held / sessions / 1024,
+    }
+
+
+def run(reruns=20, sessions=5):
+    query_embeddings = get_query_embedding_function()
+    report = {"reruns": reruns, "sessions": sessions}
+    report["rebuild"] = measure(lambda memory: rebuild_rerun(memory, query_embeddings), reruns, sessions)
+
+    search_tool = resources.get_search_tool()
+    tools = build_tools(search_tool, resources.get_math_chain())
+    agent = create_react_agent(llm=resources.get_llm(), tools=tools, prompt=PROMPT)
+    report["cached"] = measure(lambda memory: cached_rerun(memory, agent, tools), reruns, sessions)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure rerun latency and per-session memory of the RAG page")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=5)
+    args = parser.parse_args()
+
+    # Bare-mode warnings about the missing Streamlit script context
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    print(json.dumps(run(args.reruns, args.sessions), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Recall versus latency of retrieval configurations on a labeled question set.
+
+Usage (from the app directory):
+    python -m benchmarks.retrieval_evaluation --output evaluation.json
+    python -m benchmarks.retrieval_evaluation --documents ./docs --labels labels.jsonl --embeddings azure
+    python -m benchmarks.retrieval_evaluation --documents ./docs --labels labels.jsonl --embeddings offline \\
+        --chunks 1800/200 1000/100 --k 3 5 10 --backends numpy ivf int8 shared --lexical-weights 0 0.5
+
+Labels are JSON lines {"question", "document", "evidence"}: the file name of
+the document and a passage of it that answers the question. A retrieved chunk
+is relevant when it comes from that document and contains the evidence (or at
+least half of it, when the evidence straddles a chunk boundary), so labels
+stay valid whatever the chunk size. Without --labels a synthetic legal corpus
+with one fact per question is generated.
+
+Embeddings go through a CachedEmbeddingFunction (--cache). Run once with
+--embeddings azure to precompute them; --embeddings offline then serves only
+from the cache and fails on a miss, so the sweep needs no network. The
+default --embeddings fake uses the deterministic FakeEmbeddingFunction.
+
+Every chunk size/overlap is indexed once per backend: exact NumPy ("numpy"),
+NumPy with an IVF index ("ivf", swept over --nprobe), int8-compressed NumPy
+("int8", swept over --rescore), and Chroma HNSW ("shared", "per_file").
+Each index is then searched with ChromaSearchTool.search_collections for
+every k and lexical weight. recall@k is the share of questions with a
+relevant chunk in the top k, MRR uses the rank of the first one, and
+configurations that no other configuration beats on both recall@k and p95
+latency are marked as Pareto-optimal.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.pipeline_benchmark import FILLER, TOPICS, UploadedFile
+from core.embedding_cache import normalize_text
+
+FIRST_NAMES = "Olena Taras Iryna Andrii Oksana Dmytro Natalia Serhii Yulia Mykola Kateryna Bohdan".split()
+LAST_NAMES = "Kovalenko Shevchenko Bondarenko Tkachenko Kravchenko Melnyk Boyko Moroz Lysenko Savchenko".split()
+PAYMENTS = ["security deposit", "court fee", "compensation", "penalty", "alimony", "insurance premium",
+            "licence royalty", "tax assessment", "severance pay", "legal costs"]
+
+
+class OfflineEmbeddingFunction:
+    """Provider for --embeddings offline: every text must already be in the cache"""
+    def __call__(self, input):
+        raise RuntimeError(
+            f"{len(input)} texts are missing from the embedding cache; run once with --embeddings azure"
+        )
+
+
+def synthetic_dataset(documents=30, pages=4, facts_per_document=5, seed=0):
+    """Synthetic corpus as (file name, bytes) pairs and labels with one fact sentence per question"""
+    rng = np.random.default_rng(seed)
+    topics = list(TOPICS)
+    people = [(first, last) for first in FIRST_NAMES for last in LAST_NAMES]
+    subjects = rng.permutation(len(people) * len(PAYMENTS))
+    corpus, labels = [], []
+    for index in range(documents):
+        topic = topics[index % len(topics)]
+        vocabulary = TOPICS[topic].split()
+        name = f"case_{index:04}_{topic}.txt"
+        sentences = []
+        for _ in range(pages * 25):
+            words = rng.choice(vocabulary, size=6).tolist() + rng.choice(FILLER, size=6).tolist()
+            rng.shuffle(words)
+            sentences.append(" ".join(words).capitalize() + ".")
+        for fact in range(facts_per_document):
+            subject = subjects[(index * facts_per_document + fact) % len(subjects)]
+            first, last = people[subject // len(PAYMENTS)]
+            payment = PAYMENTS[subject % len(PAYMENTS)]
+            evidence = (f"On {rng.integers(1, 29)}.{rng.integers(1, 13):02}.20{rng.integers(15, 25)} "
+                        f"{first} {last} paid {rng.integers(1, 500) * 100} UAH as {payment} in the {topic} case.")
+            sentences.insert(int(rng.integers(len(sentences))), evidence)
+            labels.append({"question": f"How much did {first} {last} pay as {payment}?",
+                           "document": name, "evidence": evidence})
+        lines = [" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+        corpus.append((name, "\n\n".join(lines).encode()))
+    return corpus, labels
+
+
+def load_dataset(documents_directory, labels_path):
+    corpus = []
+    for name in sorted(os.listdir(documents_directory)):
+        path = os.path.join(documents_directory, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as document:
+                corpus.append((name, document.read()))
+    with open(labels_path, encoding="utf-8") as labels_file:
+        labels = [json.loads(line) for line in labels_file if line.strip()]
+    return corpus, labels
+
+
+def is_relevant(metadata, text, label):
+    """The chunk comes from the labeled document and holds the evidence, or at least half of it"""
+    if (metadata or {}).get("source") != label["document"]:
+        return False
+    text, evidence = normalize_text(text), normalize_text(label["evidence"])
+    if evidence in text:
+        return True
+    half = len(evidence) // 2
+    return evidence[:half] in text or evidence[-half:] in text
+
+
+def build_backend(backend, workdir, embeddings):
+    """Empty storage of the given backend under workdir"""
+    from core.numpy_store import NumpyStorage
+    from core.storage import PerFileStorage, SharedStorage
+
+    if backend in ("numpy", "ivf", "int8"):
+        return NumpyStorage(os.path.join(workdir, "vector_store"), embeddings)
+    import chromadb
+
+    client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma_db"))
+    if backend == "shared":
+        return SharedStorage(client, embeddings, catalog_path=os.path.join(workdir, "documents_catalog.sqlite"))
+    return PerFileStorage(client, embeddings)
+
+
+def index_corpus(corpus, backend, chunk_size, chunk_overlap, embeddings, workdir):
+    """Index the corpus into fresh stores under workdir, bypassing the process-wide indexes"""
+    from core.collection_router import CollectionRouter
+    from core.lexical_index import BM25Index
+    from core.simple_rag import DocumentProcessor, create_text_splitter
+
+    storage = build_backend(backend, workdir, embeddings)
+    lexical_index = BM25Index(os.path.join(workdir, "lexical_index.sqlite"))
+    router = CollectionRouter(os.path.join(workdir, "collection_router.sqlite"))
+    processor = DocumentProcessor(embeddings=embeddings, storage=storage, lexical_index=lexical_index,
+                                  router=router, text_splitter=create_text_splitter(chunk_size, chunk_overlap))
+    start = time.perf_counter()
+    for name, data in corpus:
+        processor.process_file(UploadedFile(name, data))
+    seconds = time.perf_counter() - start
+    if backend == "ivf":
+        storage.build_ivf()
+    elif backend == "int8":
+        storage.compress(evaluation_queries=0)
+    return storage, lexical_index, router, seconds
+
+
+def evaluate(tool, labels, k):
+    """recall@k, MRR and latency percentiles of search_collections over the labeled questions"""
+    latencies, found, reciprocal_ranks = [], 0, 0.0
+    for label in labels:
+        start = time.perf_counter()
+        hits = tool.search_collections(label["question"], k)
+        latencies.append(time.perf_counter() - start)
+        rank = next((i for i, (_, metadata, text) in enumerate(hits[:k], start=1)
+                     if is_relevant(metadata, text, label)), None)
+        if rank is not None:
+            found += 1
+            reciprocal_ranks += 1 / rank
+    milliseconds = np.asarray(latencies) * 1000
+    return {
+        "recall_at_k": found / len(labels),
+        "mrr": reciprocal_ranks / len(labels),
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+    }
+
+
+def search_settings(backend, nprobes, rescores):
+    """(label, storage attribute overrides) for the search-time parameters of a backend"""
+    if backend == "ivf":
+        return [(f"ivf nprobe={nprobe}", {"nprobe": nprobe}) for nprobe in nprobes]
+    if backend == "int8":
+        return [(f"int8 rescore={rescore}", {"rescore": rescore}) for rescore in rescores]
+    return [(backend, {})]
+
+
+def mark_pareto(results):
+    """Flag results not beaten on both recall@k and p95 latency by another result with the same k"""
+    for result in results:
+        result["pareto"] = not any(
+            other is not result and other["k"] == result["k"]
+            and other["recall_at_k"] >= result["recall_at_k"] and other["p95_ms"] <= result["p95_ms"]
+            and (other["recall_at_k"] > result["recall_at_k"] or other["p95_ms"] < result["p95_ms"])
+            for other in results
+        )
+    return results
+
+
+def sweep(corpus, labels, embeddings, chunks, backends, ks, lexical_weights, nprobes, rescores, route_top_ns):
+    from core.simple_rag import ChromaSearchTool
+
+    results = []
+    for chunk_size, chunk_overlap in chunks:
+        for backend in backends:
+            workdir = tempfile.mkdtemp(prefix=f"evaluation_{backend}_")
+            try:
+                storage, lexical_index, router, index_seconds = index_corpus(
+                    corpus, backend, chunk_size, chunk_overlap, embeddings, workdir)
+                chunk_count = sum(len(storage.get_chunk_ids(name)) for name in storage.list_documents())
+                print(f"Indexed {chunk_count} chunks of {chunk_size}/{chunk_overlap} into {backend} "
+                      f"in {index_seconds:.1f}s", file=sys.stderr)
+                for setting, overrides in search_settings(backend, nprobes, rescores):
+                    for name, value in overrides.items():
+                        setattr(storage, name, value)
+                    for lexical_weight in lexical_weights:
+                        for route_top_n in route_top_ns:
+                            tool = ChromaSearchTool(embeddings, storage=storage, lexical_index=lexical_index,
+                                                    lexical_weight=lexical_weight, router=router,
+                                                    route_top_n=route_top_n)
+                            for k in ks:
+                                tool.search_collections(labels[0]["question"], k)
+                                results.append({
+                                    "chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "chunks": chunk_count,
+                                    "backend": setting, "lexical_weight": lexical_weight,
+                                    "route_top_n": route_top_n, "k": k, **evaluate(tool, labels, k),
+                                })
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return mark_pareto(results)
+
+
+def print_table(results):
+    print(f"{'':2}{'chunks':>10}{'backend':>20}{'lexical':>9}{'route':>7}{'k':>4}"
+          f"{'recall@k':>10}{'MRR':>7}{'p50 ms':>9}{'p95 ms':>9}")
+    for result in sorted(results, key=lambda result: (result["k"], -result["recall_at_k"], result["p95_ms"])):
+        print(f"{'*' if result['pareto'] else '':2}{result['chunk_size']:>5}/{result['chunk_overlap']:<4}"
+              f"{result['backend']:>20}{result['lexical_weight']:>9.2f}{result['route_top_n']:>7}{result['k']:>4}"
+              f"{result['recall_at_k']:>10.3f}{result['mrr']:>7.3f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}")
+    print("* Pareto-optimal for its k: no other configuration has both higher recall@k and lower p95")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep retrieval configurations and report recall against latency")
+    parser.add_argument("--documents", default=None, help="Directory of documents to index (synthetic if omitted)")
+    parser.add_argument("--labels", default=None, help="JSONL file of question, document, evidence")
+    parser.add_argument("--synthetic-documents", type=int, default=30)
+    parser.add_argument("--embeddings", choices=["fake", "azure", "offline"], default="fake")
+    parser.add_argument("--cache", default="./cache/evaluation_embeddings.sqlite", help="Embedding cache file")
+    parser.add_argument("--model", default=None, help="Model name the cached embeddings are keyed by")
+    parser.add_argument("--chunks", nargs="+", default=["1800/200", "1000/100", "500/50"],
+                        help="Chunk size/overlap pairs")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "ivf", "int8", "shared"],
+                        choices=["numpy", "ivf", "int8", "shared", "per_file"])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[2, 8], help="IVF lists scanned per query")
+    parser.add_argument("--rescore", type=int, nargs="+", default=[2, 8], help="int8 shortlist size as a multiple of k")
+    parser.add_argument("--lexical-weights", type=float, nargs="+", default=[0.0, 0.5])
+    parser.add_argument("--route-top-n", type=int, nargs="+", default=[0], help="Documents routed to, 0 for all")
+    parser.add_argument("--output", default=None, help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    if args.documents and args.labels:
+        corpus, labels = load_dataset(args.documents, args.labels)
+    else:
+        corpus, labels = synthetic_dataset(args.synthetic_documents)
+
+    from core.embedding_cache import CachedEmbeddingFunction
+
+    if args.embeddings == "fake":
+        from core.fake_providers import FakeEmbeddingFunction
+
+        provider, model_name = FakeEmbeddingFunction(), "fake"
+    elif args.embeddings == "azure":
+        from core.simple_rag import EMBEDDING_MODEL, openai_ef
+
+        provider, model_name = openai_ef, EMBEDDING_MODEL
+    else:
+        from core.simple_rag import EMBEDDING_MODEL
+
+        provider, model_name = OfflineEmbeddingFunction(), EMBEDDING_MODEL
+    embeddings = CachedEmbeddingFunction(provider, model_name=args.model or model_name, path=args.cache)
+
+    chunks = [tuple(int(value) for value in pair.split("/")) for pair in args.chunks]
+    results = sweep(corpus, labels, embeddings, chunks, args.backends, args.k, args.lexical_weights,
+                    args.nprobe, args.rescore, args.route_top_n)
+    print(f"{len(labels)} questions over {len(corpus)} documents, embedding cache {embeddings.stats()}",
+          file=sys.stderr)
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"questions": len(labels), "documents": len(corpus), "results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Recall and latency of centroid routing as the number of documents grows.
+
+Usage (from the app directory):
+    python -m benchmarks.router_benchmark --collections 10 100 1000 10000 --top-n 2 4 8 16
+    python -m benchmarks.router_benchmark --collections 10 100 --chroma-max 100
+
+Documents are synthetic clusters of chunk vectors grouped into themes, so
+neighbouring documents overlap like related cases do. Queries are noisy
+copies of random chunks. recall@k compares exact search restricted to the
+routed documents with exact search over every chunk. Latencies cover the
+router lookup, an in-memory exact scan (all documents vs routed ones) and,
+up to --chroma-max documents, the real per-file Chroma fan-out.
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from core.collection_router import CollectionRouter
+from core.storage import PerFileStorage
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values) * 1000, q))
+
+
+def synthetic_corpus(collections, chunks_per_collection, dimensions, queries, seed=0):
+    rng = np.random.default_rng(seed)
+    themes = rng.standard_normal((max(1, int(np.sqrt(collections))), dimensions)).astype(np.float32)
+    documents = themes[rng.integers(len(themes), size=collections)] + 0.5 * rng.standard_normal(
+        (collections, dimensions)).astype(np.float32)
+    owners = np.repeat(np.arange(collections), chunks_per_collection)
+    vectors = documents[owners] + 2.0 * rng.standard_normal((len(owners), dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    sources = rng.choice(len(vectors), size=queries)
+    query_vectors = vectors[sources] + 0.5 * rng.standard_normal((queries, dimensions)).astype(np.float32) / np.sqrt(
+        dimensions)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, owners, query_vectors
+
+
+def top_k(vectors, query, k, rows=None):
+    candidates = vectors if rows is None else vectors[rows]
+    scores = candidates @ query
+    best = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return best if rows is None else rows[best]
+
+
+def chroma_latency(vectors, owners, query_vectors, k, top_n, routes):
+    workdir = tempfile.mkdtemp()
+    try:
+        client = chromadb.PersistentClient(path=workdir)
+        storage = PerFileStorage(client, None)
+        names = [f"doc-{i:05}" for i in range(owners.max() + 1)]
+        for i, name in enumerate(names):
+            rows = np.nonzero(owners == i)[0]
+            client.create_collection(name).add(ids=[str(r) for r in rows], embeddings=vectors[rows])
+        storage.query(query_vectors[0], k)
+
+        full, routed = [], {n: [] for n in top_n}
+        for query, route in zip(query_vectors, routes):
+            start = time.perf_counter()
+            storage.query(query, k)
+            full.append(time.perf_counter() - start)
+            for n in top_n:
+                start = time.perf_counter()
+                storage.query(query, k, documents=[names[i] for i in route[:n]])
+                routed[n].append(time.perf_counter() - start)
+        return full, routed
+    finally:
+        chromadb.api.client.SharedSystemClient.clear_system_cache()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(collections=10, chunks_per_collection=20, dimensions=256, queries=100, k=5, top_n=(2, 4, 8, 16),
+        chroma_max=100):
+    vectors, owners, query_vectors = synthetic_corpus(collections, chunks_per_collection, dimensions, queries)
+    workdir = tempfile.mkdtemp()
+    try:
+        router = CollectionRouter(f"{workdir}/router.sqlite")
+        for i in range(collections):
+            router.add(str(i), vectors[owners == i])
+        rows_by_document = [np.nonzero(owners == i)[0] for i in range(collections)]
+
+        route_latency, full_latency, routes, truths = [], [], [], []
+        for query in query_vectors:
+            start = time.perf_counter()
+            routes.append([int(name) for _, name in router.route(query, max(top_n))])
+            route_latency.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            truths.append(set(top_k(vectors, query, k)))
+            full_latency.append(time.perf_counter() - start)
+
+        report = {
+            "collections": collections, "chunks": len(vectors), "k": k,
+            "router_p50_ms": percentile(route_latency, 50), "router_p95_ms": percentile(route_latency, 95),
+            "full_scan_p50_ms": percentile(full_latency, 50), "top_n": {}
+        }
+        for n in top_n:
+            recalls, latencies = [], []
+            for query, route, truth in zip(query_vectors, routes, truths):
+                start = time.perf_counter()
+                rows = np.concatenate([rows_by_document[i] for i in route[:n]])
+                found = set(top_k(vectors, query, k, rows))
+                latencies.append(time.perf_counter() - start)
+                recalls.append(len(found & truth) / len(truth))
+            report["top_n"][n] = {"recall": float(np.mean(recalls)), "routed_scan_p50_ms": percentile(latencies, 50)}
+
+        if collections <= chroma_max:
+            full, routed = chroma_latency(vectors, owners, query_vectors, k, top_n, routes)
+            report["chroma_full_p50_ms"] = percentile(full, 50)
+            for n in top_n:
+                report["top_n"][n]["chroma_routed_p50_ms"] = percentile(routed[n], 50) + report["router_p50_ms"]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark collection routing")
+    parser.add_argument("--collections", type=int, nargs="*", default=[10, 100, 1000, 10000])
+    parser.add_argument("--chunks-per-collection", type=int, default=20)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--top-n", type=int, nargs="*", default=[2, 4, 8, 16])
+    parser.add_argument("--chroma-max", type=int, default=100,
+                        help="Also time real per-file Chroma search up to this many documents")
+    args = parser.parse_args()
+
+    reports = [
+        run(n, args.chunks_per_collection, args.dimensions, args.queries, args.k, args.top_n, args.chroma_max)
+        for n in args.collections
+    ]
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Compare the memory-mapped NumPy vector store with the Chroma path.
+
+Usage (from the app directory):
+    python -m benchmarks.vector_store_benchmark --chunks 20000 --queries 200
+
+Loads the same clustered random unit vectors into a Chroma collection and
+into NumpyStorage (brute force and IVF), then reports load and open time,
+p50/p95 query latency and recall@k against exact search. Runs offline in a
+temporary directory.
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from core.numpy_store import NumpyStorage
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values) * 1000, q)) if values else 0.0
+
+
+def recall_at_k(results, truth):
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth) if t]))
+
+
+def time_queries(search, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    return results, {"p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95)}
+
+
+def synthetic_vectors(chunks, dimensions, queries, seed=0):
+    """Clustered unit vectors (chunks of the same document sit around a shared topic) and nearby queries"""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(1, chunks // 100), dimensions)).astype(np.float32)
+    vectors = topics[np.arange(chunks) // 100 % len(topics)] + 0.8 * rng.standard_normal(
+        (chunks, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query_vectors = vectors[rng.choice(chunks, queries, replace=False)] + 0.1 * rng.standard_normal(
+        (queries, dimensions)).astype(np.float32) / np.sqrt(dimensions)
+    return vectors, query_vectors
+
+
+def exact_top_k(vectors, query_vectors, k):
+    distances = (vectors ** 2).sum(axis=1)[np.newaxis, :] - 2 * query_vectors @ vectors.T
+    return [list(np.argsort(row)[:k]) for row in distances]
+
+
+def run(chunks=20000, dimensions=1536, queries=200, k=10, n_lists=None, nprobe=8, seed=0):
+    vectors, query_vectors = synthetic_vectors(chunks, dimensions, queries, seed)
+    ids = [f"chunk-{i}" for i in range(chunks)]
+    texts = [f"chunk {i}" for i in range(chunks)]
+    metadatas = [{"document": f"doc-{i // 100}", "chunk": i % 100} for i in range(chunks)]
+
+    truth = exact_top_k(vectors, query_vectors, k)
+    report = {"chunks": chunks, "dimensions": dimensions, "queries": queries, "k": k}
+    workdir = tempfile.mkdtemp()
+
+    try:
+        client = chromadb.PersistentClient(path=f"{workdir}/chroma")
+        collection = client.create_collection("bench")
+        start = time.perf_counter()
+        for offset in range(0, chunks, 5000):
+            collection.add(ids=ids[offset:offset + 5000], embeddings=vectors[offset:offset + 5000],
+                           documents=texts[offset:offset + 5000], metadatas=metadatas[offset:offset + 5000])
+        load_seconds = time.perf_counter() - start
+        del client, collection
+        chromadb.api.client.SharedSystemClient.clear_system_cache()
+
+        start = time.perf_counter()
+        client = chromadb.PersistentClient(path=f"{workdir}/chroma")
+        collection = client.get_collection("bench")
+        collection.query(query_embeddings=[query_vectors[0]], n_results=k)
+        open_seconds = time.perf_counter() - start
+        results, latency = time_queries(
+            lambda q: [int(i.split("-")[1]) for i in collection.query(query_embeddings=[q], n_results=k)["ids"][0]],
+            query_vectors
+        )
+        report["chroma"] = {"load_s": load_seconds, "open_and_first_query_s": open_seconds,
+                            "recall": recall_at_k(results, truth), **latency}
+
+        store = NumpyStorage(f"{workdir}/numpy")
+        start = time.perf_counter()
+        for offset in range(0, chunks, 5000):
+            store.upsert(ids[offset:offset + 5000], vectors[offset:offset + 5000],
+                         texts[offset:offset + 5000], metadatas[offset:offset + 5000])
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = NumpyStorage(f"{workdir}/numpy", nprobe=nprobe)
+        store.search_rows(query_vectors[0], k)
+        open_seconds = time.perf_counter() - start
+        results, latency = time_queries(lambda q: [row for _, row in store.search_rows(q, k)], query_vectors)
+        report["numpy_brute_force"] = {"load_s": load_seconds, "open_and_first_query_s": open_seconds,
+                                       "recall": recall_at_k(results, truth), **latency}
+
+        start = time.perf_counter()
+        store.build_ivf(n_lists=n_lists)
+        build_seconds = time.perf_counter() - start
+        results, latency = time_queries(lambda q: [row for _, row in store.search_rows(q, k)], query_vectors)
+        report["numpy_ivf"] = {"build_s": build_seconds, "n_lists": len(store._ivf["centroids"]),
+                               "nprobe": nprobe, "recall": recall_at_k(results, truth), **latency}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NumpyStorage against Chroma")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=None, help="IVF lists (default: sqrt(chunks))")
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    report = run(args.chunks, args.dimensions, args.queries, args.k, args.lists, args.nprobe)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
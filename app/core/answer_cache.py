@@ -0,0 +1,124 @@
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+
+def corpus_fingerprint(document_hashes) -> str:
+    """
+    Fingerprint of the indexed documents an answer was produced from
+
+    Parameters:
+    document_hashes (dict): Document name -> content hash, as returned by storage.document_hashes()
+    """
+    entries = sorted(f"{name}\0{content_hash or ''}" for name, content_hash in document_hashes.items())
+    return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Process-wide cache of agent answers keyed by the question embedding.
+
+    A new question reuses a stored answer when its cosine similarity to a
+    cached question reaches `threshold`, both were asked in the same language
+    and search scope, and the indexed documents have not changed since the
+    answer was produced. Adding, deleting or re-indexing a document with new
+    content (in this process or another) changes the fingerprint and drops
+    every answer; the scope (the documents a session restricted its search
+    to) is matched per answer, so sessions with different scopes don't evict
+    each other.
+
+    Parameters:
+    threshold (float): Minimum cosine similarity for a hit
+    max_entries (int): Oldest answers are dropped beyond this size
+    """
+    def __init__(self, threshold=0.95, max_entries=1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.fingerprint = None
+        self.lookups = 0
+        self.hits = 0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._entries = []
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "seconds_saved": self.seconds_saved,
+        }
+
+    def invalidate(self):
+        """Drop every cached answer, e.g. after a document was added or deleted"""
+        with self._lock:
+            self._vectors = np.zeros((0, 0), dtype=np.float32)
+            self._entries = []
+
+    def _check_fingerprint(self, fingerprint):
+        if fingerprint != self.fingerprint:
+            self._vectors = np.zeros((0, 0), dtype=np.float32)
+            self._entries = []
+            self.fingerprint = fingerprint
+
+    def lookup(self, embedding, fingerprint, language=None, scope=None):
+        """
+        Return the cached entry for a similar question, or None
+
+        Parameters:
+        scope (list): Document names the search was restricted to, None or empty for all
+
+        Returns:
+        dict: question, answer, language, seconds (original latency), similarity
+        """
+        start = time.perf_counter()
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        scope = tuple(sorted(scope or ()))
+
+        with self._lock:
+            self.lookups += 1
+            self._check_fingerprint(fingerprint)
+            if not self._entries:
+                return None
+
+            similarities = self._vectors @ vector
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.threshold:
+                    return None
+                entry = self._entries[index]
+                if entry["scope"] == scope and (language is None or entry["language"] == language):
+                    self.hits += 1
+                    self.seconds_saved += max(0.0, entry["seconds"] - (time.perf_counter() - start))
+                    return {**entry, "similarity": float(similarities[index])}
+        return None
+
+    def add(self, embedding, fingerprint, question, answer, seconds, language=None, scope=None):
+        """Store an answer that took `seconds` to produce"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            if self._vectors.size == 0:
+                self._vectors = vector[np.newaxis, :]
+            else:
+                self._vectors = np.vstack([self._vectors, vector])
+            self._entries.append({
+                "question": question,
+                "answer": answer,
+                "language": language,
+                "scope": tuple(sorted(scope or ())),
+                "seconds": seconds,
+            })
+            if len(self._entries) > self.max_entries:
+                self._vectors = self._vectors[-self.max_entries:]
+                self._entries = self._entries[-self.max_entries:]
@@ -0,0 +1,236 @@
+"""
+Headless bulk ingestion of a whole document folder.
+
+Usage (from the app directory):
+    python -m core.bulk_ingest /path/to/filings --workers 8
+
+Files are parsed and split on a process pool, while embedding and writes run
+through DocumentProcessor's bounded embedding pipeline in the main process.
+Finished files are appended to a manifest, so an interrupted run can simply
+be started again and continues where it stopped; files whose content is
+already indexed are skipped by hash. Every file becomes the document named
+after its base name without extension, so the run refuses to start when two
+files (say contract.pdf and contract.docx, or two folders' notes.txt) would
+overwrite each other.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from core.loaders import SUPPORTED_EXTENSIONS, iter_chunks
+from core.simple_rag import DocumentProcessor, collection_name_for, create_text_splitter
+from core.storage import SHARED_COLLECTION_NAME
+from core.tracing import get_tracer, span
+
+DEFAULT_MANIFEST = "./cache/bulk_ingest_manifest.jsonl"
+
+_splitter = None
+
+
+def find_documents(root):
+    """Walk a directory tree and return supported files in a stable order"""
+    paths = []
+    for directory, _, file_names in os.walk(root):
+        for file_name in file_names:
+            if file_name.lower().endswith(SUPPORTED_EXTENSIONS):
+                paths.append(os.path.join(directory, file_name))
+    return sorted(paths)
+
+
+def file_key(path):
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def load_manifest(manifest_path):
+    """Return keys of files completed by previous runs and the path each document was ingested from"""
+    done, sources = set(), {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as manifest:
+            for line in manifest:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    done.add(record["key"])
+                    sources[record["collection"]] = record["path"]
+    return done, sources
+
+
+def find_name_conflicts(paths, sources=None):
+    """
+    Document names claimed by more than one file
+
+    Parameters:
+    paths (list): Files about to be ingested
+    sources (dict): Document name -> path ingested by earlier runs; paths that no longer exist are ignored
+
+    Returns:
+    dict: Document name -> sorted absolute paths, only for names with several files
+    """
+    claimed = defaultdict(set)
+    for name, path in (sources or {}).items():
+        if os.path.exists(path):
+            claimed[name].add(os.path.abspath(path))
+    for path in paths:
+        claimed[collection_name_for(path)].add(os.path.abspath(path))
+    return {name: sorted(files) for name, files in sorted(claimed.items()) if len(files) > 1}
+
+
+def parse_file(path):
+    """
+    Read and split one file. Runs in a worker process.
+
+    Returns:
+    tuple: (path, chunks, pages, content hash, parse seconds)
+    """
+    global _splitter
+    if _splitter is None:
+        _splitter = create_text_splitter()
+
+    start = time.perf_counter()
+    with open(path, "rb") as source:
+        data = source.read()
+    chunks = list(iter_chunks(os.path.basename(path), data, _splitter))
+    pages = max((chunk.metadata.get("page", 0) for chunk in chunks), default=-1) + 1
+    return path, chunks, pages, hashlib.sha256(data).hexdigest(), time.perf_counter() - start
+
+
+def bulk_ingest(root, workers=None, max_pending=None, manifest_path=DEFAULT_MANIFEST, processor=None):
+    """
+    Ingest every supported file below `root`
+
+    Parameters:
+    root (str): Directory to walk
+    workers (int): Parser processes, defaults to the number of CPUs
+    max_pending (int): Parsed-but-not-embedded files kept in memory, defaults to 2 * workers
+    manifest_path (str): JSONL file recording completed files for resume
+    processor (DocumentProcessor): Processor used for embedding and writes
+
+    Returns:
+    dict: Aggregate summary
+
+    Raises:
+    ValueError: If several files map to the same document name, or a file to the reserved one
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    processor = processor or DocumentProcessor()
+
+    manifest_dir = os.path.dirname(manifest_path)
+    if manifest_dir:
+        os.makedirs(manifest_dir, exist_ok=True)
+    done, sources = load_manifest(manifest_path)
+
+    paths = find_documents(root)
+    conflicts = find_name_conflicts(paths, sources)
+    if conflicts:
+        listing = "\n".join(f"  {name}: {', '.join(files)}" for name, files in conflicts.items())
+        raise ValueError(f"Several files map to the same document name; rename them first:\n{listing}")
+    reserved = [path for path in paths if collection_name_for(path) == SHARED_COLLECTION_NAME]
+    if reserved:
+        raise ValueError(f"The document name '{SHARED_COLLECTION_NAME}' is reserved; rename these files first:\n"
+                         + "\n".join(f"  {os.path.abspath(path)}" for path in reserved))
+    todo = [path for path in paths if file_key(path) not in done]
+    print(f"Found {len(paths)} files, {len(paths) - len(todo)} already ingested, {len(todo)} to go")
+
+    summary = {"files": 0, "failed": 0, "skipped": len(paths) - len(todo),
+               "pages": 0, "chunks": 0, "embedded": 0, "tokens": 0, "seconds": 0.0}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            open(manifest_path, "a", encoding="utf-8") as manifest:
+        queue = iter(todo)
+        pending = {}
+
+        def submit_next():
+            path = next(queue, None)
+            if path is not None:
+                pending[executor.submit(parse_file, path)] = path
+
+        for _ in range(max_pending):
+            submit_next()
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = pending.pop(future)
+                submit_next()
+                try:
+                    _, chunks, pages, content_hash, parse_seconds = future.result()
+                    name = collection_name_for(path)
+                    if processor.storage.document_hash(name) == content_hash:
+                        result = {"status": "exists", "collection_name": name}
+                    else:
+                        with span("ingest.bulk_file", file=os.path.basename(path), chunks=len(chunks)):
+                            # Parsing ran in a worker process; record its duration under this file's span
+                            get_tracer().record("ingest.parse_split", parse_seconds, items=len(chunks))
+                            result = processor.index_chunks(os.path.basename(path), chunks,
+                                                            content_hash=content_hash)
+                except Exception as e:
+                    summary["failed"] += 1
+                    print(f"FAILED  {path}: {e}")
+                    continue
+
+                if result["status"] == "exists":
+                    summary["skipped"] += 1
+                    manifest.write(json.dumps({"key": file_key(path), "path": path,
+                                               "collection": result["collection_name"]}) + "\n")
+                    manifest.flush()
+                    print(f"SKIPPED {path}: content already indexed")
+                    continue
+
+                stats = result["stats"]
+                summary["files"] += 1
+                summary["pages"] += pages
+                summary["chunks"] += stats["total_chunks"]
+                summary["embedded"] += stats["chunks"]
+                summary["tokens"] += stats["tokens"]
+                manifest.write(json.dumps({
+                    "key": file_key(path),
+                    "path": path,
+                    "collection": result["collection_name"],
+                    "pages": pages,
+                    "chunks": stats["total_chunks"],
+                }) + "\n")
+                manifest.flush()
+                print(
+                    f"OK      {path}: {pages} pages, {stats['total_chunks']} chunks ({stats['chunks']} embedded), "
+                    f"parse {parse_seconds:.2f}s, embed {stats['seconds']:.2f}s "
+                    f"({stats['chunks_per_second']:.1f} chunks/s, {stats['cache_hits']} cached)"
+                )
+
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = elapsed
+    summary["files_per_second"] = summary["files"] / elapsed if elapsed else 0.0
+    summary["pages_per_second"] = summary["pages"] / elapsed if elapsed else 0.0
+    summary["chunks_per_second"] = summary["chunks"] / elapsed if elapsed else 0.0
+    summary["tokens_per_second"] = summary["tokens"] / elapsed if elapsed else 0.0
+
+    print(
+        f"\nIngested {summary['files']} files ({summary['failed']} failed, {summary['skipped']} skipped) "
+        f"in {elapsed:.1f}s: {summary['pages']} pages, {summary['chunks']} chunks, {summary['embedded']} embedded | "
+        f"{summary['files_per_second']:.2f} files/s, {summary['pages_per_second']:.1f} pages/s, "
+        f"{summary['chunks_per_second']:.1f} chunks/s, {summary['tokens_per_second']:.0f} tokens/s"
+    )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest a folder of PDF/DOCX/TXT documents into ChromaDB")
+    parser.add_argument("root", help="Directory to ingest recursively")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--embed-workers", type=int, default=4, help="Concurrent embedding batches")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding request")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="Resume manifest path")
+    args = parser.parse_args()
+
+    processor = DocumentProcessor(batch_size=args.batch_size, max_workers=args.embed_workers)
+    bulk_ingest(args.root, workers=args.workers, manifest_path=args.manifest, processor=processor)
+
+
+if __name__ == "__main__":
+    main()
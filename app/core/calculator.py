@@ -0,0 +1,158 @@
+import calendar
+import math
+import re
+import threading
+import time
+from datetime import date, timedelta
+
+import numexpr
+
+DATE = r"(\d{4}-\d{2}-\d{2}|\d{1,2}\.\d{1,2}\.\d{4}|today|сьогодні)"
+UNITS = {
+    "day": "days", "days": "days", "день": "days", "дні": "days", "днів": "days",
+    "week": "weeks", "weeks": "weeks", "тиждень": "weeks", "тижні": "weeks", "тижнів": "weeks",
+    "month": "months", "months": "months", "місяць": "months", "місяці": "months", "місяців": "months",
+    "year": "years", "years": "years", "рік": "years", "роки": "years", "років": "years",
+}
+DATE_OFFSET = re.compile(rf"^{DATE}\s*([+-])\s*(\d+)\s*({'|'.join(UNITS)})$")
+DATE_DIFFERENCE = re.compile(
+    rf"^(?:days (?:between|from)\s+|днів (?:між|від)\s+)?{DATE}\s*(-|and|to|і|та|до)\s*{DATE}$"
+)
+PERCENT_OF = re.compile(r"(\d+(?:\.\d+)?)\s*%\s*(?:of|від)\s*(\d+(?:\.\d+)?)")
+# "<expression> + 15%" changes the value of the whole expression before it
+PERCENT_CHANGE = re.compile(r"^(.+?)\s*([+-])\s*(\d+(?:\.\d+)?)\s*%$")
+# A percentage that is only multiplied or divided ("200 * 15%") is just a fraction
+PERCENT_FACTOR = re.compile(r"(?:^|(?<=[*/]))\s*(\d+(?:\.\d+)?)\s*%(?=\s*(?:[*/]|$))")
+# Only commas group thousands; a space between numbers is never read as a separator
+NUMBER_WITH_SEPARATORS = re.compile(r"(?<![\d.,])\d{1,3}(?:,\d{3})+(?:\.\d+)?(?![\d.,])")
+EXPRESSION = re.compile(r"[\d\s.+\-*/()a-z0-9]+")
+FUNCTIONS = {"sqrt", "log", "log10", "exp", "sin", "cos", "tan", "abs", "pi"}
+PREFIXES = re.compile(
+    r"^(what is|what's|calculate|compute|evaluate|how much is|скільки буде|обчисли|порахуй)\s+", re.IGNORECASE
+)
+
+
+def _parse_date(text):
+    if text in ("today", "сьогодні"):
+        return date.today()
+    if "." in text:
+        day, month, year = map(int, text.split("."))
+        return date(year, month, day)
+    return date.fromisoformat(text)
+
+
+def _add_months(value, months):
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def _evaluate_date(text):
+    match = DATE_OFFSET.match(text)
+    if match:
+        start, sign, amount, unit = _parse_date(match[1]), match[2], int(match[3]), UNITS[match[4]]
+        amount = amount if sign == "+" else -amount
+        if unit == "days":
+            return (start + timedelta(days=amount)).isoformat()
+        if unit == "weeks":
+            return (start + timedelta(weeks=amount)).isoformat()
+        return _add_months(start, amount * (12 if unit == "years" else 1)).isoformat()
+    match = DATE_DIFFERENCE.match(text)
+    if match:
+        first, second = _parse_date(match[1]), _parse_date(match[3])
+        # "A - B" subtracts like numbers; "between/from A and/to B" counts from A to B, negative if B is earlier
+        days = (first - second).days if match[2] == "-" else (second - first).days
+        return f"{days} days"
+    return None
+
+
+def _format_number(value):
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError("result is not finite")
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return f"{value:.10g}"
+
+
+def normalize(text):
+    """Rewrite a natural arithmetic question into a numexpr expression"""
+    text = PREFIXES.sub("", text.strip().lower()).rstrip("?=. ")
+    text = re.sub(r"[$€₴£]|\b(usd|eur|uah|грн)\b", "", text)
+    text = NUMBER_WITH_SEPARATORS.sub(lambda match: re.sub(r"[, ]", "", match[0]), text)
+    text = text.replace("×", "*").replace("÷", "/").replace("^", "**").replace(",", ".")
+    text = re.sub(r"(?<=\d)\s*x\s*(?=\d)", "*", text)
+    text = PERCENT_OF.sub(lambda match: f"({match[1]} / 100 * {match[2]})", text)
+    text = PERCENT_FACTOR.sub(lambda match: f"({match[1]} / 100)", text)
+    match = PERCENT_CHANGE.match(text)
+    if match and "%" not in match[1]:
+        text = f"({match[1]}) * (1 {match[2]} {match[3]} / 100)"
+    # Any other "%" (several percentages, "2 + 15% * 3") has no single reading and is left to the fallback
+    return " ".join(text.split())
+
+
+class Calculator:
+    """
+    Calculator tool that evaluates arithmetic, percentages and dates locally.
+
+    Inputs such as "1,250 + 15%", "15% of 2300", "2024-03-15 + 30 days" or
+    "days between 2024-01-01 and 2024-03-01" are parsed with regular
+    expressions and evaluated with numexpr without a model call. A trailing
+    "+ N%" or "- N%" applies to the whole expression before it
+    ("1000 - 200 + 15%" is 920), and a day count is signed (negative when the
+    second date is earlier). Anything that is not a parseable expression,
+    including a percentage whose meaning is ambiguous, goes to `fallback`,
+    normally LLMMathChain.run. How often each path runs and its time are counted.
+
+    Parameters:
+    fallback: Callable taking the question and returning an answer, or None
+    """
+    def __init__(self, fallback=None):
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._stats = {"local": [0, 0.0], "llm": [0, 0.0]}
+
+    def evaluate(self, text):
+        """
+        Returns:
+        str: Result of the expression, or None if it can't be evaluated locally
+        """
+        expression = normalize(text)
+        if not expression:
+            return None
+        try:
+            result = _evaluate_date(expression)
+            if result is not None:
+                return result
+            if not EXPRESSION.fullmatch(expression) or not re.search(r"\d", expression):
+                return None
+            # Letters are only allowed as known function names, not as part of numbers like 1e3
+            if not set(re.findall(r"(?<![\d.])[a-z_]\w*", expression)) <= FUNCTIONS:
+                return None
+            return _format_number(numexpr.evaluate(expression, global_dict={}, local_dict={"pi": math.pi}))
+        except (ValueError, SyntaxError, KeyError, TypeError, ZeroDivisionError, OverflowError):
+            return None
+
+    def run(self, text):
+        start = time.perf_counter()
+        result = self.evaluate(text)
+        if result is not None:
+            self._count("local", time.perf_counter() - start)
+            return f"Answer: {result}"
+        if self.fallback is None:
+            return f"Answer: could not evaluate '{text}'"
+        answer = self.fallback(text)
+        self._count("llm", time.perf_counter() - start)
+        return answer
+
+    def _count(self, path, seconds):
+        with self._lock:
+            self._stats[path][0] += 1
+            self._stats[path][1] += seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                path: {"calls": calls, "avg_ms": seconds / calls * 1000 if calls else 0.0}
+                for path, (calls, seconds) in self._stats.items()
+            }
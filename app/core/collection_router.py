@@ -0,0 +1,167 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_PATH = "./chroma_db/collection_router.sqlite"
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_collection_router(path=DEFAULT_PATH):
+    """Process-wide collection router for a path, shared by ingestion and search"""
+    with _routers_lock:
+        if path not in _routers:
+            _routers[path] = CollectionRouter(path)
+        return _routers[path]
+
+
+class CollectionRouter:
+    """
+    Per-document centroid index used to pick which documents to search.
+
+    Every document keeps the sum and count of its chunk embeddings in SQLite,
+    so chunks are added and removed incrementally by DocumentProcessor without
+    reading the rest of the document, and each change is a read-modify-write
+    inside one transaction; several processes (the app and bulk ingestion)
+    can update the same file without losing each other's documents. A query
+    is compared with all centroids in one matrix product and only the best
+    `top_n` documents are searched in full. The matrix is rebuilt when another
+    connection has committed a change.
+
+    Parameters:
+    path (str): SQLite file holding the sums and counts
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        # Transactions are opened explicitly with BEGIN IMMEDIATE so concurrent writers queue up
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS centroids (
+                document TEXT PRIMARY KEY,
+                sum BLOB NOT NULL,
+                count INTEGER NOT NULL
+            )
+        """)
+        self._matrix = None
+        self._names = []
+        self._version = None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM centroids").fetchone()[0]
+
+    def __contains__(self, name):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM centroids WHERE document = ?", (name,)).fetchone() is not None
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._matrix = None
+
+    def _change(self, name, vectors, sign):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT sum, count FROM centroids WHERE document = ?", (name,)).fetchone()
+            if row is None and sign < 0:
+                return
+            total = np.frombuffer(row[0], dtype=np.float64) if row else 0
+            count = (row[1] if row else 0) + sign * len(vectors)
+            if count <= 0:
+                conn.execute("DELETE FROM centroids WHERE document = ?", (name,))
+                return
+            total = total + sign * vectors.sum(axis=0)
+            conn.execute("INSERT OR REPLACE INTO centroids (document, sum, count) VALUES (?, ?, ?)",
+                         (name, total.tobytes(), count))
+
+    def add(self, name, embeddings):
+        """Add chunk embeddings to a document's centroid"""
+        vectors = np.asarray(embeddings, dtype=np.float64)
+        if len(vectors):
+            self._change(name, vectors, 1)
+
+    def subtract(self, name, embeddings):
+        """Remove chunk embeddings that were deleted from a document"""
+        vectors = np.asarray(embeddings, dtype=np.float64)
+        if len(vectors):
+            self._change(name, vectors, -1)
+
+    def remove_document(self, name):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM centroids WHERE document = ?", (name,))
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM centroids")
+
+    def _centroids(self):
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if not self._names or self._matrix is None or version != self._version:
+            rows = self._conn.execute("SELECT document, sum, count FROM centroids ORDER BY document").fetchall()
+            self._names = [name for name, _, _ in rows]
+            self._matrix = None
+            if rows:
+                matrix = np.stack([np.frombuffer(total, dtype=np.float64) / count for _, total, count in rows])
+                matrix = matrix.astype(np.float32)
+                matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+                self._matrix = matrix
+            self._version = version
+        return self._names, self._matrix
+
+    def route(self, query_embedding, top_n=8, documents=None):
+        """
+        Documents whose centroids are most similar to the query
+
+        Parameters:
+        query_embedding: Query vector
+        top_n (int): Number of documents to return
+        documents (list): Optional names to choose from
+
+        Returns:
+        list: (cosine similarity, document name) pairs, best first
+        """
+        with self._lock:
+            names, matrix = self._centroids()
+        if not names:
+            return []
+        similarities = matrix @ np.asarray(query_embedding, dtype=np.float32)
+        if documents:
+            allowed = set(documents)
+            similarities = np.where([name in allowed for name in names], similarities, -np.inf)
+        top_n = min(top_n, len(names))
+        best = np.argpartition(-similarities, top_n - 1)[:top_n]
+        best = best[np.argsort(-similarities[best])]
+        return [(float(similarities[i]), names[i]) for i in best if np.isfinite(similarities[i])]
+
+
+def rebuild(path=DEFAULT_PATH):
+    """Rebuild the router from the embeddings already stored for every document"""
+    from core.simple_rag import get_storage
+
+    storage = get_storage()
+    router = get_collection_router(path)
+    router.clear()
+    for name in storage.list_documents():
+        ids = list(storage.get_chunk_ids(name))
+        for start in range(0, len(ids), 1000):
+            router.add(name, storage.get_embeddings(name, ids[start:start + 1000]))
+    print(f"Routed {len(router)} documents into {path}")
+
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,191 @@
+import threading
+
+import numpy as np
+
+from core.tokens import count_tokens
+
+
+def merge_adjacent(hits, max_gap=16):
+    """
+    Merge overlapping or adjacent chunks of the same document page into passages
+
+    Chunks are placed by their `offset` metadata (start index in the page), so
+    the 200-character splitter overlap is kept only once. Chunks separated by
+    at most `max_gap` characters (the whitespace the splitter stripped at a
+    paragraph break) are joined with a newline.
+
+    Parameters:
+    hits: (score, metadata, text, embedding) tuples, best first; embedding may be None
+
+    Returns:
+    list: passage dicts (rank, score, metadata, text, embeddings, chunks), best first
+    """
+    groups = {}
+    passages = []
+    for rank, (score, metadata, text, embedding) in enumerate(hits):
+        metadata = metadata or {}
+        document = metadata.get("document") or metadata.get("source")
+        offset = metadata.get("offset")
+        passage = {"rank": rank, "score": score, "metadata": metadata, "text": text,
+                   "embeddings": [embedding], "chunks": 1}
+        if document is None or offset is None:
+            passages.append(passage)
+            continue
+        passage["end"] = offset + len(text)
+        groups.setdefault((document, metadata.get("page")), []).append((offset, passage))
+
+    for members in groups.values():
+        members.sort(key=lambda member: member[0])
+        current = None
+        for offset, passage in members:
+            if current is None or offset > current["end"] + max_gap:
+                current = passage
+                passages.append(current)
+                continue
+            if offset > current["end"]:
+                current["text"] += "\n" + passage["text"]
+                current["end"] = passage["end"]
+            elif passage["end"] > current["end"]:
+                current["text"] += passage["text"][current["end"] - offset:]
+                current["end"] = passage["end"]
+            current["rank"] = min(current["rank"], passage["rank"])
+            current["score"] = min(current["score"], passage["score"])
+            current["embeddings"] += passage["embeddings"]
+            current["chunks"] += 1
+
+    passages.sort(key=lambda passage: passage["rank"])
+    return passages
+
+
+def _passage_matrix(passages, dimensions):
+    """Unit-length mean embedding per passage; zero rows for passages without embeddings"""
+    matrix = np.zeros((len(passages), dimensions), dtype=np.float32)
+    for i, passage in enumerate(passages):
+        vectors = [np.asarray(e, dtype=np.float32) for e in passage["embeddings"] if e is not None]
+        if not vectors:
+            continue
+        vectors = np.stack(vectors)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        mean = vectors.mean(axis=0)
+        matrix[i] = mean / max(float(np.linalg.norm(mean)), 1e-12)
+    return matrix
+
+
+def mmr_order(relevance, matrix, diversity=0.3, duplicate_threshold=0.95):
+    """
+    Maximal marginal relevance ordering over unit vectors
+
+    Each step picks the candidate maximizing
+    (1 - diversity) * relevance - diversity * max similarity to the picked ones.
+    Candidates more similar than `duplicate_threshold` to a picked passage are dropped.
+
+    Returns:
+    tuple: (ordered indices, number of dropped near-duplicates)
+    """
+    remaining = np.ones(len(relevance), dtype=bool)
+    max_similarity = np.zeros(len(relevance), dtype=np.float32)
+    order, duplicates = [], 0
+    while remaining.any():
+        scores = (1 - diversity) * relevance - diversity * max_similarity
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        remaining[best] = False
+        order.append(best)
+        max_similarity = np.maximum(max_similarity, matrix @ matrix[best])
+        near_duplicates = remaining & (max_similarity >= duplicate_threshold)
+        duplicates += int(near_duplicates.sum())
+        remaining &= ~near_duplicates
+    return order, duplicates
+
+
+class ContextPacker:
+    """
+    Assemble search hits into a token-budgeted context for the agent.
+
+    Candidate chunks are merged into passages when they overlap, near-duplicate
+    passages are dropped and the rest are ordered by MMR over their stored
+    embeddings, then passages are added in that order while they fit in
+    `token_budget`. Every call is compared with what returning the top k raw
+    chunks would have cost, and the savings are accumulated.
+
+    Parameters:
+    token_budget (int): Maximum tokens of retrieved text per search
+    diversity (float): MMR trade-off, 0 = relevance only
+    duplicate_threshold (float): Cosine similarity above which a passage is a duplicate
+    candidates (int): Hits retrieved per search as a multiple of k
+    """
+    def __init__(self, token_budget=1500, diversity=0.3, duplicate_threshold=0.95, candidates=3):
+        self.token_budget = token_budget
+        self.diversity = diversity
+        self.duplicate_threshold = duplicate_threshold
+        self.candidates = candidates
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._tokens = 0
+        self._baseline_tokens = 0
+        self._merged = 0
+        self._duplicates = 0
+
+    def pack(self, hits, k=5):
+        """
+        Parameters:
+        hits: (score, metadata, text, embedding) tuples, lower score is better, best first
+        k (int): Number of chunks the agent used to receive
+
+        Returns:
+        dict: passages as (score, metadata, text) tuples plus token statistics
+        """
+        baseline_tokens = sum(count_tokens(text) for _, _, text, _ in hits[:k])
+        passages = merge_adjacent(hits)
+        if not passages:
+            return {"passages": [], "tokens": 0, "baseline_tokens": 0, "tokens_saved": 0,
+                    "merged": 0, "duplicates": 0}
+
+        dimensions = next((len(e) for p in passages for e in p["embeddings"] if e is not None), 1)
+        scores = np.asarray([passage["score"] for passage in passages], dtype=np.float32)
+        spread = float(scores.max() - scores.min())
+        relevance = 1 - (scores - scores.min()) / spread if spread > 0 else np.ones(len(scores), dtype=np.float32)
+        order, duplicates = mmr_order(relevance, _passage_matrix(passages, dimensions),
+                                      self.diversity, self.duplicate_threshold)
+
+        selected, tokens = [], 0
+        for index in order:
+            passage = passages[index]
+            text = passage["text"]
+            passage_tokens = count_tokens(text)
+            if tokens + passage_tokens > self.token_budget:
+                if selected:
+                    continue
+                # The best passage alone is over budget: keep its beginning rather than nothing
+                text = text[:len(text) * self.token_budget // passage_tokens]
+                passage_tokens = count_tokens(text)
+            selected.append((passage["score"], passage["metadata"], text))
+            tokens += passage_tokens
+            if len(selected) == k:
+                break
+
+        with self._lock:
+            self._queries += 1
+            self._tokens += tokens
+            self._baseline_tokens += baseline_tokens
+            self._merged += len(hits) - len(passages)
+            self._duplicates += duplicates
+        return {
+            "passages": selected,
+            "tokens": tokens,
+            "baseline_tokens": baseline_tokens,
+            "tokens_saved": baseline_tokens - tokens,
+            "merged": len(hits) - len(passages),
+            "duplicates": duplicates,
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queries": self._queries,
+                "tokens": self._tokens,
+                "baseline_tokens": self._baseline_tokens,
+                "tokens_saved": self._baseline_tokens - self._tokens,
+                "merged": self._merged,
+                "duplicates": self._duplicates,
+            }
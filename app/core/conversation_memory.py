@@ -0,0 +1,77 @@
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.messages import BaseMessage, HumanMessage
+from pydantic import Field
+
+from core.tokens import count_tokens
+
+# Role and separator tokens the chat format adds to every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_tokens(message):
+    return count_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+
+
+class TokenBudgetMemory(ConversationSummaryBufferMemory):
+    """
+    Chat memory that keeps recent turns verbatim within `max_token_limit`.
+
+    When the window grows past the budget, the oldest whole turns (a question
+    and its answer) are removed and folded into the running summary with one
+    LLM call that extends the previous summary, so earlier turns are never
+    re-summarized. Tokens are counted with core.tokens instead of the model's
+    tokenizer. Removed messages are kept in `archived_messages` for display
+    only; they are not sent to the model again.
+
+    Parameters:
+    llm: Model that writes the summary, or None to build it with `llm_factory`
+    llm_factory: Called on the first summary, so the model isn't loaded until the budget is exceeded
+    max_token_limit (int): Token budget of the verbatim window
+    """
+    llm: Optional[Any] = None
+    llm_factory: Optional[Callable[[], Any]] = None
+    archived_messages: List[BaseMessage] = Field(default_factory=list)
+    turns: List[Dict[str, Any]] = Field(default_factory=list)
+    summary_calls: int = 0
+
+    def prune(self) -> None:
+        messages = self.chat_memory.messages
+        total = sum(message_tokens(message) for message in messages)
+        pruned = []
+        # Drop from the front one turn at a time, always keeping the latest turn
+        while total > self.max_token_limit and len(messages) > 2:
+            while True:
+                message = messages.pop(0)
+                pruned.append(message)
+                total -= message_tokens(message)
+                if len(messages) <= 2 or isinstance(messages[0], HumanMessage):
+                    break
+        if pruned:
+            if self.llm is None:
+                self.llm = self.llm_factory()
+            self.moving_summary_buffer = self.predict_new_summary(pruned, self.moving_summary_buffer)
+            self.archived_messages.extend(pruned)
+            self.summary_calls += 1
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        self.turns.append(self.token_usage())
+
+    def token_usage(self):
+        """Tokens of the history injected into the next prompt"""
+        summary_tokens = count_tokens(self.moving_summary_buffer)
+        window_tokens = sum(message_tokens(message) for message in self.chat_memory.messages)
+        return {
+            "history_tokens": summary_tokens + window_tokens,
+            "summary_tokens": summary_tokens,
+            "window_tokens": window_tokens,
+            "window_messages": len(self.chat_memory.messages),
+            "summarized_messages": len(self.archived_messages),
+        }
+
+    def clear(self) -> None:
+        super().clear()
+        self.archived_messages = []
+        self.turns = []
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so formatting-only differences map to the same cache key"""
+    return " ".join(text.split())
+
+
+def normalize_query(text: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a search query"""
+    return normalize_text(text).lower().strip(" ?!.,;:'\"")
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Persistent, content-addressed cache in front of an embedding function.
+
+    Vectors are stored in SQLite under sha256(model name + normalized text), so
+    identical chunks are embedded once no matter which document they come from.
+    The least recently used entries are evicted once `max_entries` is exceeded.
+
+    Parameters:
+    embedding_function: Wrapped Chroma-style embedding function
+    model_name (str): Embedding model name, part of the cache key
+    path (str): SQLite file holding the cache
+    max_entries (int): Maximum number of cached vectors
+    ttl (float): Seconds after which an entry is re-embedded, None to keep entries forever
+    normalize: Function mapping a text to the form used in the cache key
+    """
+    def __init__(self, embedding_function, model_name, path="./cache/embeddings.sqlite",
+                 max_entries=500_000, ttl=None, normalize=normalize_text):
+        self.embedding_function = embedding_function
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.normalize = normalize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                created_at REAL
+            )
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")]
+        if "created_at" not in columns:
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN created_at REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate, "entries": len(self)}
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> str:
+        payload = f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        unique_keys = list(set(keys))
+        now = time.time()
+        oldest = now - self.ttl if self.ttl else None
+        with self._lock:
+            for start in range(0, len(unique_keys), 500):
+                part = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, created_at FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob, created_at in rows:
+                    if oldest is None or (created_at or 0) >= oldest:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used, created_at) VALUES (?, ?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now, now) for key, vector in items]
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [self.key(text) for text in input]
+        cached = self._lookup(keys)
+
+        missing = {}
+        for key, text in zip(keys, input):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        hits = sum(1 for key in keys if key in cached)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        if missing:
+            vectors = self.embedding_function(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed.items())
+            cached.update(computed)
+
+        return [np.asarray(cached[key], dtype=np.float32) for key in keys]
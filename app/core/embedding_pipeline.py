@@ -0,0 +1,133 @@
+import contextvars
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+
+from core.tokens import count_tokens
+from core.tracing import span
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """Check whether an embedding error is a rate limit / throttling response"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+def batched(iterable, size):
+    """Yield lists of at most `size` items from any iterable without materializing it"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class EmbeddingPipeline:
+    """
+    Embeds chunks in batches on a thread pool and writes each batch to the
+    collection as soon as its embeddings arrive.
+
+    Parameters:
+    embedding_function: Chroma-style embedding function (list of texts -> list of vectors)
+    batch_size (int): Number of chunks sent to the provider in one request
+    max_workers (int): Number of batches embedded at the same time
+    max_retries (int): Retries for a throttled batch before giving up
+    backoff (float): Initial retry delay in seconds, doubled on every retry
+    max_backoff (float): Upper bound for a single retry delay
+    """
+    def __init__(self, embedding_function, batch_size=64, max_workers=4,
+                 max_retries=5, backoff=1.0, max_backoff=30.0):
+        self.embedding_function = embedding_function
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def _embed_batch(self, batch):
+        ids, texts, metadatas = zip(*batch)
+        retries = 0
+        with span("ingest.embed", chunks=len(ids)) as current:
+            while True:
+                try:
+                    embeddings = self.embedding_function(list(texts))
+                    break
+                except Exception as e:
+                    if not is_throttling_error(e) or retries >= self.max_retries:
+                        raise
+                    delay = min(self.max_backoff, self.backoff * 2 ** retries)
+                    time.sleep(delay + random.uniform(0, delay / 2))
+                    retries += 1
+            current.set(retries=retries)
+
+        tokens = sum(count_tokens(text) for text in texts)
+        return list(ids), list(texts), list(metadatas), embeddings, tokens, retries
+
+    def _write(self, future, collection, stats, start, progress):
+        ids, texts, metadatas, embeddings, tokens, retries = future.result()
+        # Chroma rejects empty metadata dicts but accepts None per chunk, so one bare chunk keeps the others' metadata
+        metadatas = [metadata or None for metadata in metadatas]
+        with span("ingest.write", chunks=len(ids)):
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=None if all(metadata is None for metadata in metadatas) else metadatas
+            )
+
+        stats["chunks"] += len(ids)
+        stats["tokens"] += tokens
+        stats["batches"] += 1
+        stats["retries"] += retries
+        elapsed = time.perf_counter() - start
+        stats["seconds"] = elapsed
+        stats["chunks_per_second"] = stats["chunks"] / elapsed if elapsed else 0.0
+        stats["tokens_per_second"] = stats["tokens"] / elapsed if elapsed else 0.0
+        if progress is not None:
+            progress(dict(stats))
+
+    def run(self, records, collection, progress=None):
+        """
+        Embed and store chunks
+
+        Parameters:
+        records: Iterable of (id, text, metadata) tuples, consumed lazily
+        collection: Object with a Chroma-compatible `upsert` method
+        progress: Optional callback receiving a copy of the stats after each written batch
+
+        Returns:
+        dict: chunks, tokens, batches, retries, seconds, chunks_per_second, tokens_per_second
+        """
+        stats = {
+            "chunks": 0, "tokens": 0, "batches": 0, "retries": 0,
+            "seconds": 0.0, "chunks_per_second": 0.0, "tokens_per_second": 0.0
+        }
+        start = time.perf_counter()
+        max_pending = self.max_workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            try:
+                for batch in batched(records, self.batch_size):
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._write(future, collection, stats, start, progress)
+                    # Copy the context so the embed spans nest under the caller's span
+                    pending.add(executor.submit(contextvars.copy_context().run, self._embed_batch, batch))
+
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._write(future, collection, stats, start, progress)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        stats["seconds"] = time.perf_counter() - start
+        return stats
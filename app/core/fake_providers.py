@@ -0,0 +1,111 @@
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from core.tokens import count_tokens
+
+
+class ThrottlingError(Exception):
+    """Simulated HTTP 429 response from the embedding provider"""
+    status_code = 429
+
+
+class FakeEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Offline, deterministic stand-in for the Azure OpenAI embedding function.
+
+    Texts are embedded as signed hashed bags of words, so texts sharing words
+    get similar vectors and retrieval behaves sensibly without any API calls.
+
+    Parameters:
+    dimensions (int): Vector size (ada-002 uses 1536)
+    latency (float): Seconds to sleep per call, to imitate a remote round trip
+    throttle_every (int): Raise ThrottlingError on every n-th call (0 disables)
+    """
+    def __init__(self, dimensions=1536, latency=0.0, throttle_every=0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            norm = 1.0
+        return vector / norm
+
+    def __call__(self, input: Documents) -> Embeddings:
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if self.throttle_every and calls % self.throttle_every == 0:
+            raise ThrottlingError("429 Too Many Requests (simulated)")
+        with self._lock:
+            self.texts_embedded += len(input)
+        return [self._embed(text) for text in input]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline, deterministic stand-in for the Azure OpenAI chat model.
+
+    The reply quotes the beginning of the first retrieved document in the
+    prompt (or of the prompt itself) after "Final Answer:", so the ReAct agent
+    finishes in one step and the direct answer path gets a sensible answer.
+    Tokens are streamed word by word.
+
+    Parameters:
+    latency (float): Seconds before the first token, to imitate a remote round trip
+    tokens_per_second (float): Generation speed, 0 for instant replies
+    answer_words (int): Length of the reply
+    """
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    answer_words: int = 40
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _reply(self, messages):
+        prompt = str(messages[-1].content)
+        match = re.search(r"Document 1 \(Relevance: [^)]*\):\n(.*?)(?:\n\nDocument 2|$)", prompt, re.DOTALL)
+        words = (match[1] if match else prompt).split()[:self.answer_words]
+        return "Final Answer: " + " ".join(words)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = "".join(chunk.text for chunk in self._stream(messages, stop, run_manager, **kwargs))
+        usage = {"prompt_tokens": sum(count_tokens(str(message.content)) for message in messages),
+                 "completion_tokens": count_tokens(text)}
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))],
+                          llm_output={"token_usage": usage})
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        for i, word in enumerate(self._reply(messages).split(" ")):
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager is not None:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,169 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+JOB_STATES = ("queued", "parsing", "embedding", "done", "failed")
+
+JOB_COLUMNS = (
+    "id", "file_name", "state", "chunks", "page", "total_pages", "eta_seconds",
+    "result_status", "error", "created_at", "started_at", "finished_at"
+)
+
+
+class UploadedBytes:
+    """Minimal stand-in for Streamlit's UploadedFile, detached from the page session"""
+    def __init__(self, name, data):
+        self.name = name
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+
+class IngestionJobQueue:
+    """
+    Background ingestion of uploaded files with persistent job state.
+
+    Files are processed by worker threads through DocumentProcessor.process_file,
+    so a Streamlit page can submit an upload and keep rerunning while the file
+    indexes. Job progress is kept in SQLite and survives restarts; jobs that were
+    still running when the process stopped are marked as failed on startup.
+
+    Parameters:
+    processor (DocumentProcessor): Processor shared by all workers
+    path (str): SQLite file holding job state
+    workers (int): Number of files processed at the same time
+    on_finished: Optional callback receiving the process_file result of every successful job
+    """
+    def __init__(self, processor, path="./cache/ingestion_jobs.sqlite", workers=2, on_finished=None):
+        self.processor = processor
+        self.on_finished = on_finished
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._collection_locks = {}
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                state TEXT NOT NULL,
+                chunks INTEGER NOT NULL DEFAULT 0,
+                page INTEGER,
+                total_pages INTEGER,
+                eta_seconds REAL,
+                result_status TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        self._conn.execute(
+            "UPDATE jobs SET state = 'failed', error = 'Interrupted by restart', finished_at = ? "
+            "WHERE state IN ('queued', 'parsing', 'embedding')",
+            (time.time(),)
+        )
+        self._conn.commit()
+
+        for _ in range(workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def submit(self, file_name, data) -> str:
+        """Queue a file for ingestion and return its job id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, file_name, state, created_at) VALUES (?, ?, 'queued', ?)",
+                (job_id, file_name, time.time())
+            )
+            self._conn.commit()
+        self._queue.put((job_id, UploadedBytes(file_name, data)))
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(JOB_COLUMNS, row)) if row else None
+
+    def list_jobs(self, job_ids=None, limit=50):
+        """Most recent jobs, optionally restricted to the given ids"""
+        query = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"
+        params = []
+        if job_ids is not None:
+            if not job_ids:
+                return []
+            query += f" WHERE id IN ({','.join('?' * len(job_ids))})"
+            params = list(job_ids)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*params, limit)).fetchall()
+        return [dict(zip(JOB_COLUMNS, row)) for row in rows]
+
+    def is_active(self, job):
+        return job["state"] in ("queued", "parsing", "embedding")
+
+    def _collection_lock(self, file_name):
+        name = os.path.splitext(os.path.basename(file_name))[0]
+        with self._lock:
+            return self._collection_locks.setdefault(name, threading.Lock())
+
+    def _worker(self):
+        while True:
+            job_id, file = self._queue.get()
+            try:
+                self._run(job_id, file)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id, file):
+        started = time.time()
+        self._update(job_id, state="parsing", started_at=started)
+
+        def progress(stats):
+            eta = None
+            total_pages = stats.get("total_pages")
+            if total_pages:
+                fraction = (stats["page"] + 1) / total_pages
+                eta = (time.time() - started) * (1 - fraction) / fraction
+            self._update(
+                job_id,
+                state="embedding",
+                chunks=stats["chunks"],
+                page=stats["page"],
+                total_pages=total_pages,
+                eta_seconds=eta
+            )
+
+        try:
+            with self._collection_lock(file.name):
+                result = self.processor.process_file(file, progress=progress)
+        except Exception as e:
+            self._update(job_id, state="failed", error=str(e), finished_at=time.time())
+            return
+
+        chunks = result.get("stats", {}).get("chunks", 0)
+        self._update(
+            job_id,
+            state="done",
+            chunks=chunks,
+            eta_seconds=0,
+            result_status=result["status"],
+            finished_at=time.time()
+        )
+        if self.on_finished is not None:
+            self.on_finished(result)
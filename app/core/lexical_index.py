@@ -0,0 +1,264 @@
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*", re.UNICODE)
+DEFAULT_PATH = "./chroma_db/lexical_index.sqlite"
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def tokenize(text: str):
+    """
+    Lowercased word tokens
+
+    Compound identifiers such as case numbers (CVL-2023-001) or article
+    numbers (12.3) are kept whole and their parts are added as well.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(part for part in re.split(r"[-./:]", match) if part)
+    return tokens
+
+
+def is_identifier(token: str) -> bool:
+    return any(char.isdigit() for char in token)
+
+
+def is_identifier_query(query: str, threshold: float = 0.5) -> bool:
+    """True when at least `threshold` of the query words are identifiers (case numbers, articles, citations)"""
+    words = TOKEN_PATTERN.findall(query.lower())
+    if not words:
+        return False
+    return sum(1 for word in words if is_identifier(word)) / len(words) >= threshold
+
+
+def reciprocal_rank_fusion(vector_hits, lexical_hits, k, lexical_weight=0.5, rank_constant=60):
+    """
+    Merge vector and BM25 rankings with weighted reciprocal rank fusion
+
+    Parameters:
+    vector_hits: (distance, metadata, text) tuples, best first
+    lexical_hits: (score, chunk_id, metadata, text) tuples, best first
+    k (int): Number of merged hits
+    lexical_weight (float): Weight of the BM25 ranking, 0..1
+
+    Returns:
+    list: (distance-like score, metadata, text) tuples, lower is better, best first
+    """
+    fused = {}
+    for rank, (_, metadata, text) in enumerate(vector_hits):
+        entry = fused.setdefault(text, [0.0, metadata])
+        entry[0] += (1 - lexical_weight) / (rank_constant + rank + 1)
+    for rank, (_, _, metadata, text) in enumerate(lexical_hits):
+        entry = fused.setdefault(text, [0.0, metadata])
+        entry[0] += lexical_weight / (rank_constant + rank + 1)
+
+    ranked = heapq.nlargest(k, fused.items(), key=lambda item: item[1][0])
+    if not ranked:
+        return []
+    best = ranked[0][1][0]
+    return [(1 - score / best, metadata, text) for text, (score, metadata) in ranked]
+
+
+def get_lexical_index(path=DEFAULT_PATH):
+    """Process-wide BM25 index for a path, shared by ingestion and search"""
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = BM25Index(path)
+        return _indexes[path]
+
+
+class BM25Index:
+    """
+    BM25 inverted index over document chunks, stored in SQLite.
+
+    Chunks are added and removed incrementally by DocumentProcessor, one
+    transaction per write batch, so indexing costs grow with the changed
+    chunks only and several processes (the app and bulk ingestion) can write
+    the same file. A search reads the postings of the query terms and loads
+    text only for the returned chunks.
+
+    Parameters:
+    path (str): SQLite file holding the index
+    k1 (float): BM25 term frequency saturation
+    b (float): BM25 length normalization
+    """
+    def __init__(self, path=DEFAULT_PATH, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        # Transactions are opened explicitly with BEGIN IMMEDIATE so concurrent writers queue up
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                document TEXT,
+                length INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                frequency INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                document TEXT,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id);
+            CREATE TABLE IF NOT EXISTS totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                chunks INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO totals (id, chunks, length) VALUES (0, 0, 0);
+        """)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT chunks FROM totals").fetchone()[0]
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _remove(self, conn, chunk_ids):
+        removed = length = 0
+        for chunk_id in chunk_ids:
+            row = conn.execute("SELECT length FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if row is None:
+                continue
+            conn.execute("DELETE FROM postings WHERE chunk_id = ?", (chunk_id,))
+            conn.execute("DELETE FROM chunks WHERE chunk_id = ?", (chunk_id,))
+            removed += 1
+            length += row[0]
+        conn.execute("UPDATE totals SET chunks = chunks - ?, length = length - ?", (removed, length))
+
+    def add_many(self, records):
+        """Index (chunk_id, text, metadata) records, replacing chunks with the same id"""
+        records = list({chunk_id: (chunk_id, text, metadata) for chunk_id, text, metadata in records}.values())
+        with self._transaction() as conn:
+            self._remove(conn, [chunk_id for chunk_id, _, _ in records])
+            total_length = 0
+            for chunk_id, text, metadata in records:
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                document = (metadata or {}).get("document")
+                conn.execute(
+                    "INSERT INTO chunks (chunk_id, document, length, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                    (chunk_id, document, length, text, json.dumps(metadata or {}))
+                )
+                conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, frequency, length, document) VALUES (?, ?, ?, ?, ?)",
+                    [(term, chunk_id, frequency, length, document) for term, frequency in counts.items()]
+                )
+                total_length += length
+            conn.execute("UPDATE totals SET chunks = chunks + ?, length = length + ?", (len(records), total_length))
+
+    def add(self, chunk_id, text, metadata):
+        self.add_many([(chunk_id, text, metadata)])
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM chunks")
+            conn.execute("UPDATE totals SET chunks = 0, length = 0")
+
+    def update_metadata_many(self, items):
+        """Replace the metadata of (chunk_id, metadata) pairs that are indexed"""
+        with self._transaction() as conn:
+            conn.executemany("UPDATE chunks SET metadata = ? WHERE chunk_id = ?",
+                             [(json.dumps(metadata or {}), chunk_id) for chunk_id, metadata in items])
+
+    def update_metadata(self, chunk_id, metadata):
+        self.update_metadata_many([(chunk_id, metadata)])
+
+    def remove_many(self, chunk_ids):
+        with self._transaction() as conn:
+            self._remove(conn, chunk_ids)
+
+    def remove(self, chunk_id):
+        self.remove_many([chunk_id])
+
+    def remove_document(self, document):
+        with self._transaction() as conn:
+            chunk_ids = [row[0] for row in conn.execute("SELECT chunk_id FROM chunks WHERE document = ?", (document,))]
+            self._remove(conn, chunk_ids)
+
+    def search(self, query, k=5, documents=None):
+        """
+        Rank chunks by BM25
+
+        Returns:
+        list: (score, chunk_id, metadata, text) tuples, best first
+        """
+        allowed = set(documents) if documents else None
+        with self._lock:
+            total, total_length = self._conn.execute("SELECT chunks, length FROM totals").fetchone()
+            if not total:
+                return []
+            average_length = total_length / total
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self._conn.execute(
+                    "SELECT chunk_id, frequency, length, document FROM postings WHERE term = ?", (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency, length, document in postings:
+                    if allowed is not None and document not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            ranked = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            if not ranked:
+                return []
+            rows = self._conn.execute(
+                f"SELECT chunk_id, text, metadata FROM chunks WHERE chunk_id IN ({', '.join('?' * len(ranked))})",
+                [chunk_id for chunk_id, _ in ranked]
+            ).fetchall()
+        chunks = {chunk_id: (text, json.loads(metadata)) for chunk_id, text, metadata in rows}
+        return [(score, chunk_id, chunks[chunk_id][1], chunks[chunk_id][0])
+                for chunk_id, score in ranked if chunk_id in chunks]
+
+
+def rebuild(path=DEFAULT_PATH):
+    """Rebuild the lexical index from every chunk already stored in Chroma"""
+    from core.simple_rag import get_storage
+
+    storage = get_storage()
+    index = get_lexical_index(path)
+    index.clear()
+    for name in storage.list_documents():
+        index.add_many((chunk_id, text, {**(metadata or {}), "document": name})
+                       for chunk_id, text, metadata in storage.iter_chunks(name))
+    print(f"Indexed {len(index)} chunks into {path}")
+
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,78 @@
+import io
+import zlib
+
+from langchain_core.documents import Document
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+
+def _iter_text_blocks(text_stream, source, block_size):
+    """
+    Group lines into blocks of roughly `block_size` chars
+
+    Blocks end at blank lines chosen by the content of the preceding line, not
+    by position, so an edit early in a file does not move every later block
+    boundary (and with it every later chunk).
+    """
+    block = []
+    length = 0
+    index = 0
+    previous = ""
+    for line in text_stream:
+        block.append(line)
+        length += len(line)
+        blank = not line.strip()
+        content_boundary = blank and length >= block_size // 4 and zlib.crc32(previous.encode("utf-8")) % 4 == 0
+        if content_boundary or (blank and length >= block_size * 2) or length >= block_size * 4:
+            yield Document(page_content="".join(block), metadata={"source": source, "page": index})
+            block, length = [], 0
+            index += 1
+        if not blank:
+            previous = line
+
+    if block:
+        yield Document(page_content="".join(block), metadata={"source": source, "page": index})
+
+
+def iter_pages(file_name: str, data: bytes, block_size: int = 20000):
+    """
+    Lazily yield the pages of an uploaded file as LangChain documents
+
+    Reads directly from the uploaded bytes, without a temporary file. PDFs are
+    yielded page by page; DOCX and TXT text is yielded in blocks of about
+    `block_size` characters so the splitter never sees the whole document at once.
+
+    Parameters:
+    file_name (str): Original file name, used for the type and `source` metadata
+    data (bytes): File content
+    block_size (int): Approximate block length for DOCX/TXT content
+    """
+    name = file_name.lower()
+    if name.endswith(".pdf"):
+        import fitz
+
+        pdf = fitz.open(stream=data, filetype="pdf")
+        try:
+            for page in pdf:
+                yield Document(
+                    page_content=page.get_text(),
+                    metadata={"source": file_name, "page": page.number, "total_pages": pdf.page_count}
+                )
+        finally:
+            pdf.close()
+    elif name.endswith(".docx"):
+        import docx2txt
+
+        text = docx2txt.process(io.BytesIO(data))
+        yield from _iter_text_blocks(io.StringIO(text), file_name, block_size)
+    elif name.endswith(".txt"):
+        text_stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="replace")
+        yield from _iter_text_blocks(text_stream, file_name, block_size)
+    else:
+        raise ValueError("Unsupported file type")
+
+
+def iter_chunks(file_name: str, data: bytes, text_splitter):
+    """Split pages into chunks as they are read, one page at a time"""
+    for page in iter_pages(file_name, data):
+        yield from text_splitter.split_documents([page])
@@ -0,0 +1,101 @@
+"""
+Convert a per-file ./chroma_db layout into the shared collection layout.
+
+Usage (from the app directory):
+    python -m core.migrate_storage [--delete-source]
+
+Stored embeddings are copied as they are, nothing is re-embedded. Chunks get
+`document`/`source` metadata, and legacy positional ids (doc_0, doc_1, ...)
+are replaced with content-derived ids so chunks of different files no
+longer collide. The BM25 index and the collection router are rewritten from
+the migrated chunks, so they hold the new ids too. Run the app with
+RAG_STORAGE_MODE=shared afterwards.
+"""
+import argparse
+
+from core.collection_router import get_collection_router
+from core.lexical_index import get_lexical_index
+from core.simple_rag import WRITE_BATCH_SIZE, chunk_id_for, get_storage
+
+
+def migrate(delete_source=False, lexical_index=None, router=None):
+    """
+    Copy every per-file collection into the shared collection
+
+    Parameters:
+    delete_source (bool): Delete each per-file collection once copied
+    lexical_index (BM25Index): Index to rewrite, the process-wide one by default
+    router (CollectionRouter): Router to rewrite, the process-wide one by default
+
+    Returns:
+    dict: document name -> number of migrated chunks
+    """
+    per_file = get_storage("per_file")
+    shared = get_storage("shared")
+    lexical_index = lexical_index if lexical_index is not None else get_lexical_index()
+    router = router if router is not None else get_collection_router()
+    migrated = {}
+
+    for name in per_file.list_documents():
+        source = per_file.client.get_collection(name)
+        content_hash = (source.metadata or {}).get("content_hash")
+        shared.delete_document(name)
+        # Entries under the old positional ids are replaced batch by batch below
+        lexical_index.remove_document(name)
+        router.remove_document(name)
+
+        occurrences = {}
+        total = source.count()
+        copied = 0
+        for offset in range(0, total, WRITE_BATCH_SIZE):
+            batch = source.get(
+                limit=WRITE_BATCH_SIZE,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            ids, metadatas = [], []
+            for position, (chunk_id, text, metadata) in enumerate(
+                    zip(batch["ids"], batch["documents"], batch["metadatas"])):
+                metadata = dict(metadata or {})
+                file_name = metadata.get("source", name)
+                metadata.setdefault("source", file_name)
+                metadata.setdefault("chunk", offset + position)
+                metadata["document"] = name
+                if chunk_id.startswith("doc_"):
+                    chunk_id = chunk_id_for(file_name, text, occurrences)
+                ids.append(chunk_id)
+                metadatas.append(metadata)
+
+            shared.collection.upsert(
+                ids=ids,
+                embeddings=batch["embeddings"],
+                documents=batch["documents"],
+                metadatas=metadatas
+            )
+            lexical_index.add_many(zip(ids, batch["documents"], metadatas))
+            router.add(name, batch["embeddings"])
+            copied += len(ids)
+
+        if len(shared.get_chunk_ids(name)) != copied:
+            print(f"FAILED  {name}: chunk count mismatch, source collection kept")
+            continue
+
+        shared.register_document(name, content_hash, chunks=copied)
+        migrated[name] = copied
+        print(f"OK      {name}: {copied} chunks")
+        if delete_source:
+            per_file.delete_document(name)
+
+    print(f"\nMigrated {len(migrated)} documents, {sum(migrated.values())} chunks")
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate per-file Chroma collections into one shared collection")
+    parser.add_argument("--delete-source", action="store_true", help="Delete each per-file collection once copied")
+    args = parser.parse_args()
+    migrate(delete_source=args.delete_source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,631 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from core.quantization import VectorCompressor
+from core.storage import DocumentCatalog
+
+logger = logging.getLogger(__name__)
+
+BLOCK_ROWS = 65536
+CODE_BLOCK_ROWS = 16384
+
+
+class NumpyStorage:
+    """
+    Vector storage in one contiguous float32 matrix opened with mmap.
+
+    Layout of `path`:
+        vectors.f32      row-major float32 embeddings, append-only
+        norms.f32        squared L2 norm of every row
+        chunks.sqlite    row -> chunk id, document, text, metadata, deleted flag
+        ivf_*.npy        optional IVF coarse quantizer (see build_ivf)
+        codes.i8         optional int8 codes of every row (see compress)
+        code_norms.f32   squared norm of every decoded code
+        compression.npz  quantizer ranges and optional PCA projection
+
+    Opening only maps the files, so it takes milliseconds regardless of corpus
+    size, and worker processes share the pages through the OS page cache.
+    Search is a vectorized dot product over row blocks (or over the probed IVF
+    lists), and distances are squared L2 like Chroma's default space. Upserts
+    append new rows and mark replaced rows as deleted; compact() reclaims them.
+
+    Several processes (the app and bulk ingestion) can share a store. Writers
+    queue on chunks.sqlite's write lock, and a row only becomes visible once
+    its chunk is committed; readers pick up other processes' writes before
+    their next search.
+
+    Once compressed, searches scan the int8 codes instead of the float32
+    matrix and re-score only a shortlist of `k * rescore` rows with the
+    full-precision vectors, which stay on disk and are read on demand.
+
+    Parameters:
+    path (str): Directory holding the store
+    embeddings: Embedding function, kept for interface parity with Chroma storages
+    nprobe (int): IVF lists scanned per query once an IVF index is built
+    rescore (int): Shortlist size as a multiple of k for compressed search, 0 disables re-scoring
+    """
+    mode = "numpy"
+    client = None
+
+    def __init__(self, path="./vector_store", embeddings=None, nprobe=8, rescore=4):
+        self.path = path
+        self.embeddings = embeddings
+        self.nprobe = nprobe
+        self.rescore = rescore
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "chunks.sqlite"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                document TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_id ON chunks (id) WHERE deleted = 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document) WHERE deleted = 0")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self.catalog = DocumentCatalog(os.path.join(path, "documents_catalog.sqlite"))
+
+        row = self._conn.execute("SELECT value FROM settings WHERE key = 'dimensions'").fetchone()
+        self.dimensions = int(row[0]) if row else None
+        self._vectors = None
+        self._norms = None
+        self._rows = 0
+        self._deleted = np.zeros(0, dtype=bool)
+        self._ivf = None
+        self._compressor = None
+        self._codes = None
+        self._code_norms = None
+        self._version = None
+        self._norms_size = 0
+        self._open()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _file_size(self, name):
+        return os.path.getsize(self._file(name)) if os.path.exists(self._file(name)) else 0
+
+    def _committed_rows(self):
+        return self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+
+    def _map(self, rows):
+        """Map the first `rows` rows of the matrix files"""
+        self._rows = rows
+        self._vectors = self._norms = None
+        if rows:
+            self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r",
+                                      shape=(rows, self.dimensions))
+            self._norms = np.memmap(self._file("norms.f32"), dtype=np.float32, mode="r", shape=(rows,))
+        if self._codes is not None and rows:
+            self._codes = np.memmap(self._file("codes.i8"), dtype=np.int8, mode="r",
+                                    shape=(rows, self._compressor.code_size))
+            self._code_norms = np.memmap(self._file("code_norms.f32"), dtype=np.float32, mode="r", shape=(rows,))
+
+    def _open(self):
+        """(Re)map the committed rows of the matrix files and load the deleted-row mask"""
+        with self._lock:
+            self._version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            self._norms_size = self._file_size("norms.f32")
+            if self.dimensions is None:
+                row = self._conn.execute("SELECT value FROM settings WHERE key = 'dimensions'").fetchone()
+                self.dimensions = int(row[0]) if row else None
+            if self.dimensions is None or not os.path.exists(self._file("vectors.f32")):
+                self._vectors, self._norms, self._rows = None, None, 0
+                self._deleted = np.zeros(0, dtype=bool)
+                self._compressor = self._codes = self._code_norms = None
+                return
+            # Rows another process appended but has not committed yet stay invisible
+            rows = min(self._norms_size // 4, self._committed_rows())
+            self._codes = None
+            self._map(rows)
+            deleted = np.zeros(rows, dtype=bool)
+            deleted_rows = [r for (r,) in self._conn.execute("SELECT row FROM chunks WHERE deleted = 1")]
+            deleted[[r for r in deleted_rows if r < rows]] = True
+            self._deleted = deleted
+            self._ivf = None
+            if os.path.exists(self._file("ivf_centroids.npy")):
+                self._ivf = {
+                    "centroids": np.load(self._file("ivf_centroids.npy")),
+                    "order": np.load(self._file("ivf_order.npy"), mmap_mode="r"),
+                    "offsets": np.load(self._file("ivf_offsets.npy")),
+                }
+                self._ivf["rows"] = len(self._ivf["order"])
+            self._open_codes()
+
+    def _open_codes(self):
+        self._compressor = self._codes = self._code_norms = None
+        if not os.path.exists(self._file("compression.npz")):
+            return
+        compressor = VectorCompressor.load(self._file("compression.npz"))
+        code_rows = self._file_size("code_norms.f32") // 4
+        if code_rows < self._rows:
+            logger.warning("Ignoring int8 codes in %s: %d codes for %d rows, run compress again",
+                           self.path, code_rows, self._rows)
+            return
+        if self._rows:
+            self._codes = np.memmap(self._file("codes.i8"), dtype=np.int8, mode="r",
+                                    shape=(self._rows, compressor.code_size))
+            self._code_norms = np.memmap(self._file("code_norms.f32"), dtype=np.float32, mode="r",
+                                         shape=(self._rows,))
+        self._compressor = compressor
+
+    def _sync(self):
+        """Reopen when another process committed to the store or appended to the matrix since the last look"""
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._version or self._file_size("norms.f32") != self._norms_size:
+                self._open()
+
+    def _truncate(self, rows):
+        """Cut the matrix files back to `rows` rows, dropping bytes of a write that never committed"""
+        widths = {"vectors.f32": (self.dimensions or 0) * 4, "norms.f32": 4}
+        if self._compressor is not None:
+            widths.update({"codes.i8": self._compressor.code_size, "code_norms.f32": 4})
+        for name, width in widths.items():
+            if self._file_size(name) > rows * width:
+                os.truncate(self._file(name), rows * width)
+
+    @contextmanager
+    def _writing(self):
+        """
+        Hold the store's write lock, shared with other processes, and yield the first free row
+
+        BEGIN IMMEDIATE on chunks.sqlite serializes writers. The free row is
+        taken from the committed chunks, so bytes left by a writer that failed
+        or was killed after appending are overwritten. If the block raises,
+        the matrix files are cut back and the transaction is rolled back.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._committed_rows()
+                if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._version or rows != self._rows:
+                    self._open()
+                self._truncate(rows)
+                yield rows
+            except BaseException:
+                self._conn.rollback()
+                self._truncate(self._committed_rows())
+                raise
+            self._conn.commit()
+
+    def _grow(self, rows, deleted_rows):
+        """Map rows appended by this handle and mark rows it deleted, without reloading the whole mask"""
+        deleted = np.zeros(rows, dtype=bool)
+        deleted[:len(self._deleted)] = self._deleted
+        deleted[list(deleted_rows)] = True
+        self._deleted = deleted
+        self._map(rows)
+        self._norms_size = self._file_size("norms.f32")
+
+    def __len__(self):
+        return int(self._rows - self._deleted.sum())
+
+    # Storage interface used by DocumentProcessor and ChromaSearchTool
+
+    def list_documents(self):
+        return self.catalog.names()
+
+    def document_hash(self, name):
+        return self.catalog.content_hash(name)
+
+    def document_hashes(self):
+        return self.catalog.hashes()
+
+    def get_chunk_ids(self, name):
+        with self._lock:
+            return {chunk_id for (chunk_id,) in self._conn.execute(
+                "SELECT id FROM chunks WHERE document = ? AND deleted = 0", (name,))}
+
+    def get_embeddings(self, name, ids):
+        ids = list(ids)
+        rows = []
+        with self._lock:
+            self._sync()
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                rows += [row for (row,) in self._conn.execute(
+                    f"SELECT row FROM chunks WHERE deleted = 0 AND id IN ({','.join('?' * len(part))})", part)]
+            vectors = self._vectors
+        if not rows:
+            return np.zeros((0, self.dimensions or 0), dtype=np.float32)
+        return np.asarray(vectors[np.sort(rows)])
+
+    def writer(self, name):
+        return self
+
+    def iter_chunks(self, name):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, text, metadata FROM chunks WHERE document = ? AND deleted = 0 ORDER BY row", (name,)
+            ).fetchall()
+        for chunk_id, text, metadata in rows:
+            yield chunk_id, text, json.loads(metadata)
+
+    def register_document(self, name, content_hash=None, chunks=None):
+        self.catalog.upsert(name, content_hash, chunks)
+
+    def delete_document(self, name):
+        with self._writing():
+            deleted_rows = [row for (row,) in self._conn.execute(
+                "SELECT row FROM chunks WHERE document = ? AND deleted = 0", (name,))]
+            self._conn.execute("UPDATE chunks SET deleted = 1 WHERE document = ? AND deleted = 0", (name,))
+        self.catalog.delete(name)
+        with self._lock:
+            self._grow(self._rows, deleted_rows)
+
+    # Collection-like writer interface used by the embedding pipeline
+
+    def upsert(self, ids, embeddings, documents, metadatas=None):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        metadatas = metadatas or [{} for _ in ids]
+        with self._writing() as first_row:
+            if self.dimensions is None:
+                self.dimensions = vectors.shape[1]
+                self._conn.execute("INSERT INTO settings (key, value) VALUES ('dimensions', ?)",
+                                   (str(self.dimensions),))
+            elif vectors.shape[1] != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions}-dimensional embeddings, got {vectors.shape[1]}")
+
+            deleted_rows = self._mark_deleted(ids)
+            with open(self._file("vectors.f32"), "ab") as vector_file:
+                vector_file.write(vectors.tobytes())
+            with open(self._file("norms.f32"), "ab") as norm_file:
+                norm_file.write(np.einsum("ij,ij->i", vectors, vectors).astype(np.float32).tobytes())
+            if self._compressor is not None:
+                codes, code_norms = self._compressor.encode(vectors)
+                with open(self._file("codes.i8"), "ab") as code_file:
+                    code_file.write(codes.tobytes())
+                with open(self._file("code_norms.f32"), "ab") as norm_file:
+                    norm_file.write(code_norms.tobytes())
+
+            self._conn.executemany(
+                "INSERT INTO chunks (row, id, document, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (first_row + i, chunk_id, (metadata or {}).get("document", ""), text, json.dumps(metadata or {}))
+                    for i, (chunk_id, text, metadata) in enumerate(zip(ids, documents, metadatas))
+                ]
+            )
+        with self._lock:
+            self._grow(first_row + len(ids), deleted_rows)
+
+    def update(self, ids, metadatas):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET metadata = ? WHERE id = ? AND deleted = 0",
+                [(json.dumps(metadata), chunk_id) for chunk_id, metadata in zip(ids, metadatas)]
+            )
+            self._conn.commit()
+
+    def delete(self, ids):
+        with self._writing():
+            deleted_rows = self._mark_deleted(ids)
+        with self._lock:
+            self._grow(self._rows, deleted_rows)
+
+    def _mark_deleted(self, ids):
+        """Flag the live rows of `ids` as deleted and return them"""
+        rows = []
+        for start in range(0, len(ids), 500):
+            part = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(part))
+            rows += [row for (row,) in self._conn.execute(
+                f"SELECT row FROM chunks WHERE deleted = 0 AND id IN ({placeholders})", part)]
+            self._conn.execute(f"UPDATE chunks SET deleted = 1 WHERE deleted = 0 AND id IN ({placeholders})", part)
+        return rows
+
+    # Search
+
+    def _candidate_rows(self, query_embedding, documents):
+        """Rows to scan: the documents' rows, the probed IVF lists, or None for everything"""
+        if documents:
+            placeholders = ",".join("?" * len(documents))
+            with self._lock:
+                rows = [r for (r,) in self._conn.execute(
+                    f"SELECT row FROM chunks WHERE deleted = 0 AND document IN ({placeholders})", list(documents))]
+            return np.asarray(rows, dtype=np.int64)
+
+        if self._ivf is None:
+            return None
+        centroids = self._ivf["centroids"]
+        nprobe = min(self.nprobe, len(centroids))
+        distances = np.einsum("ij,ij->i", centroids, centroids) - 2 * centroids @ query_embedding
+        lists = np.argpartition(distances, nprobe - 1)[:nprobe]
+        offsets = self._ivf["offsets"]
+        parts = [np.asarray(self._ivf["order"][offsets[i]:offsets[i + 1]]) for i in lists]
+        # Rows appended after the IVF index was built are always scanned
+        parts.append(np.arange(self._ivf["rows"], self._rows, dtype=np.int64))
+        return np.concatenate(parts).astype(np.int64)
+
+    def _top_k(self, distances, rows, k):
+        if len(distances) > k:
+            best = np.argpartition(distances, k)[:k]
+        else:
+            best = np.arange(len(distances))
+        return [(float(distances[i]), int(rows[i])) for i in best]
+
+    def _scan(self, score, candidates, deleted, rows_total, k, block_rows):
+        """Top k (distance, row) pairs of `score` over the candidate rows, or over all rows"""
+        best = []
+        if candidates is None:
+            for start in range(0, rows_total, block_rows):
+                stop = min(start + block_rows, rows_total)
+                distances = score(slice(start, stop))
+                distances[deleted[start:stop]] = np.inf
+                best.extend(self._top_k(distances, np.arange(start, stop), k))
+        else:
+            candidates = candidates[~deleted[candidates]]
+            for start in range(0, len(candidates), block_rows):
+                rows = np.sort(candidates[start:start + block_rows])
+                best.extend(self._top_k(score(rows), rows, k))
+        return [hit for hit in sorted(best)[:k] if np.isfinite(hit[0])]
+
+    def _search(self, query, k, candidates, compressed=True, rescore=None):
+        with self._lock:
+            vectors, norms, deleted, rows_total = self._vectors, self._norms, self._deleted, self._rows
+            compressor, codes, code_norms = self._compressor, self._codes, self._code_norms
+        if not rows_total:
+            return []
+        query_norm = float(query @ query)
+
+        def exact(rows):
+            return norms[rows] + query_norm - 2 * (vectors[rows] @ query)
+
+        if compressor is None or not compressed:
+            return self._scan(exact, candidates, deleted, rows_total, k, BLOCK_ROWS)
+
+        rescore = self.rescore if rescore is None else rescore
+        prepared = compressor.prepare_query(query)
+        shortlist = self._scan(
+            lambda rows: compressor.distances(prepared, codes[rows], code_norms[rows]),
+            candidates, deleted, rows_total, k * max(rescore, 1), CODE_BLOCK_ROWS
+        )
+        if not rescore or not shortlist:
+            return shortlist[:k]
+        rows = np.sort(np.asarray([row for _, row in shortlist], dtype=np.int64))
+        distances = exact(rows)
+        return [(float(distances[i]), int(rows[i])) for i in np.argsort(distances)[:k]]
+
+    def search_rows(self, query_embedding, k, documents=None):
+        """Top k (squared L2 distance, row) pairs, best first"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        self._sync()
+        if not self._rows:
+            return []
+        return self._search(query, k, self._candidate_rows(query, documents))
+
+    def _fetch(self, rows):
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            found = {row: (text, json.loads(metadata)) for row, text, metadata in self._conn.execute(
+                f"SELECT row, text, metadata FROM chunks WHERE row IN ({placeholders})", rows)}
+        return found
+
+    def query(self, query_embedding, k, documents=None, include_embeddings=False):
+        """
+        Returns:
+        list: (distance, metadata, document) tuples sorted by distance, with the
+        stored embedding appended when include_embeddings is set
+        """
+        hits = self.search_rows(query_embedding, k, documents=documents)
+        if not hits:
+            return []
+        found = self._fetch([row for _, row in hits])
+        # A row can vanish when another process compacts the store between the search and the fetch
+        hits = [(distance, row) for distance, row in hits if row in found]
+        if include_embeddings:
+            vectors = self._vectors
+            return [(distance, found[row][1], found[row][0], np.asarray(vectors[row])) for distance, row in hits]
+        return [(distance, found[row][1], found[row][0]) for distance, row in hits]
+
+    # Maintenance
+
+    def build_ivf(self, n_lists=None, iterations=10, sample_size=100_000, seed=0):
+        """
+        Train a k-means coarse quantizer and group rows by nearest centroid
+
+        Queries then scan only the `nprobe` closest lists plus rows added later.
+        """
+        with self._lock:
+            live = np.nonzero(~self._deleted)[0]
+            if not len(live):
+                return
+            n_lists = n_lists or max(1, int(np.sqrt(len(live))))
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(live, size=min(sample_size, len(live)), replace=False))
+            data = np.asarray(self._vectors[sample])
+            centroids = data[rng.choice(len(data), size=min(n_lists, len(data)), replace=False)].copy()
+
+            for _ in range(iterations):
+                assignment = self._assign(data, centroids)
+                for i in range(len(centroids)):
+                    members = data[assignment == i]
+                    if len(members):
+                        centroids[i] = members.mean(axis=0)
+
+            assignment = np.empty(self._rows, dtype=np.int64)
+            for start in range(0, self._rows, BLOCK_ROWS):
+                stop = min(start + BLOCK_ROWS, self._rows)
+                assignment[start:stop] = self._assign(np.asarray(self._vectors[start:stop]), centroids)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=len(centroids))
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+
+            np.save(self._file("ivf_centroids.npy"), centroids.astype(np.float32))
+            np.save(self._file("ivf_order.npy"), order)
+            np.save(self._file("ivf_offsets.npy"), offsets)
+            self._open()
+
+    @staticmethod
+    def _assign(data, centroids):
+        distances = np.einsum("ij,ij->i", centroids, centroids)[np.newaxis, :] - 2 * data @ centroids.T
+        return np.argmin(distances, axis=1)
+
+    def drop_ivf(self):
+        with self._lock:
+            for name in ("ivf_centroids.npy", "ivf_order.npy", "ivf_offsets.npy"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self._open()
+
+    def compress(self, components=None, sample_size=100_000, evaluation_queries=100, k=10, seed=0):
+        """
+        Train int8 quantization (optionally after a PCA projection) and encode every row
+
+        Parameters:
+        components (int): PCA dimensions to keep, None for quantization only
+        sample_size (int): Rows used to train the projection and quantizer ranges
+        evaluation_queries (int): Queries used for the recall report
+
+        Returns:
+        dict: Memory per vector and recall@k against uncompressed search (see evaluate_compression),
+        None when evaluation_queries is 0
+        """
+        with self._lock:
+            live = np.nonzero(~self._deleted)[0]
+            if not len(live):
+                return None
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(live, size=min(sample_size, len(live)), replace=False))
+            compressor = VectorCompressor(components).fit(np.asarray(self._vectors[sample]))
+
+            with open(self._file("codes.i8.tmp"), "wb") as code_file, \
+                    open(self._file("code_norms.f32.tmp"), "wb") as norm_file:
+                for start in range(0, self._rows, CODE_BLOCK_ROWS):
+                    codes, code_norms = compressor.encode(self._vectors[start:start + CODE_BLOCK_ROWS])
+                    code_file.write(codes.tobytes())
+                    norm_file.write(code_norms.tobytes())
+            os.replace(self._file("codes.i8.tmp"), self._file("codes.i8"))
+            os.replace(self._file("code_norms.f32.tmp"), self._file("code_norms.f32"))
+            compressor.save(self._file("compression.npz"))
+            self._open()
+        if not evaluation_queries:
+            return None
+        return self.evaluate_compression(queries=evaluation_queries, k=k, seed=seed)
+
+    def evaluate_compression(self, queries=100, k=10, seed=0):
+        """
+        Recall@k of compressed search against exact float32 search
+
+        Queries are midpoints of random pairs of stored chunks, so they fall
+        between documents like real questions do rather than on a stored row.
+        IVF is bypassed to measure the compression alone.
+
+        Returns:
+        dict: Bytes per vector, compression ratio and recall@k with and without re-scoring
+        """
+        with self._lock:
+            compressor = self._compressor
+            live = np.nonzero(~self._deleted)[0]
+        if compressor is None or not len(live):
+            return None
+
+        rng = np.random.default_rng(seed)
+        pairs = rng.choice(live, size=(queries, 2))
+        recall, recall_without_rescoring = [], []
+        for first, second in pairs:
+            query = (np.asarray(self._vectors[first]) + np.asarray(self._vectors[second])) / 2
+            truth = {row for _, row in self._search(query, k, None, compressed=False)}
+            rescored = {row for _, row in self._search(query, k, None)}
+            approximate = {row for _, row in self._search(query, k, None, rescore=0)}
+            recall.append(len(truth & rescored) / len(truth))
+            recall_without_rescoring.append(len(truth & approximate) / len(truth))
+
+        code_bytes = compressor.code_size + 4
+        full_bytes = self.dimensions * 4 + 4
+        return {
+            "components": compressor.components,
+            "bytes_per_vector": code_bytes,
+            "full_bytes_per_vector": full_bytes,
+            "compression_ratio": full_bytes / code_bytes,
+            "k": k,
+            "rescore": self.rescore,
+            "recall_at_k": float(np.mean(recall)),
+            "recall_at_k_without_rescoring": float(np.mean(recall_without_rescoring)),
+        }
+
+    def drop_compression(self):
+        with self._lock:
+            for name in ("compression.npz", "codes.i8", "code_norms.f32"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self._open()
+
+    def compact(self):
+        """Rewrite the matrix (and int8 codes) without deleted rows (rebuilds the IVF index)"""
+        with self._lock:
+            # Keep other processes from writing while rows are renumbered; the commit below releases the lock
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._open()
+                live = np.nonzero(~self._deleted)[0]
+                had_ivf = self._ivf is not None
+                self.drop_ivf()
+                files = [("vectors.f32", self._vectors), ("norms.f32", self._norms)]
+                if self._compressor is not None:
+                    files += [("codes.i8", self._codes), ("code_norms.f32", self._code_norms)]
+                if self._rows:
+                    for name, source in files:
+                        with open(self._file(name + ".tmp"), "wb") as target:
+                            for start in range(0, len(live), BLOCK_ROWS):
+                                target.write(np.asarray(source[live[start:start + BLOCK_ROWS]]).tobytes())
+                self._vectors = self._norms = self._codes = self._code_norms = None
+                if self._rows:
+                    for name, _ in files:
+                        os.replace(self._file(name + ".tmp"), self._file(name))
+
+                self._conn.execute("DELETE FROM chunks WHERE deleted = 1")
+                self._conn.execute("CREATE TEMP TABLE renumber AS SELECT row AS old_row, "
+                                   "ROW_NUMBER() OVER (ORDER BY row) - 1 AS new_row FROM chunks")
+                self._conn.execute(
+                    "UPDATE chunks SET row = -1 - (SELECT new_row FROM renumber WHERE old_row = chunks.row)")
+                self._conn.execute("UPDATE chunks SET row = -1 - row")
+                self._conn.execute("DROP TABLE renumber")
+            except BaseException:
+                self._conn.rollback()
+                self._open()
+                raise
+            self._conn.commit()
+            self._open()
+            if had_ivf:
+                self.build_ivf()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the NumPy vector store")
+    parser.add_argument("command", choices=["compress", "decompress", "build-ivf", "drop-ivf", "compact"])
+    parser.add_argument("--path", default=os.getenv("RAG_VECTOR_STORE_PATH", "./vector_store"))
+    parser.add_argument("--components", type=int, default=None, help="PCA dimensions kept before int8 quantization")
+    parser.add_argument("--lists", type=int, default=None, help="IVF lists (default: sqrt(rows))")
+    args = parser.parse_args()
+
+    store = NumpyStorage(args.path)
+    if args.command == "compress":
+        print(json.dumps(store.compress(components=args.components), indent=2))
+    elif args.command == "decompress":
+        store.drop_compression()
+    elif args.command == "build-ivf":
+        store.build_ivf(n_lists=args.lists)
+    elif args.command == "drop-ivf":
+        store.drop_ivf()
+    else:
+        store.compact()
+    print(f"{args.command}: {len(store)} chunks in {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import logging
+
 import psycopg2
 from psycopg2 import Error
 from dotenv import load_dotenv
@@ -6,6 +8,8 @@ from psycopg2 import sql
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 def create_database(host, user, password, new_db_name):
     """
     Connect to PostgreSQL and create a new database
@@ -34,7 +38,7 @@ def create_database(host, user, password, new_db_name):
         sql_create_database = f"CREATE DATABASE {new_db_name};"
         
         cursor.execute(sql_create_database)
-        print(f"Database '{new_db_name}' created successfully")
+        logger.info("Database '%s' created successfully", new_db_name)
          
         connection.close()
         
@@ -44,13 +48,13 @@ def create_database(host, user, password, new_db_name):
             password=password,
             database=new_db_name
         )
-        print(f"Successfully connected to database '{new_db_name}'")
+        logger.info("Successfully connected to database '%s'", new_db_name)
         new_connection.close()
         
         return True
 
     except (Exception, Error) as error:
-        print("Error while connecting to PostgreSQL:", error)
+        logger.error("Error while connecting to PostgreSQL: %s", error)
         return False
         
     finally:
@@ -58,7 +62,7 @@ def create_database(host, user, password, new_db_name):
             if connection:
                 cursor.close()
                 connection.close()
-                print("PostgreSQL connection closed")
+                logger.info("PostgreSQL connection closed")
 
 
 def fill_the_database(host, new_db_name, port, user, password, sql_file_path = 'chinook_postgreSql_short.sql'):
@@ -97,11 +101,11 @@ def fill_the_database(host, new_db_name, port, user, password, sql_file_path = '
         
         connection.commit()
         
-        print("Database filled successfully!")
+        logger.info("Database filled successfully")
         return True
         
     except (Exception, Error) as error:
-        print("Error while executing SQL commands:", error)
+        logger.error("Error while executing SQL commands: %s", error)
         if connection:
             connection.rollback()
         return False
@@ -111,7 +115,7 @@ def fill_the_database(host, new_db_name, port, user, password, sql_file_path = '
             cursor.close()
         if connection:
             connection.close()
-            print("PostgreSQL connection closed")
+            logger.info("PostgreSQL connection closed")
 
 def check_database_exists(dbname, host, port, user, password, new_dbname):
     try:
@@ -126,7 +130,7 @@ def check_database_exists(dbname, host, port, user, password, new_dbname):
         return exists
         
     except psycopg2.Error as e:
-        print(f"Error checking database: {e}")
+        logger.error("Error checking database: %s", e)
         return False
 
 
@@ -153,10 +157,10 @@ def check_tables_exist(host, new_db_name, port, user, password):
         return False   
 
 def check_fill_db(host, new_db_name, port, user, password, sql_file_path):
-    print('checking if tables exist')
+    logger.info("Checking if tables exist")
     if not check_tables_exist(host, new_db_name, port, user, password):
         fill_the_database(host, new_db_name, port, user, password, sql_file_path)
-        print('database was filled')
+        logger.info("Database was filled")
         return True
 
 def create_readonly_user(host, database, user, password, new_user_name, agent_read_password):
@@ -210,12 +214,12 @@ def create_readonly_user(host, database, user, password, new_user_name, agent_re
                 )
             )
 
-            print(f"Created read-only user '{new_user_name}' with all necessary permissions")
+            logger.info("Created read-only user '%s' with all necessary permissions", new_user_name)
         else:
-            print(f"User '{new_user_name}' already exists")
+            logger.info("User '%s' already exists", new_user_name)
 
     except Exception as e:
-        print(f"Error creating read-only user: {str(e)}")
+        logger.error("Error creating read-only user: %s", e)
         raise
     finally:
         cur.close()
@@ -234,9 +238,9 @@ def create_postgres_database(db_name, host, port, user, password):
 
     try:
         cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(db_name)))
-        print(f"Database {db_name} dropped successfully (if it existed).")
+        logger.info("Database %s dropped successfully (if it existed)", db_name)
     except psycopg2.Error as e:
-        print(f"An error occurred while dropping the database: {e}")
+        logger.error("An error occurred while dropping the database: %s", e)
         cursor.close()
         conn.close()
         return
@@ -244,9 +248,9 @@ def create_postgres_database(db_name, host, port, user, password):
     try:
         cursor.execute(sql.SQL("CREATE DATABASE {}").format(
             sql.Identifier(db_name)))
-        print(f"Database {db_name} created successfully.")
+        logger.info("Database %s created successfully", db_name)
     except psycopg2.Error as e:
-        print(f"An error occurred: {e}")
+        logger.error("An error occurred: %s", e)
     finally:
         cursor.close()
         conn.close()
@@ -256,9 +260,9 @@ def execute_sql(connection, sql_script):
     try:
         cursor.execute(sql_script)
         connection.commit()
-        print("Query executed successfully")
+        logger.debug("Query executed successfully")
     except psycopg2.Error as e:
-        print(f"An error occurred: {e}")
+        logger.error("An error occurred while executing SQL: %s", e)
     finally:
         cursor.close()
 
@@ -267,7 +271,7 @@ def run_sql_commands(db_name, host, port, user, password, sql_commands):
     conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
 
     for n,command in enumerate(sql_commands):
-        print(n)
+        logger.debug("Running SQL command %d of %d", n + 1, len(sql_commands))
         execute_sql(conn, command)
 
     conn.close()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import numpy as np
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension int8 quantization.
+
+    Every dimension is mapped linearly from its [min, max] range in the
+    training sample onto 256 levels, so a vector takes one byte per dimension
+    instead of four. Distances to a float query are computed directly on the
+    codes without decoding them (asymmetric distance).
+    """
+    def __init__(self, low=None, scale=None):
+        self.low = low
+        self.scale = scale
+
+    def fit(self, data):
+        data = np.asarray(data, dtype=np.float32)
+        self.low = data.min(axis=0)
+        self.scale = np.maximum(data.max(axis=0) - self.low, 1e-12) / 255
+        return self
+
+    def encode(self, data):
+        levels = np.rint((np.asarray(data, dtype=np.float32) - self.low) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes):
+        return (codes.astype(np.float32) + 128) * self.scale + self.low
+
+
+class PCAProjection:
+    """Orthonormal projection onto the top principal components of a training sample"""
+    def __init__(self, mean=None, components=None):
+        self.mean = mean
+        self.components = components
+
+    def fit(self, data, n_components):
+        data = np.asarray(data, dtype=np.float32)
+        self.mean = data.mean(axis=0)
+        _, _, vt = np.linalg.svd(data - self.mean, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:n_components], dtype=np.float32)
+        return self
+
+    def project(self, data):
+        return (np.asarray(data, dtype=np.float32) - self.mean) @ self.components.T
+
+
+class VectorCompressor:
+    """
+    Optional PCA projection followed by int8 scalar quantization.
+
+    Squared L2 distances in the projected space approximate the original ones
+    (the projection is orthonormal), so compressed codes are good enough to
+    build a shortlist that is then re-scored with the full-precision vectors.
+
+    Parameters:
+    components (int): Number of PCA dimensions to keep, None to skip the projection
+    """
+    def __init__(self, components=None):
+        self.components = components
+        self.projection = None
+        self.quantizer = ScalarQuantizer()
+
+    @property
+    def code_size(self):
+        return len(self.quantizer.low)
+
+    def fit(self, data):
+        data = np.asarray(data, dtype=np.float32)
+        if self.components and self.components < data.shape[1]:
+            self.projection = PCAProjection().fit(data, self.components)
+            data = self.projection.project(data)
+        self.quantizer.fit(data)
+        return self
+
+    def _project(self, data):
+        data = np.asarray(data, dtype=np.float32)
+        return self.projection.project(data) if self.projection is not None else data
+
+    def encode(self, data):
+        """
+        Returns:
+        tuple: (int8 codes, squared norms of the decoded codes)
+        """
+        codes = self.quantizer.encode(self._project(data))
+        decoded = self.quantizer.decode(codes)
+        return codes, np.einsum("ij,ij->i", decoded, decoded).astype(np.float32)
+
+    def prepare_query(self, query):
+        """Fold the quantizer's scale and offset into the query once per search"""
+        projected = self._project(np.asarray(query, dtype=np.float32)[np.newaxis, :])[0]
+        scaled = projected * self.quantizer.scale
+        bias = float(projected @ (128 * self.quantizer.scale + self.quantizer.low))
+        return scaled, bias, float(projected @ projected)
+
+    @staticmethod
+    def distances(prepared_query, codes, code_norms):
+        """Approximate squared L2 distances between a prepared query and a block of codes"""
+        scaled, bias, query_norm = prepared_query
+        # einsum reads the int8 codes directly instead of materializing a float32 copy
+        return code_norms + query_norm - 2 * (np.einsum("ij,j->i", codes, scaled) + bias)
+
+    def save(self, path):
+        arrays = {"low": self.quantizer.low, "scale": self.quantizer.scale}
+        if self.projection is not None:
+            arrays.update(mean=self.projection.mean, components=self.projection.components)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        arrays = np.load(path)
+        compressor = cls()
+        compressor.quantizer = ScalarQuantizer(arrays["low"], arrays["scale"])
+        if "components" in arrays:
+            compressor.projection = PCAProjection(arrays["mean"], arrays["components"])
+            compressor.components = len(arrays["components"])
+        return compressor
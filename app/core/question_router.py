@@ -0,0 +1,73 @@
+import re
+import threading
+
+# "-" and "/" only count as operators with spaces around them: case numbers (CVL-2023-001), ISO dates and
+# article or case references (15/2023) use them without spaces and must stay on the direct path
+MATH_PATTERN = re.compile(
+    r"\d\s*[+*^×÷]\s*\d|\d\s*%|\d\s+[-/]\s+\d"
+    r"|\b(calculate|compute|sqrt|percent(age)?|how much is|sum of|days (between|from|until))\b"
+    r"|обчисл|порахуй|скільки буде|відсот|днів між|calcul",
+    re.IGNORECASE,
+)
+MULTI_STEP_PATTERN = re.compile(
+    r"\b(compare|comparison|difference between|versus|vs\.?|and then|step by step|first .+ then)\b"
+    r"|порівня|різниц|спочатку|compar",
+    re.IGNORECASE,
+)
+
+
+class QuestionRouter:
+    """
+    Choose between the single-shot retrieve-and-answer path and the ReAct agent.
+
+    Classification is a few regular expressions, so it costs no LLM call:
+    arithmetic, several questions at once, comparisons and very long
+    questions go to the agent, everything else is answered from one search.
+    Latency and LLM calls are accumulated per path to compare the two.
+
+    Parameters:
+    max_direct_words (int): Longer questions are treated as multi-step
+    enabled (bool): When False every question goes to the agent
+    """
+    PATHS = ("direct", "agent")
+
+    def __init__(self, max_direct_words=40, enabled=True):
+        self.max_direct_words = max_direct_words
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {path: {"questions": 0, "seconds": 0.0, "llm_calls": 0} for path in self.PATHS}
+
+    def classify(self, question):
+        """
+        Returns:
+        tuple: (path, reason) where path is "direct" or "agent"
+        """
+        if not self.enabled:
+            return "agent", "direct path disabled"
+        if MATH_PATTERN.search(question):
+            return "agent", "math"
+        if question.count("?") > 1:
+            return "agent", "several questions"
+        if MULTI_STEP_PATTERN.search(question):
+            return "agent", "multi-step"
+        if len(question.split()) > self.max_direct_words:
+            return "agent", "long question"
+        return "direct", "single lookup"
+
+    def record(self, path, seconds, llm_calls):
+        with self._lock:
+            stats = self._stats[path]
+            stats["questions"] += 1
+            stats["seconds"] += seconds
+            stats["llm_calls"] += llm_calls
+
+    def stats(self):
+        with self._lock:
+            return {
+                path: {
+                    "questions": stats["questions"],
+                    "avg_seconds": stats["seconds"] / stats["questions"] if stats["questions"] else 0.0,
+                    "avg_llm_calls": stats["llm_calls"] / stats["questions"] if stats["questions"] else 0.0,
+                }
+                for path, stats in self._stats.items()
+            }
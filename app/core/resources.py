@@ -0,0 +1,128 @@
+import os
+
+import streamlit as st
+
+# Heavyweight objects shared by every session and page of the Streamlit process.
+# Streamlit re-executes a page on every interaction; only per-user state such as
+# chat memory belongs in st.session_state. Dependencies are imported inside the
+# getters so a page only loads the libraries behind the resources it uses.
+
+
+@st.cache_resource
+def get_llm(temperature=0.3, deployment="gpt-4", streaming=False):
+    from langchain_openai import AzureChatOpenAI
+
+    return AzureChatOpenAI(
+        temperature=temperature,
+        azure_deployment=deployment,
+        streaming=streaming,
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION"))
+
+
+@st.cache_resource
+def get_schema_cache(uri):
+    """SQLDatabase and table_info for a database URI, rebuilt when its pg_catalog fingerprint changes"""
+    from langchain_community.utilities import SQLDatabase
+    from core.schema_cache import SchemaCache
+
+    return SchemaCache(lambda: SQLDatabase.from_uri(uri),
+                       check_interval=float(os.getenv("SQL_SCHEMA_CHECK_SECONDS", "60")))
+
+
+@st.cache_resource
+def get_sql_query_prompt():
+    from langchain import hub
+
+    return hub.pull("langchain-ai/sql-query-system-prompt")
+
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus text endpoint for the stage latencies, started once when RAG_METRICS_PORT is set"""
+    port = os.getenv("RAG_METRICS_PORT")
+    if not port:
+        return None
+    from core.tracing import start_metrics_server
+
+    # Loopback by default; set RAG_METRICS_HOST=0.0.0.0 to let a Prometheus on another host scrape it
+    return start_metrics_server(int(port), host=os.getenv("RAG_METRICS_HOST", "127.0.0.1"))
+
+
+@st.cache_resource
+def get_math_chain(temperature=0.3):
+    from langchain.chains import LLMMathChain
+
+    return LLMMathChain.from_llm(llm=get_llm(temperature))
+
+
+@st.cache_resource
+def get_calculator():
+    """Calculator tool: local evaluation first, the LLM math chain only for what it can't parse"""
+    from core.calculator import Calculator
+
+    return Calculator(fallback=lambda question: get_math_chain().run(question))
+
+
+@st.cache_resource
+def get_shared_query_embeddings():
+    """Query embedding cache shared by every session of this process"""
+    from core.simple_rag import get_query_embedding_function
+
+    return get_query_embedding_function()
+
+
+@st.cache_resource
+def get_shared_storage():
+    """One storage backend (and Chroma client) for search and ingestion"""
+    from core.simple_rag import get_storage
+
+    return get_storage()
+
+
+@st.cache_resource
+def get_search_tool():
+    from core.context_packing import ContextPacker
+    from core.simple_rag import ChromaSearchTool
+
+    return ChromaSearchTool(
+        get_shared_query_embeddings(),
+        storage=get_shared_storage(),
+        context_packer=ContextPacker(token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))),
+        route_top_n=int(os.getenv("RAG_ROUTE_TOP_N", "0"))
+    )
+
+
+@st.cache_resource
+def get_document_processor():
+    from core.simple_rag import DocumentProcessor
+
+    return DocumentProcessor(storage=get_shared_storage())
+
+
+@st.cache_resource
+def get_answer_cache():
+    """Answers shared by every session, dropped whenever the indexed documents change"""
+    from core.answer_cache import SemanticAnswerCache
+
+    return SemanticAnswerCache(threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")))
+
+
+@st.cache_resource
+def get_question_router():
+    """Sends simple questions to one search plus one answer instead of the ReAct agent"""
+    from core.question_router import QuestionRouter
+
+    return QuestionRouter(enabled=os.getenv("RAG_DIRECT_ANSWERS", "1") != "0")
+
+
+@st.cache_resource
+def get_ingestion_queue():
+    from core.ingestion_jobs import IngestionJobQueue
+
+    answer_cache = get_answer_cache()
+
+    def invalidate_answers(result):
+        if result["status"] != "exists":
+            answer_cache.invalidate()
+
+    return IngestionJobQueue(get_document_processor(), workers=2, on_finished=invalidate_answers)
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+
+from core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# One md5 over every user column (with its type) and constraint; changes with any DDL that table_info reflects
+FINGERPRINT_QUERY = """
+SELECT md5(concat(
+    (SELECT string_agg(concat_ws(':', n.nspname, c.relname, c.relkind, a.attnum, a.attname,
+                                 format_type(a.atttypid, a.atttypmod), a.attnotnull),
+                       ',' ORDER BY n.nspname, c.relname, a.attnum)
+     FROM pg_catalog.pg_attribute a
+     JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+     JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+     WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f') AND a.attnum > 0 AND NOT a.attisdropped
+       AND n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'),
+    (SELECT string_agg(concat_ws(':', con.conrelid::regclass, con.conname, pg_get_constraintdef(con.oid)),
+                       ',' ORDER BY con.conrelid::regclass::text, con.conname)
+     FROM pg_catalog.pg_constraint con
+     JOIN pg_catalog.pg_namespace n ON n.oid = con.connamespace
+     WHERE n.nspname NOT IN ('pg_catalog', 'information_schema'))
+))
+"""
+
+
+class SchemaCache:
+    """
+    SQLDatabase and its table_info description, rebuilt only when the catalog changes.
+
+    `get_table_info()` reflects every table and runs a sample-row SELECT
+    against each one, so it is built once and reused. At most every
+    `check_interval` seconds a single pg_catalog query fingerprints the
+    columns and constraints; when the fingerprint differs the SQLDatabase
+    is recreated (it fixes its table list when constructed) and the
+    description rebuilt. Within the interval a question costs no database
+    round trip. Sample rows are only refreshed together with the schema.
+
+    Parameters:
+    factory: Callable returning a new SQLDatabase
+    check_interval (float): Seconds between fingerprint checks, 0 to check on every question
+    """
+    def __init__(self, factory, check_interval=60):
+        self.factory = factory
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._db = None
+        self._table_info = None
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._stats = {"hits": 0, "checks": 0, "rebuilds": 0, "build_seconds": 0.0}
+
+    @property
+    def db(self):
+        with self._lock:
+            if self._db is None:
+                self._db = self.factory()
+            return self._db
+
+    def fingerprint(self, db):
+        with span("sql.schema_fingerprint"):
+            return db.run(FINGERPRINT_QUERY)
+
+    def table_info(self):
+        """
+        Returns:
+        str: Schema description for the SQL prompt, from the cache unless the catalog changed
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._table_info is not None and now - self._checked_at < self.check_interval:
+                self._stats["hits"] += 1
+                return self._table_info
+            if self._db is None:
+                self._db = self.factory()
+            try:
+                fingerprint = self.fingerprint(self._db)
+            except Exception as e:
+                if self._table_info is None:
+                    raise
+                # Keep serving the last description rather than failing the question
+                logger.warning("Schema fingerprint failed, using the cached table info: %s", e)
+                self._checked_at = now
+                return self._table_info
+            self._stats["checks"] += 1
+            self._checked_at = now
+            if fingerprint == self._fingerprint:
+                self._stats["hits"] += 1
+                return self._table_info
+            self._rebuild(fingerprint)
+            return self._table_info
+
+    def _rebuild(self, fingerprint):
+        start = time.perf_counter()
+        with span("sql.schema_build", first=self._fingerprint is None):
+            if self._fingerprint is not None:
+                self._db = self.factory()
+            self._table_info = self._db.get_table_info()
+        self._fingerprint = fingerprint
+        self._stats["rebuilds"] += 1
+        self._stats["build_seconds"] = time.perf_counter() - start
+        logger.info("Schema description built in %.2fs (%d tables)",
+                    self._stats["build_seconds"], len(self._db.get_usable_table_names()))
+
+    def invalidate(self):
+        """Force a fingerprint check on the next question"""
+        with self._lock:
+            self._checked_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
@@ -1,35 +1,126 @@
-from time import sleep
 import chromadb
-from chromadb import Settings, Client
+from chromadb import EmbeddingFunction
 import os
-from chromadb.utils import embedding_functions
-from langchain.embeddings import openai
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyMuPDFLoader, TextLoader, Docx2txtLoader
 import tempfile
+import hashlib
+import threading
 from dotenv import load_dotenv
+from core.embedding_pipeline import EmbeddingPipeline
+from core.embedding_cache import CachedEmbeddingFunction, normalize_query, normalize_text
+from core.loaders import SUPPORTED_EXTENSIONS, iter_chunks
+from core.storage import SHARED_COLLECTION_NAME, STORAGE_MODES, PerFileStorage, SharedStorage
+from core.numpy_store import NumpyStorage
+from core.lexical_index import get_lexical_index, is_identifier_query, reciprocal_rank_fusion
+from core.collection_router import get_collection_router
+from core.tracing import current_span, get_tracer, span
 
 load_dotenv()
 
-openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_type="azure",
-    model_name="text-embedding-ada-002",
-    api_version="2023-05-15"
-)
+EMBEDDING_MODEL = "text-embedding-ada-002"
+WRITE_BATCH_SIZE = 1000
+
+def create_openai_embedding_function():
+    from chromadb.utils import embedding_functions
+
+    return embedding_functions.OpenAIEmbeddingFunction(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_type="azure",
+        model_name=EMBEDDING_MODEL,
+        api_version="2023-05-15"
+    )
+
+class LazyEmbeddingFunction(EmbeddingFunction):
+    """
+    Embedding function built on first use
+
+    Keeps the OpenAI client library out of the import path, so pages start
+    rendering before the first embedding is actually needed.
+    """
+    def __init__(self, factory):
+        self._factory = factory
+        self._function = None
+        self._lock = threading.Lock()
+
+    def __call__(self, input):
+        if self._function is None:
+            with self._lock:
+                if self._function is None:
+                    self._function = self._factory()
+        return self._function(input)
+
+openai_ef = LazyEmbeddingFunction(create_openai_embedding_function)
+
+def get_cached_embedding_function(path="./cache/embeddings.sqlite"):
+    """Wrap openai_ef with the persistent chunk embedding cache"""
+    return CachedEmbeddingFunction(openai_ef, model_name=EMBEDDING_MODEL, path=path)
+
+def get_query_embedding_function(path="./cache/query_embeddings.sqlite", ttl=7 * 24 * 3600, max_entries=50_000):
+    """
+    Wrap openai_ef with the persistent search query cache
+
+    Queries are normalized for case, whitespace and trailing punctuation, and
+    entries expire after `ttl` seconds.
+    """
+    return CachedEmbeddingFunction(
+        openai_ef,
+        model_name=EMBEDDING_MODEL,
+        path=path,
+        max_entries=max_entries,
+        ttl=ttl,
+        normalize=normalize_query
+    )
+
+_chroma_client = None
+_chroma_client_lock = threading.Lock()
 
 def get_chroma_client():
-    """Get or create a ChromaDB client"""
-    if not os.path.exists("./chroma_db"):
-        os.makedirs("./chroma_db")
-    return chromadb.PersistentClient(path="./chroma_db")
+    """Get or create the process-wide ChromaDB client"""
+    global _chroma_client
+    with _chroma_client_lock:
+        if _chroma_client is None:
+            if not os.path.exists("./chroma_db"):
+                os.makedirs("./chroma_db")
+            _chroma_client = chromadb.PersistentClient(path="./chroma_db")
+        return _chroma_client
+
+def get_storage(mode=None, embeddings=None):
+    """
+    Storage layout for document chunks
+
+    "per_file" keeps one collection per uploaded file, "shared" keeps every
+    chunk in one collection tagged with document metadata, "numpy" keeps the
+    vectors in a memory-mapped matrix under RAG_VECTOR_STORE_PATH instead of
+    Chroma. Defaults to the RAG_STORAGE_MODE environment variable, then "per_file".
+    A compressed numpy store (python -m core.numpy_store compress) re-scores
+    RAG_VECTOR_RESCORE * k shortlisted chunks with full-precision vectors.
+    """
+    mode = mode or os.getenv("RAG_STORAGE_MODE", "per_file")
+    embeddings = embeddings if embeddings is not None else openai_ef
+    if mode == "numpy":
+        return NumpyStorage(
+            os.getenv("RAG_VECTOR_STORE_PATH", "./vector_store"),
+            embeddings,
+            rescore=int(os.getenv("RAG_VECTOR_RESCORE", "4"))
+        )
+    if mode == "shared":
+        return SharedStorage(get_chroma_client(), embeddings)
+    if mode == "per_file":
+        return PerFileStorage(get_chroma_client(), embeddings)
+    raise ValueError(f"Unknown storage mode '{mode}', expected one of {STORAGE_MODES}")
 
 class ChromaSearchTool:
     """Custom tool for semantic search in ChromaDB."""
-    def __init__(self, embeddings):
+    def __init__(self, embeddings, storage=None, lexical_index=None, lexical_weight=0.5, context_packer=None,
+                 router=None, route_top_n=0):
         self.embeddings = embeddings
-        self.client = get_chroma_client()
+        self.storage = storage if storage is not None else get_storage(embeddings=embeddings)
+        self.client = self.storage.client
+        self.lexical_index = lexical_index if lexical_index is not None else get_lexical_index()
+        self.lexical_weight = lexical_weight
+        self.context_packer = context_packer
+        self.router = router if router is not None else get_collection_router()
+        self.route_top_n = route_top_n
              
     def search(self, query: str, k: int = 5) -> str:
         """
@@ -49,29 +140,96 @@ class ChromaSearchTool:
             documents.append(f"Document {i+1} (Relevance: {1-score:.2f}):\n{doc}\n")
         
         return "\n".join(documents)
-    
-    def multiple_collection_search(self, query: str, k: int = 5) -> str:
-        collections_name = self.client.list_collections()
-        all_results = []
 
-        for collection_name in collections_name:
+    def search_collections(self, query: str, k: int = 5, documents=None, include_embeddings=False):
+        """
+        Hybrid search: BM25 over the lexical index fused with vector search
+
+        Queries made mostly of identifiers (case numbers, articles, citations)
+        are answered from the lexical index alone, without embedding the query.
+        Otherwise the query is embedded once and both rankings are merged with
+        reciprocal rank fusion. With `route_top_n` set, the vector search only
+        covers the documents whose centroids best match the query.
 
-            collection = self.client.get_collection(
-                name=collection_name,
-                embedding_function=openai_ef
-                )
+        Parameters:
+        query (str): Search query
+        k (int): Number of hits
+        documents (list): Optional document names to restrict the search to
+        include_embeddings (bool): Append the stored embedding to every hit (None for lexical-only hits)
 
-            results = collection.query(
-                query_texts=[query],
-                n_results=k
+        Returns:
+        list: (distance-like score, metadata, document) tuples, lower is better
+        """
+        lexical_hits = []
+        if self.lexical_weight > 0:
+            with span("search.lexical", k=k * 2):
+                lexical_hits = self.lexical_index.search(query, k * 2, documents=documents)
+            if lexical_hits and is_identifier_query(query):
+                best = lexical_hits[0][0]
+                return [
+                    (1 - score / best, metadata, text) + ((None,) if include_embeddings else ())
+                    for score, _, metadata, text in lexical_hits[:k]
+                ]
+
+        names = self.storage.list_documents()
+        if not names:
+            return []
+
+        with span("search.embed_query"):
+            query_embedding = self.embeddings([query])[0]
+        if self.route_top_n:
+            with span("search.route", documents=len(documents or names)):
+                documents = self.route(query_embedding, documents or names)
+        with span("search.vector", documents=len(documents or names)):
+            vector_hits = self.storage.query(
+                query_embedding,
+                k * 2 if lexical_hits else k,
+                documents=documents,
+                include_embeddings=include_embeddings
             )
+        if not lexical_hits:
+            return vector_hits[:k]
+        if not include_embeddings:
+            return reciprocal_rank_fusion(vector_hits, lexical_hits, k, self.lexical_weight)
+
+        stored = {hit[2]: hit[3] for hit in vector_hits}
+        fused = reciprocal_rank_fusion([hit[:3] for hit in vector_hits], lexical_hits, k, self.lexical_weight)
+        return [(score, metadata, text, stored.get(text)) for score, metadata, text in fused]
+    
+    def route(self, query_embedding, names):
+        """
+        Narrow the searched documents to the `route_top_n` best centroids
+
+        Documents the router has not seen yet (indexed before it existed) are
+        always searched; `python -m core.collection_router` adds them.
+        """
+        if len(names) <= self.route_top_n:
+            return names
+        routed = [name for _, name in self.router.route(query_embedding, self.route_top_n, documents=names)]
+        return routed + [name for name in names if name not in self.router]
 
-            for distance, metadata, document in zip(results['distances'][0], results['metadatas'][0], results['documents'][0]):
-                all_results.append((distance, metadata, document))
+    def delete_document(self, name):
+        """Delete a document from the vector storage, the lexical index and the router"""
+        self.storage.delete_document(name)
+        self.lexical_index.remove_document(name)
+        self.router.remove_document(name)
 
-        all_results.sort(key=lambda x: x[0])
+    def multiple_collection_search(self, query: str, k: int = 5, documents=None) -> str:
+        with span("search", k=k):
+            return self._multiple_collection_search(query, k, documents)
 
-        top_5_results = all_results[:k]
+    def _multiple_collection_search(self, query, k, documents):
+        if self.context_packer is None:
+            top_5_results = self.search_collections(query, k, documents=documents)
+        else:
+            candidates = self.search_collections(
+                query, k * self.context_packer.candidates, documents=documents, include_embeddings=True
+            )
+            with span("search.pack", candidates=len(candidates)) as current:
+                packed = self.context_packer.pack(candidates, k)
+                current.set(tokens=packed["tokens"], tokens_saved=packed["tokens_saved"],
+                            merged=packed["merged"], duplicates=packed["duplicates"])
+            top_5_results = packed["passages"]
         documents = []
 
         for i, (distance, metadata, document) in enumerate(top_5_results, start=1):
@@ -82,25 +240,83 @@ class ChromaSearchTool:
             documents.append(formatted_result)
         return "\n\n".join(documents)
     
+class IndexingWriter:
+    """
+    Writer wrapper that keeps the router centroid and the BM25 index in step with the vector store
+
+    Each batch reaches the side indexes only after the vector write succeeded,
+    so a failed ingestion never leaves lexical entries for chunks that were
+    not stored.
+    """
+    def __init__(self, writer, router, name, lexical_index):
+        self._writer = writer
+        self._router = router
+        self._name = name
+        self._lexical_index = lexical_index
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self._writer.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        self._router.add(self._name, embeddings)
+        self._lexical_index.add_many(zip(ids, documents, metadatas if metadatas is not None else [None] * len(ids)))
+
+    def update(self, ids, metadatas):
+        self._writer.update(ids=ids, metadatas=metadatas)
+        self._lexical_index.update_metadata_many(zip(ids, metadatas))
+
+    def delete(self, ids):
+        self._writer.delete(ids=ids)
+        self._lexical_index.remove_many(ids)
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+def create_text_splitter(chunk_size=1800, chunk_overlap=200):
+    """Text splitter shared by uploads and bulk ingestion workers"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        add_start_index=True,
+    )
+
+def chunk_id_for(file_name, text, occurrences):
+    """
+    Stable, content-derived chunk id
+
+    `occurrences` counts identical chunks already seen in the same file, so
+    repeated boilerplate gets distinct but still deterministic ids.
+    """
+    digest = hashlib.sha256(f"{file_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()[:32]
+    count = occurrences.get(digest, 0)
+    occurrences[digest] = count + 1
+    return digest if count == 0 else f"{digest}-{count}"
+
+def collection_name_for(file_name):
+    """Collection name used for an uploaded file: its base name without extension"""
+    return os.path.splitext(os.path.basename(file_name))[0]
+
 class DocumentProcessor:
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1800,
-            chunk_overlap=200,
-            length_function=len,
+    def __init__(self, embeddings=None, batch_size=64, max_workers=4, streaming=True, storage=None,
+                 lexical_index=None, router=None, text_splitter=None):
+        self.text_splitter = text_splitter if text_splitter is not None else create_text_splitter()
+        self.embeddings = embeddings if embeddings is not None else get_cached_embedding_function()
+        self.storage = storage if storage is not None else get_storage(embeddings=self.embeddings)
+        self.client = self.storage.client
+        self.lexical_index = lexical_index if lexical_index is not None else get_lexical_index()
+        self.router = router if router is not None else get_collection_router()
+        self.streaming = streaming
+        self.pipeline = EmbeddingPipeline(
+            self.embeddings,
+            batch_size=batch_size,
+            max_workers=max_workers
         )
-        self.embeddings = openai_ef
-        self.client = get_chroma_client()
-
-    def process_file(self, file):
-        base_filename = os.path.splitext(file.name)[0]
-        collection_name_pf = f"{base_filename}"
 
-        existing_collections = self.client.list_collections()
+    def _load_chunks(self, file):
+        """Load the whole file with a LangChain loader through a temporary file"""
+        from langchain_community.document_loaders import PyMuPDFLoader, TextLoader, Docx2txtLoader
 
-        if collection_name_pf in existing_collections:
-            return {"status": "exists", "collection_name": collection_name_pf}
-        
         with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
             tmp_file.write(file.getvalue())
             tmp_file_path = tmp_file.name
@@ -116,21 +332,126 @@ class DocumentProcessor:
                 raise ValueError("Unsupported file type")
 
             documents = loader.load()
-            chunks = self.text_splitter.split_documents(documents)
-            
-            texts = [doc.page_content for doc in chunks]
-
-            embeddings = self.embeddings(texts)
-            
-            collection = self.client.create_collection(name=collection_name_pf)
-            
-            collection.add(
-                embeddings=embeddings,
-                documents=texts,
-                ids=[f"doc_{i}" for i in range(len(texts))]
-            )
-            
-            return {"status": "success", "collection_name": collection_name_pf}
-            
+            yield from self.text_splitter.split_documents(documents)
+
         finally:
             os.unlink(tmp_file_path)
+
+    def iter_chunks(self, file):
+        """Yield chunks of an uploaded file, streamed from its bytes unless streaming is disabled"""
+        if self.streaming:
+            return iter_chunks(file.name, file.getvalue(), self.text_splitter)
+        return self._load_chunks(file)
+
+    def process_file(self, file, progress=None):
+        if not file.name.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise ValueError("Unsupported file type")
+
+        with span("ingest.process_file", file=file.name) as current:
+            collection_name_pf = collection_name_for(file.name)
+            content_hash = hashlib.sha256(file.getvalue()).hexdigest()
+
+            if self.storage.document_hash(collection_name_pf) == content_hash:
+                current.set(status="exists")
+                return {"status": "exists", "collection_name": collection_name_pf}
+
+            # Chunks are parsed lazily while the pipeline embeds, so parsing is timed per item
+            chunks = get_tracer().traced_iter("ingest.parse_split", self.iter_chunks(file))
+            result = self.index_chunks(file.name, chunks, progress=progress, content_hash=content_hash)
+            current.set(status=result["status"], chunks=result["stats"]["total_chunks"])
+            return result
+
+    def index_chunks(self, file_name, chunks, progress=None, content_hash=None):
+        """
+        Embed and store the chunks of one file, re-indexing incrementally
+
+        Chunk ids are derived from the chunk content, so when the file was
+        indexed before only new or changed chunks are embedded, chunks that
+        disappeared are deleted and unchanged chunks only get their position
+        metadata refreshed.
+
+        `progress`, if given, receives the pipeline stats plus the current
+        `page` and `total_pages` (when the format has pages) after every batch.
+        """
+        collection_name_pf = collection_name_for(file_name)
+        if collection_name_pf == SHARED_COLLECTION_NAME:
+            # Per-file storage hides this collection name (it holds the shared-mode chunks), so the document
+            # would never be searched or listed
+            raise ValueError(f"'{file_name}' maps to the reserved document name "
+                             f"'{SHARED_COLLECTION_NAME}'; rename the file")
+        created = collection_name_pf not in self.storage.list_documents()
+        # Documents indexed before the router existed get their centroid rebuilt from storage
+        reroute = not created and collection_name_pf not in self.router
+        collection = IndexingWriter(self.storage.writer(collection_name_pf), self.router, collection_name_pf,
+                                    self.lexical_index)
+        existing_ids = set() if created else self.storage.get_chunk_ids(collection_name_pf)
+
+        seen_ids = set()
+        kept = []
+        occurrences = {}
+        position = {"page": 0, "total_pages": None}
+
+        def new_records():
+            for i, chunk in enumerate(chunks):
+                text = chunk.page_content
+                position["page"] = chunk.metadata.get("page", 0)
+                position["total_pages"] = chunk.metadata.get("total_pages")
+                chunk_id = chunk_id_for(file_name, text, occurrences)
+                seen_ids.add(chunk_id)
+                metadata = {
+                    "source": file_name,
+                    "document": collection_name_pf,
+                    "chunk": i,
+                    "page": chunk.metadata.get("page", 0),
+                    "offset": chunk.metadata.get("start_index", 0)
+                }
+                if chunk_id in existing_ids:
+                    kept.append((chunk_id, metadata))
+                else:
+                    yield chunk_id, text, metadata
+
+        def report(stats):
+            progress({**stats, **position})
+
+        hits_before = getattr(self.embeddings, "hits", 0)
+        try:
+            stats = self.pipeline.run(new_records(), collection, progress=report if progress else None)
+        except Exception:
+            if created:
+                self.storage.delete_document(collection_name_pf)
+                self.lexical_index.remove_document(collection_name_pf)
+                self.router.remove_document(collection_name_pf)
+            raise
+
+        for start in range(0, len(kept), WRITE_BATCH_SIZE):
+            batch = kept[start:start + WRITE_BATCH_SIZE]
+            collection.update(ids=[chunk_id for chunk_id, _ in batch], metadatas=[metadata for _, metadata in batch])
+
+        removed_ids = list(existing_ids - seen_ids)
+        for start in range(0, len(removed_ids), WRITE_BATCH_SIZE):
+            batch = removed_ids[start:start + WRITE_BATCH_SIZE]
+            if not reroute:
+                self.router.subtract(collection_name_pf, self.storage.get_embeddings(collection_name_pf, batch))
+            collection.delete(ids=batch)
+
+        if reroute:
+            self.router.remove_document(collection_name_pf)
+            current_ids = list(seen_ids)
+            for start in range(0, len(current_ids), WRITE_BATCH_SIZE):
+                batch = current_ids[start:start + WRITE_BATCH_SIZE]
+                self.router.add(collection_name_pf, self.storage.get_embeddings(collection_name_pf, batch))
+
+        self.storage.register_document(collection_name_pf, content_hash, chunks=len(seen_ids))
+
+        stats["cache_hits"] = getattr(self.embeddings, "hits", 0) - hits_before
+        stats["total_chunks"] = len(seen_ids)
+        stats["unchanged"] = len(kept)
+        stats["removed"] = len(removed_ids)
+        # Recorded on the caller's ingest span (ingest.process_file or ingest.bulk_file)
+        current = current_span.get()
+        if current is not None:
+            current.set(embedded=stats["chunks"], unchanged=stats["unchanged"], removed=stats["removed"],
+                        cache_hits=stats["cache_hits"], tokens=stats["tokens"])
+
+        status = "success" if created else "updated"
+        return {"status": status, "collection_name": collection_name_pf, "stats": stats}
@@ -0,0 +1,176 @@
+"""
+Import time and memory per module for the app's entry points.
+
+Usage (from the app directory):
+    python -m core.startup_profiler --output startup.json
+    python -m core.startup_profiler --baseline startup.json --threshold 1.2
+    python -m core.startup_profiler pages/Tasks.py core.resources --top 15
+
+Every target (a module name or a page script) runs in a fresh interpreter so
+the numbers are cold-import costs. A finder on sys.meta_path times each
+module's execution and, with tracemalloc, the Python memory it allocates;
+both are reported cumulative (including the modules it imported) and self.
+Page scripts run in Streamlit bare mode. With --baseline, targets whose total
+time or peak RSS grew by more than --threshold are listed and the exit code
+is 1, so the report can gate CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+DEFAULT_TARGETS = ["streamlit", "pages/Tasks.py", "core.resources", "core.simple_rag", "rag_chatbot.py"]
+
+BOOTSTRAP = r"""
+import importlib.abc, json, resource, runpy, sys, time, tracemalloc
+
+target, output_path, trace_memory = sys.argv[1], sys.argv[2], sys.argv[3] == "1"
+records = {}
+stack = []
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        # Builtin and frozen importers are shared classes, not per-module loaders
+        if loader is None or isinstance(loader, type) or not hasattr(loader, "exec_module"):
+            return spec
+        original = loader.exec_module
+
+        def exec_module(module):
+            start = time.perf_counter()
+            memory = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+            stack.append([0.0, 0])
+            try:
+                original(module)
+            finally:
+                seconds = time.perf_counter() - start
+                allocated = (tracemalloc.get_traced_memory()[0] - memory) if trace_memory else 0
+                child_seconds, child_memory = stack.pop()
+                if stack:
+                    stack[-1][0] += seconds
+                    stack[-1][1] += allocated
+                records[name] = {
+                    "seconds": seconds,
+                    "self_seconds": seconds - child_seconds,
+                    "memory_kb": allocated / 1024,
+                    "self_memory_kb": (allocated - child_memory) / 1024,
+                }
+
+        loader.exec_module = exec_module
+        return spec
+
+
+if trace_memory:
+    tracemalloc.start()
+sys.meta_path.insert(0, ImportProfiler())
+error = None
+start = time.perf_counter()
+try:
+    if target.endswith(".py"):
+        runpy.run_path(target, run_name="__main__")
+    else:
+        __import__(target)
+except BaseException as e:
+    error = f"{type(e).__name__}: {e}"
+seconds = time.perf_counter() - start
+
+with open(output_path, "w") as output:
+    json.dump({
+        "seconds": seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "python_memory_mb": tracemalloc.get_traced_memory()[0] / 2 ** 20 if trace_memory else None,
+        "modules": records,
+        "error": error,
+    }, output)
+"""
+
+
+def profile_target(target, trace_memory=True, env=None):
+    """Run one target in a fresh interpreter and return its import report"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as output:
+        output_path = output.name
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-c", BOOTSTRAP, target, output_path, "1" if trace_memory else "0"],
+            capture_output=True, text=True, env=env
+        )
+        if os.path.getsize(output_path) == 0:
+            return {"error": completed.stderr.strip().splitlines()[-1:] or "no report", "modules": {}}
+        with open(output_path) as report_file:
+            return json.load(report_file)
+    finally:
+        os.remove(output_path)
+
+
+def summarize(report, top=10):
+    modules = report.pop("modules")
+    top_level = {name: stats for name, stats in modules.items() if "." not in name}
+    report["modules"] = len(modules)
+    report["top_packages"] = dict(sorted(top_level.items(), key=lambda item: -item[1]["seconds"])[:top])
+    report["top_self"] = dict(sorted(modules.items(), key=lambda item: -item[1]["self_seconds"])[:top])
+    return report
+
+
+def compare(report, baseline, threshold):
+    """Targets whose total time or peak RSS grew by more than `threshold` times"""
+    regressions = []
+    for target, current in report["targets"].items():
+        previous = baseline.get("targets", {}).get(target)
+        if not previous or current.get("error") or previous.get("error"):
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if previous.get(metric) and current[metric] > previous[metric] * threshold:
+                regressions.append({"target": target, "metric": metric,
+                                    "baseline": previous[metric], "current": current[metric]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile cold import time and memory of the app")
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS, help="Module names or page scripts")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="Previous report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Allowed growth factor before a regression")
+    parser.add_argument("--top", type=int, default=10, help="Modules listed per target")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (faster, less accurate memory)")
+    args = parser.parse_args()
+
+    report = {"python": sys.version.split()[0], "targets": {}}
+    for target in args.targets:
+        report["targets"][target] = summarize(profile_target(target, not args.no_memory), args.top)
+        result = report["targets"][target]
+        status = f"error: {result['error']}" if result.get("error") else "ok"
+        print(f"{target}: {result.get('seconds', 0):.2f}s, peak RSS {result.get('peak_rss_mb', 0):.0f} MB, "
+              f"{result['modules']} modules ({status})", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            report["regressions"] = compare(report, json.load(baseline_file), args.threshold)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text)
+    else:
+        print(text)
+
+    for regression in report.get("regressions", []):
+        print(f"Regression in {regression['target']}: {regression['metric']} "
+              f"{regression['baseline']:.2f} -> {regression['current']:.2f}", file=sys.stderr)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
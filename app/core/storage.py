@@ -0,0 +1,245 @@
+import contextvars
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.tracing import span
+
+SHARED_COLLECTION_NAME = "documents"
+STORAGE_MODES = ("per_file", "shared", "numpy")
+
+
+def _where_documents(documents):
+    if not documents:
+        return None
+    if len(documents) == 1:
+        return {"document": documents[0]}
+    return {"document": {"$in": list(documents)}}
+
+
+def _iter_collection(collection, where=None, batch_size=1000):
+    offset = 0
+    while True:
+        batch = collection.get(where=where, limit=batch_size, offset=offset, include=["documents", "metadatas"])
+        if not batch["ids"]:
+            return
+        yield from zip(batch["ids"], batch["documents"], batch["metadatas"])
+        offset += len(batch["ids"])
+
+
+def _include(include_embeddings):
+    return ["distances", "metadatas", "documents"] + (["embeddings"] if include_embeddings else [])
+
+
+def _hits(results, include_embeddings=False):
+    columns = [results['distances'][0], results['metadatas'][0], results['documents'][0]]
+    if include_embeddings:
+        columns.append(results['embeddings'][0])
+    return list(zip(*columns))
+
+
+class PerFileStorage:
+    """
+    One Chroma collection per document, named after the file.
+
+    Every collection has its own HNSW index, so a search fans out to all of
+    them on a thread pool and merges the global top k.
+    """
+    mode = "per_file"
+
+    def __init__(self, client, embeddings, max_workers=8):
+        self.client = client
+        self.embeddings = embeddings
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._collections = {}
+
+    def list_documents(self):
+        return [name for name in self.client.list_collections() if name != SHARED_COLLECTION_NAME]
+
+    def document_hash(self, name):
+        if name not in self.client.list_collections():
+            return None
+        return (self.client.get_collection(name).metadata or {}).get("content_hash")
+
+    def document_hashes(self):
+        """Document name -> content hash (None if unknown) of every document"""
+        return {name: (self.client.get_collection(name).metadata or {}).get("content_hash")
+                for name in self.list_documents()}
+
+    def get_chunk_ids(self, name):
+        return set(self.client.get_collection(name).get(include=[])["ids"])
+
+    def get_embeddings(self, name, ids):
+        """Stored embeddings of the given chunks of a document"""
+        return self.client.get_collection(name).get(ids=list(ids), include=["embeddings"])["embeddings"]
+
+    def writer(self, name):
+        """Collection the chunks of a document are written to"""
+        return self.client.get_or_create_collection(name=name)
+
+    def iter_chunks(self, name):
+        """Yield (id, text, metadata) for every stored chunk of a document"""
+        return _iter_collection(self.client.get_collection(name))
+
+    def register_document(self, name, content_hash=None, chunks=None):
+        if content_hash:
+            self.client.get_collection(name).modify(metadata={"content_hash": content_hash})
+
+    def delete_document(self, name):
+        self._collections.pop(name, None)
+        self.client.delete_collection(name)
+
+    def _get_collection(self, collection_name):
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = self.client.get_collection(
+                name=collection_name,
+                embedding_function=self.embeddings
+            )
+            self._collections[collection_name] = collection
+        return collection
+
+    def _query_collection(self, collection_name, query_embedding, k, include_embeddings=False):
+        with span("search.collection", collection=collection_name):
+            try:
+                results = self._get_collection(collection_name).query(
+                    query_embeddings=[query_embedding],
+                    n_results=k,
+                    include=_include(include_embeddings)
+                )
+            except Exception:
+                # The collection may have been deleted or recreated since it was cached
+                self._collections.pop(collection_name, None)
+                results = self._get_collection(collection_name).query(
+                    query_embeddings=[query_embedding],
+                    n_results=k,
+                    include=_include(include_embeddings)
+                )
+        return _hits(results, include_embeddings)
+
+    def query(self, query_embedding, k, documents=None, include_embeddings=False):
+        """
+        Query the given documents (all by default) in parallel
+
+        Returns:
+        list: (distance, metadata, document) tuples sorted by distance, with the
+        stored embedding appended when include_embeddings is set
+        """
+        collections_name = documents or self.list_documents()
+        futures = [
+            self._executor.submit(
+                contextvars.copy_context().run,
+                self._query_collection, collection_name, query_embedding, k, include_embeddings
+            )
+            for collection_name in collections_name
+        ]
+        hits = (hit for future in futures for hit in future.result())
+        return heapq.nsmallest(k, hits, key=lambda hit: hit[0])
+
+
+class DocumentCatalog:
+    """SQLite list of the documents stored in the shared collection"""
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                name TEXT PRIMARY KEY,
+                content_hash TEXT,
+                chunks INTEGER,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def names(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM documents ORDER BY name")]
+
+    def content_hash(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash FROM documents WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def hashes(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, content_hash FROM documents"))
+
+    def upsert(self, name, content_hash=None, chunks=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO documents (name, content_hash, chunks, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET content_hash = excluded.content_hash, "
+                "chunks = excluded.chunks, updated_at = excluded.updated_at",
+                (name, content_hash, chunks, time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, name):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE name = ?", (name,))
+            self._conn.commit()
+
+
+class SharedStorage:
+    """
+    All chunks in a single Chroma collection, tagged with `document` metadata.
+
+    A search is one ANN query, optionally scoped with a `where` filter, and
+    deleting a document is a metadata delete.
+    """
+    mode = "shared"
+
+    def __init__(self, client, embeddings, catalog_path="./chroma_db/documents_catalog.sqlite"):
+        self.client = client
+        self.embeddings = embeddings
+        self.collection = client.get_or_create_collection(
+            name=SHARED_COLLECTION_NAME,
+            embedding_function=embeddings
+        )
+        self.catalog = DocumentCatalog(catalog_path)
+
+    def list_documents(self):
+        return self.catalog.names()
+
+    def document_hash(self, name):
+        return self.catalog.content_hash(name)
+
+    def document_hashes(self):
+        return self.catalog.hashes()
+
+    def get_chunk_ids(self, name):
+        return set(self.collection.get(where={"document": name}, include=[])["ids"])
+
+    def get_embeddings(self, name, ids):
+        return self.collection.get(ids=list(ids), include=["embeddings"])["embeddings"]
+
+    def writer(self, name):
+        return self.collection
+
+    def iter_chunks(self, name):
+        return _iter_collection(self.collection, where={"document": name})
+
+    def register_document(self, name, content_hash=None, chunks=None):
+        self.catalog.upsert(name, content_hash, chunks)
+
+    def delete_document(self, name):
+        self.collection.delete(where={"document": name})
+        self.catalog.delete(name)
+
+    def query(self, query_embedding, k, documents=None, include_embeddings=False):
+        if self.collection.count() == 0:
+            return []
+        results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=_where_documents(documents),
+            include=_include(include_embeddings)
+        )
+        return _hits(results, include_embeddings)
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+
+from core.tokens import count_tokens
+from core.tracing import current_span, get_tracer
+
+_recorders = {}
+_recorders_lock = threading.Lock()
+
+
+def get_latency_recorder(name):
+    """Process-wide latency recorder, e.g. time to first token of one page"""
+    with _recorders_lock:
+        if name not in _recorders:
+            _recorders[name] = LatencyRecorder(name)
+        return _recorders[name]
+
+
+class LatencyRecorder:
+    """Recent latency samples with percentile summaries"""
+    def __init__(self, name, max_samples=1000):
+        self.name = name
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=max_samples)
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def stats(self):
+        with self._lock:
+            samples = np.asarray(self._samples)
+        if not len(samples):
+            return {"count": 0, "p50": None, "p95": None}
+        return {"count": len(samples), "p50": float(np.percentile(samples, 50)),
+                "p95": float(np.percentile(samples, 95))}
+
+
+class StreamingAnswerHandler(BaseCallbackHandler):
+    """
+    Stream a ReAct agent run into Streamlit placeholders.
+
+    Tool calls are written to `steps` as the agent makes them, and tokens
+    after the "Final Answer:" marker are streamed into `answer`; with
+    marker=None every token is part of the answer. The model must be created
+    with streaming=True for tokens to arrive one by one. `llm_calls` and
+    `prompt_tokens` count the model calls made during the run and the
+    tokens sent to them.
+
+    Parameters:
+    answer: st.empty() placeholder for the final answer
+    steps: Optional container (e.g. st.status) for intermediate steps
+    recorder (LatencyRecorder): Receives the time to the first answer token
+    """
+    def __init__(self, answer, steps=None, recorder=None, marker="Final Answer:"):
+        self.answer = answer
+        self.steps = steps
+        self.recorder = recorder
+        self.marker = marker
+        self.started_at = time.perf_counter()
+        self.time_to_first_token = None
+        self.time_to_first_answer_token = None
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.text = ""
+        self._buffer = ""
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.llm_calls += 1
+        self.prompt_tokens += sum(count_tokens(prompt) for prompt in prompts)
+        self._buffer = ""
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.llm_calls += 1
+        self.prompt_tokens += sum(count_tokens(str(message.content)) for batch in messages for message in batch)
+        self._buffer = ""
+
+    def on_llm_new_token(self, token, **kwargs):
+        now = time.perf_counter() - self.started_at
+        if self.time_to_first_token is None:
+            self.time_to_first_token = now
+        self._buffer += token
+        if self.marker is None:
+            text = self._buffer.lstrip()
+        else:
+            position = self._buffer.find(self.marker)
+            if position < 0:
+                return
+            text = self._buffer[position + len(self.marker):].lstrip()
+        if not text:
+            return
+        if self.time_to_first_answer_token is None:
+            self.time_to_first_answer_token = now
+            if self.recorder is not None:
+                self.recorder.record(now)
+        self.text = text
+        self.answer.markdown(text + "▌")
+
+    def on_agent_action(self, action, **kwargs):
+        if self.steps is not None:
+            self.steps.write(f"🔧 {action.tool}: {action.tool_input}")
+
+    def on_tool_end(self, output, **kwargs):
+        if self.steps is not None:
+            output = str(output)
+            self.steps.caption(output[:300] + ("…" if len(output) > 300 else ""))
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records every LLM call as an `llm.call` span with prompt and completion token counts"""
+    def __init__(self, tracer=None):
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self._runs = {}
+
+    def _start(self, run_id, serialized, prompt_tokens):
+        model = ((serialized or {}).get("kwargs") or {}).get("azure_deployment") or (serialized or {}).get("name")
+        self._runs[run_id] = (time.perf_counter(), current_span.get(), prompt_tokens, model)
+
+    def on_llm_start(self, serialized, prompts, run_id=None, **kwargs):
+        self._start(run_id, serialized, sum(count_tokens(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, run_id=None, **kwargs):
+        self._start(run_id, serialized,
+                    sum(count_tokens(str(message.content)) for batch in messages for message in batch))
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        if run_id not in self._runs:
+            return
+        start, parent, prompt_tokens, model = self._runs.pop(run_id)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        completion_tokens = usage.get("completion_tokens") or sum(
+            count_tokens(generation.text) for generations in response.generations for generation in generations
+        )
+        prompt_tokens = usage.get("prompt_tokens") or prompt_tokens
+        self.tracer.count("llm_prompt_tokens_total", prompt_tokens)
+        self.tracer.count("llm_completion_tokens_total", completion_tokens)
+        self.tracer.record("llm.call", time.perf_counter() - start, parent=parent, model=model,
+                           prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error, run_id=None, **kwargs):
+        if run_id not in self._runs:
+            return
+        start, parent, prompt_tokens, model = self._runs.pop(run_id)
+        self.tracer.record("llm.call", time.perf_counter() - start, parent=parent, model=model,
+                           prompt_tokens=prompt_tokens, error=f"{type(error).__name__}: {error}")
@@ -0,0 +1,232 @@
+"""
+Nested latency spans for ingestion, retrieval, LLM calls and the SQL pipeline.
+
+    from core.tracing import span
+    with span("search.vector", documents=3):
+        ...
+
+Every finished span is appended to a JSONL file (RAG_TRACE_PATH, default
+./traces/spans.jsonl, empty to disable) with its trace id and parent, and its
+duration is kept in memory per stage for p50/p95/p99 summaries. The summaries
+are served in the Prometheus text format on RAG_METRICS_PORT when it is set.
+Spans started in worker threads nest correctly when the work is submitted
+with contextvars.copy_context().run.
+
+Summarize a trace file (from the app directory):
+    python -m core.tracing traces/spans.jsonl
+"""
+import argparse
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+current_span = contextvars.ContextVar("current_span", default=None)
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Process-wide tracer shared by the pages, the search tool and ingestion"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(os.getenv("RAG_TRACE_PATH", "./traces/spans.jsonl"))
+        return _tracer
+
+
+def span(name, **attributes):
+    return get_tracer().span(name, **attributes)
+
+
+def summarize_durations(durations):
+    """count, total and p50/p95/p99 seconds of a list of durations"""
+    samples = np.asarray(durations, dtype=np.float64)
+    summary = {"count": len(samples), "total": float(samples.sum())}
+    for quantile in QUANTILES:
+        summary[f"p{round(quantile * 100)}"] = float(np.quantile(samples, quantile)) if len(samples) else 0.0
+    return summary
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Tracer:
+    """
+    Records spans to a JSONL sink and keeps recent durations per stage.
+
+    Parameters:
+    path (str): JSONL file the spans are appended to, or None/"" to keep them in memory only
+    max_samples (int): Durations kept per stage for the percentiles
+    """
+    def __init__(self, path=None, max_samples=10_000):
+        self.path = path or None
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._counters = defaultdict(float)
+        if self.path and os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        parent = current_span.get()
+        current = Span(name, parent.trace_id if parent else uuid.uuid4().hex[:16],
+                       parent.span_id if parent else None, attributes)
+        token = current_span.set(current)
+        started_at = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield current
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current_span.reset(token)
+            self._finish(current, started_at, time.perf_counter() - start, error)
+
+    def record(self, name, seconds, parent=None, error=None, **attributes):
+        """Record a span that was timed elsewhere, e.g. accumulated over a lazy iterator or a failed LLM call"""
+        parent = parent if parent is not None else current_span.get()
+        current = Span(name, parent.trace_id if parent else uuid.uuid4().hex[:16],
+                       parent.span_id if parent else None, attributes)
+        self._finish(current, time.time() - seconds, seconds, error)
+
+    def traced_iter(self, name, iterable, **attributes):
+        """Yield from `iterable`, recording the time spent producing items as one span"""
+        parent = current_span.get()
+        iterator = iter(iterable)
+        seconds, items = 0.0, 0
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.perf_counter() - start
+            items += 1
+            yield item
+        self.record(name, seconds, parent=parent, items=items, **attributes)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def _finish(self, current, started_at, seconds, error):
+        record = {
+            "trace_id": current.trace_id,
+            "span_id": current.span_id,
+            "parent_id": current.parent_id,
+            "name": current.name,
+            "start": started_at,
+            "seconds": seconds,
+            "attributes": current.attributes,
+        }
+        if error:
+            record["error"] = error
+        with self._lock:
+            self._durations[current.name].append(seconds)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as sink:
+                    sink.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def stats(self):
+        """
+        Returns:
+        dict: stage name -> count, total and p50/p95/p99 seconds of the recent spans
+        """
+        with self._lock:
+            durations = {name: list(samples) for name, samples in self._durations.items()}
+        return {name: summarize_durations(samples) for name, samples in sorted(durations.items())}
+
+    def prometheus(self):
+        """Stage summaries and counters in the Prometheus text exposition format"""
+        lines = [
+            "# HELP rag_stage_seconds Latency of pipeline stages over the recent spans",
+            "# TYPE rag_stage_seconds summary",
+        ]
+        for name, summary in self.stats().items():
+            for quantile in QUANTILES:
+                lines.append(f'rag_stage_seconds{{stage="{name}",quantile="{quantile}"}} '
+                             f'{summary[f"p{round(quantile * 100)}"]:.6f}')
+            lines.append(f'rag_stage_seconds_sum{{stage="{name}"}} {summary["total"]:.6f}')
+            lines.append(f'rag_stage_seconds_count{{stage="{name}"}} {summary["count"]}')
+        with self._lock:
+            counters = dict(self._counters)
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE rag_{name} counter")
+            lines.append(f"rag_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port, tracer=None, host="127.0.0.1"):
+    """Serve tracer.prometheus() on http://host:port/metrics from a daemon thread"""
+    tracer = tracer if tracer is not None else get_tracer()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = tracer.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", *server.server_address[:2])
+    return server
+
+
+def summarize_file(path, since=None):
+    """Per-stage summaries of the spans in a JSONL trace file"""
+    durations = defaultdict(list)
+    with open(path, encoding="utf-8") as trace_file:
+        for line in trace_file:
+            record = json.loads(line)
+            if since is None or record["start"] >= since:
+                durations[record["name"]].append(record["seconds"])
+    return {name: summarize_durations(samples) for name, samples in sorted(durations.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a JSONL trace file per stage")
+    parser.add_argument("path", nargs="?", default="./traces/spans.jsonl")
+    parser.add_argument("--hours", type=float, default=None, help="Only spans started in the last N hours")
+    args = parser.parse_args()
+
+    since = time.time() - args.hours * 3600 if args.hours else None
+    print(f"{'stage':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'total s':>10}")
+    for name, summary in summarize_file(args.path, since).items():
+        print(f"{name:<28}{summary['count']:>8}{summary['p50'] * 1000:>10.1f}{summary['p95'] * 1000:>10.1f}"
+              f"{summary['p99'] * 1000:>10.1f}{summary['total']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
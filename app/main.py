@@ -1,7 +1,13 @@
+import logging
+
 import streamlit as st
 
 if __name__ == '__main__':
-    
+    # INFO messages of our core modules (schema rebuilds, database setup) reach the console, libraries stay at
+    # WARNING so httpx does not log every API request; basicConfig is a no-op on reruns
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("core").setLevel(logging.INFO)
+
     pages = {
         "Thesis": [
             st.Page("pages/Tasks.py", title="Description"),
@@ -1,5 +1,10 @@
 import streamlit as st
-import pandas as pd
+
+def table(columns):
+    """Render equal-length columns as a markdown table; st.table would import pandas and pyarrow"""
+    lines = ["| " + " | ".join(columns) + " |", "|" + " --- |" * len(columns)]
+    lines += ["| " + " | ".join(row) + " |" for row in zip(*columns.values())]
+    st.markdown("\n".join(lines))
 
 custom_css = """
 <style>
@@ -30,31 +35,31 @@ The project belongs to the domain of **intelligent text information analysis**,
 
 It includes two core modules:
 """)
-st.table(pd.DataFrame({
+table({
     "Module": ["RAG Module", "NL-to-SQL Module"],
     "Purpose": [
         "Works with unstructured text documents",
         "Interacts with structured relational databases"
     ]
-}))
+})
 
 st.header("2. Project Goal")
 st.markdown("""
 The system aims to build an **agent-based assistant** that:
 """)
-st.table(pd.DataFrame({
+table({
     "Functionality": [
         "Answers natural language questions",
         "Retrieves knowledge from documents or databases",
         "Provides verified responses with explanation"
     ]
-}))
+})
 
 st.header("3. Project Tasks")
 
 st.subheader("Task 1: RAG Module")
 st.markdown("**Main Functionality:**")
-st.table(pd.DataFrame({
+table({
     "Step": [
         "File upload",
         "Chunking strategy",
@@ -64,35 +69,35 @@ st.table(pd.DataFrame({
         "Search relevant context",
         "Answer generation via GPT-4"
     ]
-}))
+})
 
 st.markdown("**Additional Requirements:**")
-st.table(pd.DataFrame({
+table({
     "Requirement": [
         "Minimize hallucinations",
         "Context-aware answering",
         "Use agent-based architecture"
     ]
-}))
+})
 
 st.subheader("Task 2: Natural Language to SQL Module")
 st.markdown("**Main Functionality:**")
-st.table(pd.DataFrame({
+table({
     "Step": [
         "Translate NL query to SQL",
         "Fetch DB schema dynamically",
         "Execute SQL query"
     ]
-}))
+})
 
 st.markdown("**Response Presentation:**")
-st.table(pd.DataFrame({
+table({
     "Condition": ["0 or 1 result", "More than 1 result", "All cases"],
     "Output": ["Natural language", "Table view", "Show SQL query"]
-}))
+})
 
 st.header("4. Technologies Used")
-st.table(pd.DataFrame({
+table({
     "Technology": [
         "LangChain",
         "ChromaDB",
@@ -107,4 +112,4 @@ st.table(pd.DataFrame({
         "Rapid creation of interactive UI",
         "Reliable open-source relational DB"
     ]
-}))
+})
@@ -1,23 +1,23 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
+import time
 from core.postgres import *
 from core.sql_commands import sql_commands
-from langchain_community.utilities import SQLDatabase
-from langchain_openai import AzureChatOpenAI
-from langchain import hub
+from core.resources import get_llm, get_metrics_server, get_schema_cache, get_sql_query_prompt
+from core.streaming import TracingCallbackHandler, get_latency_recorder
+from core.tracing import span
 from typing_extensions import TypedDict
 from typing_extensions import Annotated
 from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
 from langgraph.graph import START, StateGraph
-import pandas as pd
-import json
-import re
-import ast
 from langchain_core.messages import AIMessage, HumanMessage
 
 load_dotenv()
 
+# Must be the first Streamlit command: a cache_resource miss below draws a spinner
+st.set_page_config(page_title="Thesis", page_icon="📚", layout="wide")
+
 read_pass = os.getenv('READ_PASS')
 
 host = "localhost"
@@ -43,18 +43,15 @@ if not check_tables_exist(host, new_db_name, port, user, password):
         )    
 
 database_url = f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
-db = SQLDatabase.from_uri(f"postgresql://{read_only_user_name}:{agent_read_password}@{host}:{port}/{new_db_name}")
+schema_cache = get_schema_cache(f"postgresql://{read_only_user_name}:{agent_read_password}@{host}:{port}/{new_db_name}")
 
 openai_api_key = os.getenv('AZURE_OPENAI_API_KEY')
 endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
 api_version = os.getenv('OPENAI_API_VERSION')
 
-llm = AzureChatOpenAI(
-    temperature=0.7,
-    azure_deployment="gpt-4",
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"))
+llm = get_llm(temperature=0.7)
+get_metrics_server()
 
-st.set_page_config(page_title="Thesis", page_icon="📚", layout="wide")
 st.title("Talk to your data using natural language combined with SQL")
 
 class State(TypedDict):
@@ -69,22 +66,24 @@ class QueryOutput(TypedDict):
 
 def write_query(state: State):
     """Generate SQL query to fetch information."""
-    prompt = query_prompt_template.invoke(
-        {
-            "dialect": db.dialect,
-            "top_k": 10,
-            "table_info": db.get_table_info(),
-            "input": state["question"],
-        }
-    )
-    structured_llm = llm.with_structured_output(QueryOutput)
-    result = structured_llm.invoke(prompt)
+    with span("sql.write_query"):
+        prompt = query_prompt_template.invoke(
+            {
+                "dialect": schema_cache.db.dialect,
+                "top_k": 10,
+                "table_info": schema_cache.table_info(),
+                "input": state["question"],
+            }
+        )
+        structured_llm = llm.with_structured_output(QueryOutput)
+        result = structured_llm.invoke(prompt)
     return {"query": result["query"]}
 
 def execute_query(state: State):
     """Execute SQL query."""
-    execute_query_tool = QuerySQLDatabaseTool(db=db)
-    return {"result": execute_query_tool.invoke(state["query"])}
+    with span("sql.execute_query"):
+        execute_query_tool = QuerySQLDatabaseTool(db=schema_cache.db)
+        return {"result": execute_query_tool.invoke(state["query"])}
 
 def generate_answer(state: State):
     """Answer question using retrieved information as context."""
@@ -96,10 +95,11 @@ def generate_answer(state: State):
         f'SQL Result: {state["result"]}\n'
         'if the answer is a list with more than two rows return as a markdown table otherwise just a simple answer'
     )
-    response = llm.invoke(prompt)
+    with span("sql.generate_answer"):
+        response = llm.invoke(prompt)
     return {"answer": response.content}
 
-query_prompt_template = hub.pull("langchain-ai/sql-query-system-prompt")
+query_prompt_template = get_sql_query_prompt()
 
 graph_builder = StateGraph(State).add_sequence(
     [write_query, execute_query, generate_answer]
@@ -107,7 +107,7 @@ graph_builder = StateGraph(State).add_sequence(
 graph_builder.add_edge(START, "write_query")
 graph = graph_builder.compile()
 
-config = {"configurable": {'thread_id': 41}}
+config = {"configurable": {'thread_id': 41}, "callbacks": [TracingCallbackHandler()]}
 
 st.write("The database holds legal information, including data on cases, involved parties, and associated documents. For example, you could ask: 'Find all cases filed in 2023 related to corporate law'.")
 
@@ -125,23 +125,52 @@ if prompt := st.chat_input("Ask question about your data..."):
 
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
-        message_placeholder.markdown("Assistant is typing...")
+        message_placeholder.markdown("Writing SQL query...")
+        first_token_latency = get_latency_recorder("chat_postgres")
 
         context_messages = [
             {"role": m["role"], "content": m["content"]}
             for m in st.session_state.messages
         ]
 
-        try:
-            response = graph.invoke({"question": [HumanMessage(content=prompt)]}, config=config)
-            sql_query = response['query']
-            answer = response['answer']
-            message = f"**SQL Query:**\n```sql\n{sql_query}\n```\n\n**Response:**\n{answer}"
-            message_placeholder.markdown(message)
-
-        except Exception as e:
-            error_message = f"Error: {str(e)}"
-            message_placeholder.markdown(error_message)
-            response = error_message
-
-    st.session_state.messages.append({"role": "assistant", "content": message})
\ No newline at end of file
+        with span("chat.answer", page="chat_postgres"):
+            try:
+                start = time.perf_counter()
+                header, answer = "", ""
+                # "updates" reports each node as it finishes, "messages" streams the answer model's tokens
+                for mode, chunk in graph.stream({"question": [HumanMessage(content=prompt)]}, config=config,
+                                                stream_mode=["updates", "messages"]):
+                    if mode == "updates":
+                        if "write_query" in chunk:
+                            header = f"**SQL Query:**\n```sql\n{chunk['write_query']['query']}\n```\n\n"
+                            message_placeholder.markdown(header + "Running query...")
+                        elif "execute_query" in chunk:
+                            message_placeholder.markdown(header + "Generating answer...")
+                        elif "generate_answer" in chunk:
+                            answer = chunk["generate_answer"]["answer"]
+                        continue
+                    token, metadata = chunk
+                    if metadata.get("langgraph_node") != "generate_answer" or not token.content:
+                        continue
+                    if not answer:
+                        seconds = time.perf_counter() - start
+                        first_token_latency.record(seconds)
+                    answer += token.content
+                    message_placeholder.markdown(header + "**Response:**\n" + answer + "▌")
+
+                message = header + "**Response:**\n" + answer
+                message_placeholder.markdown(message)
+
+            except Exception as e:
+                error_message = f"Error: {str(e)}"
+                message_placeholder.markdown(error_message)
+                message = error_message
+
+        latency = first_token_latency.stats()
+        if latency["count"]:
+            st.caption(f"Time to first answer token: p50 {latency['p50']:.1f}s, p95 {latency['p95']:.1f}s")
+        schema = schema_cache.stats()
+        st.caption(f"Schema description: {schema['hits']} cached, {schema['rebuilds']} built "
+                   f"(last in {schema['build_seconds']:.2f}s)")
+
+    st.session_state.messages.append({"role": "assistant", "content": message})
@@ -1,38 +1,28 @@
 import streamlit as st
-from langchain_openai import AzureChatOpenAI
 from dotenv import load_dotenv
 import os
-import chromadb
-from chromadb.utils import embedding_functions
-from langchain.agents import create_react_agent, AgentExecutor
+import time
 from langchain_core.prompts import PromptTemplate
-from langchain.memory import ConversationBufferMemory
-from langchain.agents import Tool
-from langchain.chains import LLMMathChain
 from langchain_core.messages import HumanMessage, AIMessage
-from core.simple_rag import ChromaSearchTool, DocumentProcessor, get_chroma_client
-from langdetect import detect
+from core.answer_cache import corpus_fingerprint
+from core.conversation_memory import TokenBudgetMemory
+from core.streaming import StreamingAnswerHandler, TracingCallbackHandler, get_latency_recorder
+from core.tracing import span
+from core.resources import (
+    get_answer_cache, get_calculator, get_ingestion_queue, get_llm, get_metrics_server, get_question_router,
+    get_search_tool, get_shared_query_embeddings
+)
 
 load_dotenv()
 
 st.set_page_config(page_title="Thesis", page_icon="📚", layout="wide")
 st.title("RAG Chatbot")
 
-llm = AzureChatOpenAI(
-    temperature=0.3,
-    azure_deployment="gpt-4",
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"))
-
-openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_type="azure",
-    model_name="text-embedding-ada-002",
-    api_version="2023-05-15"
-)
-
 if "memory" not in st.session_state:
-    st.session_state.memory = ConversationBufferMemory(
+    # Recent turns verbatim within the budget, older turns folded into a running summary
+    st.session_state.memory = TokenBudgetMemory(
+        llm_factory=lambda: get_llm(temperature=0),
+        max_token_limit=int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "1000")),
         memory_key="chat_history",
         return_messages=True,
         output_key="output"
@@ -40,8 +30,8 @@ if "memory" not in st.session_state:
 
 if "processed_files" not in st.session_state:
     st.session_state.processed_files = set()
-if "chroma_client" not in st.session_state:
-     st.session_state.chroma_client = get_chroma_client()
+if "search_scope" not in st.session_state:
+    st.session_state.search_scope = []
 
 prompt = PromptTemplate(
     input_variables=["input", "tools", "tool_names", "chat_history", "agent_scratchpad"],
@@ -78,43 +68,136 @@ Thought: {agent_scratchpad}
 """
 )
 
-chroma_tool = ChromaSearchTool(openai_ef)
-chroma_db_tool =  Tool(
-            name="SemanticSearch",
-            func=chroma_tool.multiple_collection_search,
-            description="""Useful for searching through stored knowledge to find relevant information. Input should be a search query. Try to search for a relavant information each time you can."""
-        )
+direct_prompt = PromptTemplate(
+    input_variables=["chat_history", "context", "input"],
+    template="""
+Assistant answers legal questions from the retrieved context below. The assistant must always:
+1. If the question is not related to law or legal matters — respond with "I don't know".
+2. Use only the retrieved context and the chat history.
+3. Explicitly say "I don't know" when the context doesn't contain sufficient information,
+   the confidence in the answer is low or the pieces of information contradict each other.
+4. Answer in the same language as the user's question with all provided information.
 
-llm_math = LLMMathChain.from_llm(llm=llm)
-math_tool = Tool(
-    name='Calculator',
-    func=llm_math.run,
-    description='Useful for when you need to answer questions about math.'
-)
+Chat History:
+{chat_history}
 
-# When giving tools to LLM, we must pass as list of tools
-tools = [math_tool, chroma_db_tool]
+Retrieved context:
+{context}
 
-agent = create_react_agent(
-    llm=llm,
-    tools=tools,
-    prompt=prompt
+Question: {input}
+Answer:"""
 )
 
-# Create the agent executor
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    memory=st.session_state.memory,
-    verbose=True,
-    max_iterations=3,
-    handle_parsing_errors=True  
-)
+get_metrics_server()
+query_embeddings = get_shared_query_embeddings()
+chroma_tool = get_search_tool()
+
+@st.cache_resource
+def get_agent():
+    """ReAct agent and its tools, shared by every session and built on the first question"""
+    from langchain.agents import Tool, create_react_agent
+
+    search_tool = get_search_tool()
+    chroma_db_tool = Tool(
+        name="SemanticSearch",
+        # st.session_state resolves to the session that is running the agent
+        func=lambda query: search_tool.multiple_collection_search(
+            query, documents=st.session_state.search_scope or None
+        ),
+        description="""Useful for searching through stored knowledge to find relevant information. Input should be a search query. Try to search for a relavant information each time you can."""
+    )
+
+    math_tool = Tool(
+        name='Calculator',
+        func=get_calculator().run,
+        description=(
+            "Useful for when you need to answer questions about math. Input should be a math expression, "
+            "e.g. '1250 + 15%', '15% of 2300', '2024-03-15 + 30 days' or 'days between 2024-01-01 and 2024-03-01'. "
+            "A trailing '+ 15%' applies to the whole expression before it; a day count is negative when the second "
+            "date is earlier than the first."
+        )
+    )
 
-doc_processor = DocumentProcessor()
+    # When giving tools to LLM, we must pass as list of tools
+    tools = [math_tool, chroma_db_tool]
+
+    agent = create_react_agent(
+        llm=get_llm(streaming=True),
+        tools=tools,
+        prompt=prompt
+    )
+    return agent, tools
+
+def get_agent_executor():
+    """Thin wrapper around the shared agent that binds this session's memory"""
+    from langchain.agents import AgentExecutor
+
+    agent, tools = get_agent()
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        memory=st.session_state.memory,
+        max_iterations=3,
+        handle_parsing_errors=True
+    )
+
+def answer_directly(question, prepared_input, handler):
+    """One search and one LLM call, for questions that don't need the agent's reasoning loop"""
+    if handler.steps is not None:
+        handler.steps.write(f"🔧 SemanticSearch: {question}")
+    context = chroma_tool.multiple_collection_search(question, documents=st.session_state.search_scope or None)
+    chain = direct_prompt | get_llm(streaming=True)
+    inputs = {
+        "chat_history": st.session_state.memory.load_memory_variables({})["chat_history"],
+        "context": context,
+        "input": prepared_input,
+    }
+    callbacks = [handler, TracingCallbackHandler()]
+    output = "".join(chunk.content for chunk in chain.stream(inputs, config={"callbacks": callbacks}))
+    st.session_state.memory.save_context({"input": prepared_input}, {"output": output})
+    return output
+
+answer_cache = get_answer_cache()
+question_router = get_question_router()
+first_token_latency = get_latency_recorder("rag_chatbot")
+ingestion_queue = get_ingestion_queue()
+
+if "ingestion_jobs" not in st.session_state:
+    st.session_state.ingestion_jobs = []
+if "finished_jobs" not in st.session_state:
+    st.session_state.finished_jobs = set()
+
+def format_job(job):
+    if job["state"] == "failed":
+        return f"❌ {job['file_name']}: failed ({job['error']})"
+    if job["state"] == "done":
+        if job["result_status"] == "exists":
+            return f"✅ {job['file_name']}: already indexed"
+        return f"✅ {job['file_name']}: {job['result_status']}, {job['chunks']} chunks embedded"
+    status = f"⏳ {job['file_name']}: {job['state']}, {job['chunks']} chunks"
+    if job["total_pages"]:
+        status += f", page {job['page'] + 1}/{job['total_pages']}"
+    if job["eta_seconds"] is not None:
+        status += f", ~{job['eta_seconds']:.0f}s left"
+    return status
+
+@st.fragment(run_every=2)
+def show_ingestion_jobs():
+    jobs = ingestion_queue.list_jobs(st.session_state.ingestion_jobs)
+    for job in jobs:
+        st.text(format_job(job))
+
+    newly_finished = {
+        job["id"] for job in jobs
+        if not ingestion_queue.is_active(job) and job["id"] not in st.session_state.finished_jobs
+    }
+    if newly_finished:
+        st.session_state.finished_jobs |= newly_finished
+        st.rerun()
 
 def display_chat_history():
-    chat_history = st.session_state.memory.chat_memory.messages
+    memory = st.session_state.memory
+    chat_history = memory.archived_messages + memory.chat_memory.messages
     for message in reversed(chat_history):
         if isinstance(message, HumanMessage):
             st.write("Human: ", message.content)
@@ -122,6 +205,8 @@ def display_chat_history():
             st.write("Assistant: ", message.content)
 
 def detect_language(text):
+    from langdetect import detect
+
     try:
         return detect(text)
     except:
@@ -137,24 +222,71 @@ def get_language_instruction(lang_code):
     else:
         return "Respond in the language the question was asked."
 
-def prepare_input(user_input):
-    lang = detect_language(user_input)
+def prepare_input(user_input, lang):
     instruction = get_language_instruction(lang)
     return f"{instruction}\n{user_input}"
 
 def generate_response(input_text):
-    prepared_input = prepare_input(input_text)
-    try:
-        response = agent_executor.invoke({"input": prepared_input})
-        st.info(response["output"])
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
+    language = detect_language(input_text)
+    prepared_input = prepare_input(input_text, language)
+    with span("chat.answer", page="rag_chatbot") as trace:
+        try:
+            start = time.perf_counter()
+            memory = st.session_state.memory
+            scope = st.session_state.search_scope
+            # A follow-up depends on the conversation, so only a question asked with empty memory is cacheable
+            cacheable = not memory.chat_memory.messages and not memory.moving_summary_buffer
+            cached = None
+            if cacheable:
+                with span("chat.answer_cache"):
+                    query_embedding = query_embeddings([input_text])[0]
+                    fingerprint = corpus_fingerprint(chroma_tool.storage.document_hashes())
+                    cached = answer_cache.lookup(query_embedding, fingerprint, language, scope=scope)
+            if cached is not None:
+                trace.set(path="cache")
+                st.session_state.memory.save_context({"input": prepared_input}, {"output": cached["answer"]})
+                st.session_state.last_turn = {"prompt_tokens": 0, "llm_calls": 0}
+                st.info(cached["answer"])
+                st.caption(f"Answered from cache (similarity {cached['similarity']:.2f}, saved ~{cached['seconds']:.1f}s)")
+                return
+
+            # Tool calls appear in the status box and the final answer streams in as it is generated
+            path, reason = question_router.classify(input_text)
+            trace.set(path=path)
+            steps = st.status("Searching...", expanded=False)
+            answer = st.empty()
+            if path == "direct":
+                handler = StreamingAnswerHandler(answer, steps=steps, recorder=first_token_latency, marker=None)
+                output = answer_directly(input_text, prepared_input, handler)
+            else:
+                handler = StreamingAnswerHandler(answer, steps=steps, recorder=first_token_latency)
+                callbacks = [handler, TracingCallbackHandler()]
+                output = get_agent_executor().invoke({"input": prepared_input}, config={"callbacks": callbacks})["output"]
+            seconds = time.perf_counter() - start
+            question_router.record(path, seconds, handler.llm_calls)
+            trace.set(reason=reason, llm_calls=handler.llm_calls, prompt_tokens=handler.prompt_tokens)
+            st.session_state.last_turn = {"prompt_tokens": handler.prompt_tokens, "llm_calls": handler.llm_calls}
+            steps.update(label=f"Done in {seconds:.1f}s ({path} path: {reason})", state="complete")
+            answer.info(output)
+            if cacheable and not output.startswith("Agent stopped"):
+                answer_cache.add(
+                    query_embedding,
+                    fingerprint,
+                    input_text,
+                    output,
+                    seconds=time.perf_counter() - start,
+                    language=language,
+                    scope=scope
+                )
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
        
 col1, col2 = st.columns([1, 2])
 
 def delete_collection(collection_name):
     try:
-        st.session_state.chroma_client.delete_collection(collection_name)
+        chroma_tool.delete_document(collection_name)
+        answer_cache.invalidate()
         st.success(f"Collection '{collection_name}' deleted successfully!")
     except Exception as e:
         st.error(f"Error deleting collection: {e}")
@@ -176,22 +308,24 @@ with col1:
         <div class='custom-label'>Choose a pdf, txt, docx file:</div>
     """, unsafe_allow_html=True)
 
-    uploaded_file = st.file_uploader(label="", accept_multiple_files=False)
-    if uploaded_file is not None and uploaded_file.name not in st.session_state.processed_files:
-        with st.spinner("Processing your file..."):
-            result = doc_processor.process_file(uploaded_file)
+    uploaded_files = st.file_uploader(label="", accept_multiple_files=True)
+    for uploaded_file in uploaded_files or []:
+        if uploaded_file.file_id not in st.session_state.processed_files:
+            job_id = ingestion_queue.submit(uploaded_file.name, uploaded_file.getvalue())
+            st.session_state.ingestion_jobs.append(job_id)
+            st.session_state.processed_files.add(uploaded_file.file_id)
 
-            if result["status"] == "exists":
-                st.info(f"File '{uploaded_file.name}' was already processed and is ready to use.")
-            else:
-                st.success('Document processed successfully!')
-            
-            st.session_state.processed_files.add(uploaded_file.name)
+    show_ingestion_jobs()
 
     st.markdown("### Available Collections")
     try:
-        collections = st.session_state.chroma_client.list_collections()
+        collections = chroma_tool.storage.list_documents()
         if collections:
+            st.session_state.search_scope = st.multiselect(
+                "Limit search to",
+                collections,
+                default=[name for name in st.session_state.search_scope if name in collections]
+            )
             for collection_name in collections:
                 st.text(f"📄 {collection_name}")
         
@@ -242,5 +376,54 @@ with col2:
             
             generate_response(text)
 
+        st.caption(
+            f"Query embedding cache: {query_embeddings.hits} hits, {query_embeddings.misses} misses "
+            f"({query_embeddings.hit_rate:.0%} hit rate)"
+        )
+        answer_stats = answer_cache.stats()
+        st.caption(
+            f"Answer cache: {answer_stats['hits']}/{answer_stats['lookups']} hits "
+            f"({answer_stats['hit_rate']:.0%} hit rate), ~{answer_stats['seconds_saved']:.0f}s saved"
+        )
+        if chroma_tool.context_packer is not None:
+            context_stats = chroma_tool.context_packer.stats()
+            st.caption(
+                f"Context packing: {context_stats['tokens_saved']} of {context_stats['baseline_tokens']} "
+                f"retrieved tokens saved over {context_stats['queries']} searches "
+                f"({context_stats['merged']} chunks merged, {context_stats['duplicates']} near-duplicates dropped)"
+            )
+
+        calculator_stats = get_calculator().stats()
+        if calculator_stats["local"]["calls"] or calculator_stats["llm"]["calls"]:
+            st.caption(
+                f"Calculator: {calculator_stats['local']['calls']} evaluated locally "
+                f"({calculator_stats['local']['avg_ms']:.2f} ms on average), "
+                f"{calculator_stats['llm']['calls']} sent to the LLM"
+            )
+        for path, path_stats in question_router.stats().items():
+            if path_stats["questions"]:
+                st.caption(
+                    f"{path.capitalize()} path: {path_stats['questions']} questions, "
+                    f"{path_stats['avg_seconds']:.1f}s and {path_stats['avg_llm_calls']:.1f} LLM calls on average"
+                )
+        if st.session_state.memory.turns:
+            usage = st.session_state.memory.turns[-1]
+            last_turn = st.session_state.get("last_turn")
+            prompt_usage = (
+                f"{last_turn['prompt_tokens']} prompt tokens over {last_turn['llm_calls']} LLM calls; "
+                if last_turn else ""
+            )
+            st.caption(
+                f"Last turn: {prompt_usage}chat history {usage['history_tokens']} tokens "
+                f"({usage['summary_tokens']} summary, {usage['window_messages']} recent messages, "
+                f"{usage['summarized_messages']} summarized)"
+            )
+        latency = first_token_latency.stats()
+        if latency["count"]:
+            st.caption(
+                f"Time to first answer token: p50 {latency['p50']:.1f}s, p95 {latency['p95']:.1f}s "
+                f"over {latency['count']} answers"
+            )
+
         st.markdown("### Chat History")
         display_chat_history()
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app modules the same way the Streamlit pages do (`from core.x import ...`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["RAG_TRACE_PATH"] = ""
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Run every test in an empty directory, so default-path stores never touch ./chroma_db"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,64 @@
+from core.answer_cache import SemanticAnswerCache, corpus_fingerprint
+from core.fake_providers import FakeEmbeddingFunction
+
+embed = FakeEmbeddingFunction(dimensions=64)
+QUESTION = "Who pays for roof repairs?"
+FINGERPRINT = corpus_fingerprint({"lease": "hash-1", "contract": "hash-2"})
+
+
+def cache_with_answer(**kwargs):
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.add(embed([QUESTION])[0], FINGERPRINT, QUESTION, "The landlord.", seconds=3.0, **kwargs)
+    return cache
+
+
+def test_corpus_fingerprint_covers_names_and_content():
+    assert corpus_fingerprint({"a": "1", "b": "2"}) == corpus_fingerprint({"b": "2", "a": "1"})
+    assert corpus_fingerprint({"a": "1", "b": "2"}) != corpus_fingerprint({"a": "1"})
+    # The same document re-indexed with new content
+    assert corpus_fingerprint({"a": "1", "b": "2"}) != corpus_fingerprint({"a": "1", "b": "3"})
+
+
+def test_similar_question_hits():
+    cache = cache_with_answer(language="en")
+    hit = cache.lookup(embed(["who pays for roof repairs"])[0], FINGERPRINT, language="en")
+    assert hit["answer"] == "The landlord."
+    assert hit["similarity"] >= 0.95
+    assert cache.stats()["hits"] == 1
+
+
+def test_different_question_misses():
+    cache = cache_with_answer()
+    assert cache.lookup(embed(["When is the rent due?"])[0], FINGERPRINT) is None
+    assert cache.hit_rate == 0.0
+
+
+def test_changed_documents_invalidate_answers():
+    cache = cache_with_answer()
+    assert cache.lookup(embed([QUESTION])[0], corpus_fingerprint({"lease": "hash-1", "contract": "hash-3"})) is None
+    assert cache.stats()["entries"] == 0
+    # The old fingerprint does not bring the answer back
+    assert cache.lookup(embed([QUESTION])[0], FINGERPRINT) is None
+
+
+def test_invalidate_drops_every_answer():
+    cache = cache_with_answer()
+    cache.invalidate()
+    assert cache.lookup(embed([QUESTION])[0], FINGERPRINT) is None
+
+
+def test_language_and_scope_must_match():
+    cache = cache_with_answer(language="en", scope=["lease"])
+    vector = embed([QUESTION])[0]
+    assert cache.lookup(vector, FINGERPRINT, language="uk", scope=["lease"]) is None
+    assert cache.lookup(vector, FINGERPRINT, language="en") is None
+    assert cache.lookup(vector, FINGERPRINT, language="en", scope=["lease"]) is not None
+
+
+def test_oldest_answers_are_dropped():
+    cache = SemanticAnswerCache(max_entries=2)
+    for question in ["first question", "second question", "third question"]:
+        cache.add(embed([question])[0], FINGERPRINT, question, question.upper(), seconds=1.0)
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(embed(["first question"])[0], FINGERPRINT) is None
+    assert cache.lookup(embed(["third question"])[0], FINGERPRINT)["answer"] == "THIRD QUESTION"
@@ -0,0 +1,56 @@
+import pytest
+
+from core.calculator import Calculator
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("1250 + 15%", "1437.5"),
+    ("1,250 + 15%", "1437.5"),
+    ("1000 - 200 + 15%", "920"),
+    ("(1000 - 200) + 15%", "920"),
+    ("100 - 5 - 10%", "85.5"),
+    ("15% of 2300", "345"),
+    ("200 * 15%", "30"),
+    ("15% * 200", "30"),
+    ("1,250,000 / 2", "625000"),
+    ("What is 2^10?", "1024"),
+    ("sqrt(16) + 2", "6"),
+    ("12 x 3", "36"),
+])
+def test_arithmetic_and_percentages(question, expected):
+    assert Calculator().evaluate(question) == expected
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("2024-03-15 + 30 days", "2024-04-14"),
+    ("2024-01-31 + 1 month", "2024-02-29"),
+    ("15.03.2024 - 2 weeks", "2024-03-01"),
+    ("days between 2024-03-01 and 2024-05-01", "61 days"),
+    ("days between 2024-05-01 and 2024-03-01", "-61 days"),
+    ("days from 2024-05-01 to 2024-03-01", "-61 days"),
+    ("2024-05-01 - 2024-03-01", "61 days"),
+])
+def test_dates(question, expected):
+    assert Calculator().evaluate(question) == expected
+
+
+@pytest.mark.parametrize("question", [
+    "2 + 3 100",
+    "2 + 15% * 3",
+    "100 + 10% + 5%",
+    "how many days until the hearing",
+    "import os",
+])
+def test_ambiguous_or_unparseable_input_is_not_evaluated(question):
+    assert Calculator().evaluate(question) is None
+
+
+def test_run_falls_back_and_counts_paths():
+    questions = []
+    calculator = Calculator(fallback=lambda question: questions.append(question) or "Answer: 5")
+    assert calculator.run("2 + 2") == "Answer: 4"
+    assert calculator.run("2 + 15% * 3") == "Answer: 5"
+    assert questions == ["2 + 15% * 3"]
+    stats = calculator.stats()
+    assert stats["local"]["calls"] == 1
+    assert stats["llm"]["calls"] == 1
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from core.collection_router import CollectionRouter
+
+
+@pytest.fixture
+def router(workdir):
+    router = CollectionRouter(str(workdir / "collection_router.sqlite"))
+    router.add("lease", np.eye(4)[[0, 0, 1]])
+    router.add("ruling", np.eye(4)[[2, 3]])
+    return router
+
+
+def test_route_ranks_documents_by_centroid(router):
+    assert len(router) == 2
+    assert "lease" in router and "invoice" not in router
+    assert [name for _, name in router.route(np.eye(4)[0], top_n=2)] == ["lease", "ruling"]
+    assert [name for _, name in router.route(np.eye(4)[3], top_n=1)] == ["ruling"]
+    assert [name for _, name in router.route(np.eye(4)[0], top_n=2, documents=["ruling"])] == ["ruling"]
+
+
+def test_subtract_moves_the_centroid_and_drops_empty_documents(router):
+    router.subtract("lease", np.eye(4)[[0, 0]])
+    similarity, name = router.route(np.eye(4)[1], top_n=1)[0]
+    assert name == "lease"
+    assert similarity == pytest.approx(1.0)
+
+    router.subtract("lease", np.eye(4)[[1]])
+    assert "lease" not in router
+    router.subtract("missing", np.eye(4)[[1]])
+    router.remove_document("ruling")
+    assert router.route(np.eye(4)[0], top_n=2) == []
+
+
+def test_other_handles_see_changes(router):
+    other = CollectionRouter(router.path)
+    other.add("invoice", np.eye(4)[[1]])
+    assert router.route(np.eye(4)[1], top_n=1)[0][1] == "invoice"
+    other.clear()
+    assert len(router) == 0
+    assert router.route(np.eye(4)[1], top_n=1) == []
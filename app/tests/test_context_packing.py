@@ -0,0 +1,57 @@
+import numpy as np
+
+from core.context_packing import ContextPacker, merge_adjacent, mmr_order
+from core.fake_providers import FakeEmbeddingFunction
+
+embed = FakeEmbeddingFunction(dimensions=64)
+PAGE = ("The tenant pays rent monthly. The landlord repairs the roof within thirty days. "
+        "Pets are not allowed in the flat without written consent.")
+
+
+def hit(score, start, end, document="lease", page=0):
+    text = PAGE[start:end]
+    return score, {"document": document, "page": page, "offset": start}, text, embed([text])[0]
+
+
+def test_merge_adjacent_joins_overlapping_chunks_once():
+    passages = merge_adjacent([hit(0.2, 30, 90), hit(0.1, 0, 50), hit(0.3, 0, 50, page=1)])
+    assert len(passages) == 2
+    merged = passages[0]
+    assert merged["text"] == PAGE[0:90]
+    assert merged["chunks"] == 2
+    assert merged["rank"] == 0 and merged["score"] == 0.1
+    assert passages[1]["metadata"]["page"] == 1
+
+
+def test_merge_adjacent_keeps_distant_chunks_and_chunks_without_offsets():
+    hits = [hit(0.1, 0, 30), hit(0.2, 90, 120), (0.3, {"document": "lease"}, "No offset.", None)]
+    assert [passage["text"] for passage in merge_adjacent(hits)] == [PAGE[0:30], PAGE[90:120], "No offset."]
+
+
+def test_mmr_drops_near_duplicates_and_prefers_diverse_passages():
+    matrix = np.asarray([[1, 0, 0], [1, 0, 0], [0.8, 0.6, 0], [0, 0, 1]], dtype=np.float32)
+    order, duplicates = mmr_order(np.asarray([1.0, 0.95, 0.9, 0.5]), matrix, diversity=0.5)
+    assert duplicates == 1
+    assert order == [0, 3, 2]
+
+
+def test_pack_respects_the_token_budget_and_reports_savings():
+    packer = ContextPacker(token_budget=20)
+    hits = [hit(0.1, 0, 50), hit(0.2, 30, 90), hit(0.3, 0, 50, document="copy"), hit(0.4, 30, 90, document="copy"),
+            hit(0.5, 90, 145, page=1)]
+    result = packer.pack(hits, k=4)
+
+    assert result["merged"] == 2
+    assert result["duplicates"] == 1
+    assert result["tokens"] <= 20
+    assert result["passages"][0][2].startswith("The tenant pays rent")
+    assert result["tokens_saved"] == result["baseline_tokens"] - result["tokens"] > 0
+    assert packer.stats()["queries"] == 1
+
+
+def test_pack_truncates_a_single_oversized_passage():
+    result = ContextPacker(token_budget=5).pack([hit(0.1, 0, 145)], k=3)
+    assert len(result["passages"]) == 1
+    assert 0 < result["tokens"] <= 6
+    assert PAGE.startswith(result["passages"][0][2])
+    assert ContextPacker().pack([], k=3)["passages"] == []
@@ -0,0 +1,60 @@
+from core.conversation_memory import TokenBudgetMemory, message_tokens
+from core.fake_providers import FakeChatModel
+
+
+def make_memory(max_token_limit):
+    created = []
+
+    def factory():
+        created.append(FakeChatModel(answer_words=8))
+        return created[-1]
+
+    memory = TokenBudgetMemory(llm_factory=factory, max_token_limit=max_token_limit,
+                               memory_key="chat_history", return_messages=True)
+    return memory, created
+
+
+def ask(memory, turn):
+    memory.save_context({"input": f"Question {turn} about clause {turn} of the lease?"},
+                        {"output": f"Answer {turn}: clause {turn} says the tenant pays on time."})
+
+
+def test_turns_within_budget_are_kept_without_a_model():
+    memory, created = make_memory(max_token_limit=1000)
+    for turn in range(3):
+        ask(memory, turn)
+    assert len(memory.chat_memory.messages) == 6
+    assert memory.moving_summary_buffer == ""
+    assert created == []
+    assert memory.turns[-1]["summarized_messages"] == 0
+
+
+def test_oldest_whole_turns_are_folded_into_the_summary():
+    memory, created = make_memory(max_token_limit=60)
+    for turn in range(5):
+        ask(memory, turn)
+
+    messages = memory.chat_memory.messages
+    assert sum(message_tokens(message) for message in messages) <= 60
+    assert len(messages) == 4
+    assert messages[0].content.startswith("Question")
+    assert messages[-1].content.startswith("Answer 4")
+    assert memory.moving_summary_buffer
+    # One summary call per folded turn, all with the model created on the first one
+    assert len(created) == 1
+    assert memory.summary_calls == 3
+    assert len(memory.archived_messages) + len(messages) == 10
+    assert memory.archived_messages[0].content.startswith("Question 0")
+
+    usage = memory.token_usage()
+    assert usage["history_tokens"] == usage["summary_tokens"] + usage["window_tokens"]
+    assert usage["window_messages"] == len(messages)
+
+
+def test_latest_turn_is_kept_even_over_budget():
+    memory, _ = make_memory(max_token_limit=5)
+    ask(memory, 0)
+    ask(memory, 1)
+    assert [message.content[:10] for message in memory.chat_memory.messages] == ["Question 1", "Answer 1: "]
+    memory.clear()
+    assert memory.chat_memory.messages == [] and memory.archived_messages == [] and memory.turns == []
@@ -0,0 +1,38 @@
+import pytest
+from langchain_core.documents import Document
+
+from core.bulk_ingest import bulk_ingest
+from core.collection_router import CollectionRouter
+from core.fake_providers import FakeEmbeddingFunction
+from core.lexical_index import BM25Index
+from core.numpy_store import NumpyStorage
+from core.simple_rag import DocumentProcessor
+
+
+@pytest.fixture
+def processor(workdir):
+    return DocumentProcessor(
+        embeddings=FakeEmbeddingFunction(dimensions=16),
+        storage=NumpyStorage(str(workdir / "vector_store")),
+        lexical_index=BM25Index(str(workdir / "lexical_index.sqlite")),
+        router=CollectionRouter(str(workdir / "collection_router.sqlite")),
+    )
+
+
+def test_reserved_document_name_is_rejected(processor):
+    with pytest.raises(ValueError, match="reserved"):
+        processor.index_chunks("uploads/documents.pdf", [Document(page_content="Some text.")])
+    assert processor.storage.list_documents() == []
+
+    result = processor.index_chunks("uploads/documents-2024.pdf", [Document(page_content="Some text.")])
+    assert result["collection_name"] == "documents-2024"
+
+
+def test_bulk_ingest_refuses_reserved_names_before_indexing(processor, workdir):
+    folder = workdir / "incoming"
+    folder.mkdir()
+    (folder / "documents.txt").write_text("Reserved name.", encoding="utf-8")
+    (folder / "lease.txt").write_text("The tenant pays rent.", encoding="utf-8")
+    with pytest.raises(ValueError, match="documents.txt"):
+        bulk_ingest(str(folder), workers=1, manifest_path=str(workdir / "manifest.jsonl"), processor=processor)
+    assert processor.storage.list_documents() == []
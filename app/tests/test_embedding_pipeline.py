@@ -0,0 +1,94 @@
+import pytest
+
+from core.embedding_pipeline import EmbeddingPipeline, batched, is_throttling_error
+from core.fake_providers import FakeEmbeddingFunction, ThrottlingError
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.batches = []
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self.batches.append((ids, embeddings, documents, metadatas))
+
+
+def records(count):
+    return ((f"id-{i}", f"chunk number {i}", {"chunk": i}) for i in range(count))
+
+
+def test_batched_keeps_order_and_remainder():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_is_throttling_error():
+    assert is_throttling_error(ThrottlingError("slow down"))
+    assert is_throttling_error(RuntimeError("Error code: 429 - rate limit"))
+    assert not is_throttling_error(ValueError("bad input"))
+
+
+def test_writes_every_chunk_in_batches():
+    embeddings = FakeEmbeddingFunction(dimensions=16)
+    collection = RecordingCollection()
+    stats = EmbeddingPipeline(embeddings, batch_size=3, max_workers=2).run(records(10), collection)
+
+    assert stats["chunks"] == 10
+    assert stats["batches"] == 4
+    assert stats["retries"] == 0
+    assert sorted(len(ids) for ids, _, _, _ in collection.batches) == [1, 3, 3, 3]
+    written = [chunk_id for ids, _, _, _ in collection.batches for chunk_id in ids]
+    assert sorted(written) == sorted(f"id-{i}" for i in range(10))
+    assert embeddings.texts_embedded == 10
+
+
+def test_empty_metadata_does_not_drop_the_batch_metadata():
+    collection = RecordingCollection()
+    chunks = [("a", "first", {"chunk": 0}), ("b", "second", {}), ("c", "third", None)]
+    EmbeddingPipeline(FakeEmbeddingFunction(dimensions=16), batch_size=3).run(chunks, collection)
+    assert collection.batches[0][3] == [{"chunk": 0}, None, None]
+
+    collection = RecordingCollection()
+    EmbeddingPipeline(FakeEmbeddingFunction(dimensions=16), batch_size=3).run([("a", "first", {})], collection)
+    assert collection.batches[0][3] is None
+
+
+def test_chroma_accepts_batches_with_bare_chunks(workdir):
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=str(workdir / "chroma")).create_collection("lease")
+    chunks = [("a", "first", {"chunk": 0}), ("b", "second", {})]
+    EmbeddingPipeline(FakeEmbeddingFunction(dimensions=16), batch_size=2).run(chunks, collection)
+    assert collection.get(ids=["a", "b"])["metadatas"] == [{"chunk": 0}, None]
+
+
+def test_retries_throttled_batches():
+    embeddings = FakeEmbeddingFunction(dimensions=16, throttle_every=2)
+    collection = RecordingCollection()
+    progress = []
+    stats = EmbeddingPipeline(embeddings, batch_size=2, max_workers=1, backoff=0).run(
+        records(6), collection, progress=progress.append)
+
+    assert stats["chunks"] == 6
+    assert stats["batches"] == 3
+    assert stats["retries"] > 0
+    assert embeddings.calls == 3 + stats["retries"]
+    assert [update["chunks"] for update in progress] == [2, 4, 6]
+
+
+def test_gives_up_after_max_retries():
+    embeddings = FakeEmbeddingFunction(dimensions=16, throttle_every=1)
+    with pytest.raises(ThrottlingError):
+        EmbeddingPipeline(embeddings, batch_size=2, max_workers=1, max_retries=2, backoff=0).run(
+            records(2), RecordingCollection())
+    assert embeddings.calls == 3
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def failing(texts):
+        calls.append(texts)
+        raise ValueError("invalid input")
+
+    with pytest.raises(ValueError):
+        EmbeddingPipeline(failing, batch_size=2, max_workers=1, backoff=0).run(records(2), RecordingCollection())
+    assert len(calls) == 1
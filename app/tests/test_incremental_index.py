@@ -0,0 +1,70 @@
+from langchain_core.documents import Document
+
+from core.collection_router import CollectionRouter
+from core.fake_providers import FakeEmbeddingFunction
+from core.lexical_index import BM25Index
+from core.numpy_store import NumpyStorage
+from core.simple_rag import DocumentProcessor, chunk_id_for
+
+FILE_NAME = "contract.txt"
+
+
+def chunks(*texts):
+    return [Document(page_content=text, metadata={"page": 0, "start_index": i * 100}) for i, text in enumerate(texts)]
+
+
+def ids_for(*texts):
+    occurrences = {}
+    return {chunk_id_for(FILE_NAME, text, occurrences) for text in texts}
+
+
+def make_processor(workdir, embeddings):
+    return DocumentProcessor(
+        embeddings=embeddings,
+        storage=NumpyStorage(str(workdir / "vector_store")),
+        lexical_index=BM25Index(str(workdir / "lexical_index.sqlite")),
+        router=CollectionRouter(str(workdir / "collection_router.sqlite")),
+        batch_size=2,
+        max_workers=1,
+    )
+
+
+def test_chunk_ids_are_derived_from_content():
+    assert ids_for("Payment is due in 30 days.") == ids_for("Payment  is due in 30 days.")
+    assert ids_for("Payment is due in 30 days.") != ids_for("Payment is due in 60 days.")
+    # Repeated boilerplate gets distinct but deterministic ids
+    assert len(ids_for("Signed.", "Signed.")) == 2
+
+
+def test_reindex_embeds_only_changed_chunks(workdir):
+    embeddings = FakeEmbeddingFunction(dimensions=32)
+    processor = make_processor(workdir, embeddings)
+
+    first = processor.index_chunks(FILE_NAME, chunks(
+        "The tenant pays rent monthly.", "The landlord repairs the roof.", "Pets are not allowed."))
+    assert first["status"] == "success"
+    assert first["stats"]["chunks"] == 3
+    assert embeddings.texts_embedded == 3
+
+    second = processor.index_chunks(FILE_NAME, chunks(
+        "The tenant pays rent monthly.", "The landlord repairs the roof.", "Smoking is prohibited indoors."))
+    assert second["status"] == "updated"
+    assert second["stats"]["chunks"] == 1
+    assert second["stats"]["unchanged"] == 2
+    assert second["stats"]["removed"] == 1
+    assert embeddings.texts_embedded == 4
+
+    expected = ids_for("The tenant pays rent monthly.", "The landlord repairs the roof.",
+                       "Smoking is prohibited indoors.")
+    assert processor.storage.get_chunk_ids("contract") == expected
+    assert not processor.lexical_index.search("pets allowed", k=5)
+    assert processor.lexical_index.search("smoking", k=5)[0][1] in expected
+
+
+def test_reindex_refreshes_positions_of_moved_chunks(workdir):
+    processor = make_processor(workdir, FakeEmbeddingFunction(dimensions=32))
+    processor.index_chunks(FILE_NAME, chunks("Clause one.", "Clause two."))
+    processor.index_chunks(FILE_NAME, chunks("Clause two.", "Clause one."))
+
+    positions = {text: metadata["chunk"] for _, text, metadata in processor.storage.iter_chunks("contract")}
+    assert positions == {"Clause two.": 0, "Clause one.": 1}
@@ -0,0 +1,71 @@
+import pytest
+
+from core.lexical_index import BM25Index, is_identifier_query, reciprocal_rank_fusion, tokenize
+
+
+@pytest.fixture
+def index(workdir):
+    index = BM25Index(str(workdir / "lexical_index.sqlite"))
+    index.add_many([
+        ("lease-1", "The tenant pays rent monthly to the landlord.", {"document": "lease"}),
+        ("lease-2", "The landlord repairs the roof within 30 days.", {"document": "lease"}),
+        ("case-1", "Case CVL-2023-001 was decided in favour of the tenant.", {"document": "ruling"}),
+    ])
+    return index
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Case CVL-2023-001, art. 12.3") == [
+        "case", "cvl-2023-001", "cvl", "2023", "001", "art", "12.3", "12", "3"]
+    assert is_identifier_query("CVL-2023-001")
+    assert not is_identifier_query("who repairs the roof")
+
+
+def test_search_ranks_by_bm25(index):
+    assert len(index) == 3
+    hits = index.search("roof repairs", k=2)
+    assert hits[0][1] == "lease-2"
+    assert hits[0][2] == {"document": "lease"}
+    assert index.search("CVL-2023-001", k=1)[0][1] == "case-1"
+    assert index.search("tenant", k=5, documents=["ruling"])[0][1] == "case-1"
+    assert index.search("unrelated words", k=5) == []
+
+
+def test_add_replaces_and_remove_deletes(index):
+    index.add("lease-2", "Smoking is prohibited indoors.", {"document": "lease"})
+    assert len(index) == 3
+    assert index.search("roof", k=5) == []
+    assert index.search("smoking", k=5)[0][1] == "lease-2"
+
+    index.update_metadata("lease-2", {"document": "lease", "page": 2})
+    assert index.search("smoking", k=1)[0][2] == {"document": "lease", "page": 2}
+
+    index.remove("lease-2")
+    assert index.search("smoking", k=5) == []
+    index.remove_document("lease")
+    assert len(index) == 1
+    assert {hit[1] for hit in index.search("tenant landlord", k=5)} == {"case-1"}
+
+
+def test_failed_batch_leaves_no_entries(index):
+    with pytest.raises(AttributeError):
+        index.add_many([("new-1", "Fresh clause about deposits.", {"document": "lease"}),
+                        ("new-2", None, {"document": "lease"})])
+    assert len(index) == 3
+    assert index.search("deposits", k=5) == []
+
+
+def test_other_handles_see_writes(index, workdir):
+    other = BM25Index(index.path)
+    other.add("new-1", "Deposit is returned in 14 days.", {"document": "lease"})
+    assert index.search("deposit", k=1)[0][1] == "new-1"
+    other.clear()
+    assert len(index) == 0
+
+
+def test_reciprocal_rank_fusion_merges_rankings():
+    vector_hits = [(0.1, {"id": "a"}, "A"), (0.2, {"id": "b"}, "B")]
+    lexical_hits = [(5.0, "b", {"id": "b"}, "B"), (3.0, "c", {"id": "c"}, "C")]
+    fused = reciprocal_rank_fusion(vector_hits, lexical_hits, k=3, lexical_weight=0.5)
+    assert [text for _, _, text in fused] == ["B", "A", "C"]
+    assert fused[0][0] == 0.0
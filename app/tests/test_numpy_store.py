@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from core.fake_providers import FakeEmbeddingFunction
+from core.numpy_store import NumpyStorage
+
+embed = FakeEmbeddingFunction(dimensions=32)
+TEXTS = {
+    "a": "The tenant pays rent monthly.",
+    "b": "The landlord repairs the roof.",
+    "c": "Pets are not allowed in the flat.",
+}
+
+
+@pytest.fixture
+def store(workdir):
+    storage = NumpyStorage(str(workdir / "vector_store"))
+    ids = list(TEXTS)
+    storage.upsert(ids, embed(list(TEXTS.values())), list(TEXTS.values()),
+                   [{"document": "lease", "chunk": i} for i in range(len(ids))])
+    return storage
+
+
+def nearest(storage, text, k=1, **kwargs):
+    return [document for _, _, document in storage.query(embed([text])[0], k, **kwargs)]
+
+
+def test_query_returns_nearest_chunks(store):
+    assert len(store) == 3
+    assert nearest(store, "who repairs the roof") == [TEXTS["b"]]
+    distance, metadata, document = store.query(embed([TEXTS["c"]])[0], 1)[0]
+    assert distance == pytest.approx(0.0, abs=1e-5)
+    assert metadata == {"document": "lease", "chunk": 2}
+
+
+def test_upsert_replaces_existing_ids(store):
+    store.upsert(["b"], embed(["Smoking is prohibited."]), ["Smoking is prohibited."], [{"document": "lease"}])
+    assert len(store) == 3
+    assert store.get_chunk_ids("lease") == {"a", "b", "c"}
+    assert nearest(store, "smoking prohibited") == ["Smoking is prohibited."]
+    assert TEXTS["b"] not in nearest(store, "who repairs the roof", k=3)
+
+
+def test_delete_hides_chunks(store):
+    store.delete(["a"])
+    assert len(store) == 2
+    assert TEXTS["a"] not in nearest(store, "tenant pays rent", k=3)
+    assert store.get_embeddings("lease", ["a"]).shape == (0, 32)
+
+
+def test_delete_document_and_documents_filter(store):
+    store.upsert(["d"], embed(["Rent is paid by bank transfer."]), ["Rent is paid by bank transfer."],
+                 [{"document": "invoice"}])
+    assert nearest(store, "tenant pays rent", k=4, documents=["invoice"]) == ["Rent is paid by bank transfer."]
+    store.delete_document("lease")
+    assert len(store) == 1
+    assert store.get_chunk_ids("lease") == set()
+
+
+def test_get_embeddings_returns_stored_vectors(store):
+    vectors = store.get_embeddings("lease", ["c", "a"])
+    expected = np.asarray(embed([TEXTS["a"], TEXTS["c"]]))
+    np.testing.assert_allclose(vectors, expected, atol=1e-6)
+
+
+def test_other_handles_see_writes(store, workdir):
+    other = NumpyStorage(str(workdir / "vector_store"))
+    other.upsert(["d"], embed(["Deposit is returned in 14 days."]), ["Deposit is returned in 14 days."],
+                 [{"document": "lease"}])
+    other.delete(["c"])
+    assert nearest(store, "deposit returned", k=1) == ["Deposit is returned in 14 days."]
+    assert TEXTS["c"] not in nearest(store, "pets allowed", k=4)
+
+
+def test_compact_keeps_live_chunks(store):
+    store.delete(["a"])
+    store.compact()
+    assert len(store) == 2
+    assert sorted(nearest(store, "roof pets", k=5)) == sorted([TEXTS["b"], TEXTS["c"]])
+    reopened = NumpyStorage(store.path)
+    assert reopened.get_chunk_ids("lease") == {"b", "c"}
@@ -0,0 +1,46 @@
+import pytest
+
+from core.question_router import QuestionRouter
+
+
+@pytest.mark.parametrize("question", [
+    "What was decided in case CVL-2023-001?",
+    "What happened on 2024-03-15?",
+    "What does article 12.3 say about termination?",
+    "Who is the judge in case 15/2023?",
+    "Що сказано у статті 625-1?",
+    "Who represented the plaintiff?",
+])
+def test_lookups_and_identifiers_take_the_direct_path(question):
+    assert QuestionRouter().classify(question) == ("direct", "single lookup")
+
+
+@pytest.mark.parametrize("question", [
+    "What is 1250 + 15%?",
+    "How much is 1200 * 3",
+    "What is 100 - 5?",
+    "Divide 900 / 3",
+    "2024-03-15 + 30 days",
+    "How many days between 2024-01-01 and 2024-03-01?",
+    "Порахуй суму штрафу",
+])
+def test_arithmetic_goes_to_the_agent(question):
+    assert QuestionRouter().classify(question) == ("agent", "math")
+
+
+def test_other_agent_reasons():
+    router = QuestionRouter(max_direct_words=5)
+    assert router.classify("Who is the judge? Who is the lawyer?") == ("agent", "several questions")
+    assert router.classify("Compare the two lease agreements") == ("agent", "multi-step")
+    assert router.classify("Summarize every clause of the lease agreement") == ("agent", "long question")
+    assert QuestionRouter(enabled=False).classify("Who is the judge?")[0] == "agent"
+
+
+def test_stats_per_path():
+    router = QuestionRouter()
+    router.record("direct", 1.0, 1)
+    router.record("direct", 3.0, 1)
+    router.record("agent", 4.0, 3)
+    stats = router.stats()
+    assert stats["direct"] == {"questions": 2, "avg_seconds": 2.0, "avg_llm_calls": 1.0}
+    assert stats["agent"]["avg_llm_calls"] == 3.0
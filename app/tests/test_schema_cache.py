@@ -0,0 +1,98 @@
+import pytest
+
+from core import schema_cache
+from core.schema_cache import FINGERPRINT_QUERY, SchemaCache
+
+
+class FakeDatabase:
+    """SQLDatabase stand-in: the catalog fingerprint and table list come from a shared dict"""
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.tables = list(catalog["tables"])
+        self.queries = 0
+
+    def run(self, query):
+        assert query == FINGERPRINT_QUERY
+        self.queries += 1
+        if self.catalog.get("down"):
+            raise ConnectionError("database is down")
+        return self.catalog["fingerprint"]
+
+    def get_table_info(self):
+        return "\n".join(f"CREATE TABLE {table} (...)" for table in self.tables)
+
+    def get_usable_table_names(self):
+        return self.tables
+
+
+@pytest.fixture
+def catalog():
+    return {"fingerprint": "v1", "tables": ["cases"]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(schema_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_cache(catalog, check_interval):
+    databases = []
+
+    def factory():
+        databases.append(FakeDatabase(catalog))
+        return databases[-1]
+
+    return SchemaCache(factory, check_interval=check_interval), databases
+
+
+def test_description_is_reused_within_the_check_interval(catalog, clock):
+    cache, databases = make_cache(catalog, check_interval=60)
+    assert cache.table_info() == "CREATE TABLE cases (...)"
+    clock[0] += 30
+    catalog["tables"].append("courts")
+    catalog["fingerprint"] = "v2"
+    assert cache.table_info() == "CREATE TABLE cases (...)"
+    assert databases[0].queries == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_changed_fingerprint_rebuilds_the_database_and_description(catalog, clock):
+    cache, databases = make_cache(catalog, check_interval=60)
+    cache.table_info()
+    clock[0] += 61
+    assert cache.table_info() == "CREATE TABLE cases (...)"
+    assert cache.stats()["rebuilds"] == 1
+
+    catalog["tables"].append("courts")
+    catalog["fingerprint"] = "v2"
+    clock[0] += 61
+    assert "courts" in cache.table_info()
+    assert len(databases) == 2
+    assert cache.db is databases[1]
+    assert cache.stats()["rebuilds"] == 2
+
+
+def test_invalidate_and_zero_interval_check_every_time(catalog, clock):
+    cache, databases = make_cache(catalog, check_interval=60)
+    cache.table_info()
+    cache.invalidate()
+    cache.table_info()
+    assert databases[0].queries == 2
+
+    cache, databases = make_cache(catalog, check_interval=0)
+    for _ in range(3):
+        cache.table_info()
+    assert databases[0].queries == 3
+
+
+def test_failed_check_serves_the_cached_description(catalog, clock):
+    cache, _ = make_cache(catalog, check_interval=0)
+    with_catalog = cache.table_info()
+    catalog["down"] = True
+    assert cache.table_info() == with_catalog
+
+    cold, _ = make_cache(catalog, check_interval=0)
+    with pytest.raises(ConnectionError):
+        cold.table_info()